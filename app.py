@@ -1,34 +1,216 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import Flask, Response, g, render_template, request, jsonify, session, redirect, url_for
 from functools import wraps
+import hmac
+import json
 import os
+import threading
+import time
 
+from auth import Authenticator
+from host_export import CSV_FIELDS, csv_chunks, ndjson_chunks
 from nagios_manager import NagiosManager
 from config import Config
+from jobs import JobManager
+from metrics import HTTP_SECONDS, Metrics, server_timing
+from reload_scheduler import ReloadScheduler
+from response_cache import ResponseCache
 
 app = Flask(__name__)
 app.config.from_object(Config)
 
-# Initialiser le gestionnaire Nagios
-nagios_mgr = NagiosManager(app.config['NAGIOS_BASE_PATH'])
+# Durées des phases et des requêtes, taux de succès des caches
+metrics = Metrics()
+
+# Réponses des listes réutilisées tant que la configuration ne change pas
+response_cache = ResponseCache(metrics=metrics)
+
+# Services créés par create_app() et non à l'import : les processus du pool
+# de parsing réimportent le script principal (python app.py) et
+# démarreraient sinon leur propre watcher, leurs jobs et leur sauvegarde
+nagios_mgr = None
+job_manager = None
+reload_scheduler = None
+authenticator = None
+_services_lock = threading.Lock()
+
+def create_app():
+    '''Crée les services (une seule fois) et retourne l'application'''
+    global nagios_mgr, job_manager, reload_scheduler, authenticator
+    with _services_lock:
+        if nagios_mgr is not None:
+            return app
+
+        # Gestionnaire Nagios
+        manager = NagiosManager(
+            app.config['NAGIOS_BASE_PATH'],
+            watch_changes=app.config['NAGIOS_WATCH_CHANGES'],
+            parse_workers=app.config['NAGIOS_PARSE_WORKERS'],
+            validation_cache_size=app.config['VALIDATION_CACHE_SIZE'],
+            validation_hash_contents=app.config['VALIDATION_HASH_CONTENTS'],
+            snapshot_path=app.config['INDEX_SNAPSHOT_PATH'] or None,
+            snapshot_interval=app.config['INDEX_SNAPSHOT_INTERVAL'],
+            shared_index_path=app.config['SHARED_INDEX_PATH'] or None,
+            lock_dir=app.config['LOCK_DIR'] or None,
+            reload_methods=app.config['RELOAD_METHODS'],
+            command_file=app.config['NAGIOS_COMMAND_FILE'],
+            metrics=metrics,
+            journal_path=app.config['CHANGE_JOURNAL_PATH'] or None,
+            journal_size=app.config['CHANGE_JOURNAL_SIZE'],
+            excluded_dirs=app.config['EXCLUDED_DIRS']
+        )
+
+        # Validations et redémarrages exécutés en tâche de fond
+        job_manager = JobManager(max_workers=app.config['JOB_WORKERS'])
+
+        # Demandes de rechargement regroupées : une validation et un rechargement par lot
+        reload_scheduler = ReloadScheduler(
+            validate=lambda output, fingerprint: manager.validate_configuration(on_output=output,
+                                                                              fingerprint=fingerprint),
+            reload=manager.reload_nagios,
+            window=app.config['RELOAD_WINDOW'],
+            fingerprint=manager.config_fingerprint
+        )
+
+        # Fichier htpasswd (relu s'il change) et cache des identifiants vérifiés
+        authenticator = Authenticator(
+            app.config['HTPASSWD_FILE'],
+            app.config['SECRET_KEY'],
+            cache_ttl=app.config['AUTH_CACHE_TTL'],
+            cache_size=app.config['AUTH_CACHE_SIZE'],
+            token_max_age=app.config['API_TOKEN_MAX_AGE']
+        )
+
+        nagios_mgr = manager
+        return app
+
+def submit_validation():
+    '''Lance une validation, ou rejoint celle en cours sur la même configuration'''
+    fingerprint = nagios_mgr.config_fingerprint()
+    return job_manager.submit(
+        'validate',
+        lambda output: nagios_mgr.validate_configuration(on_output=output, fingerprint=fingerprint),
+        key=('validate', fingerprint)
+    )
+
+def submit_restart(force=False):
+    '''
+    Demande un rechargement (regroupé avec les demandes proches) et retourne
+    (génération, job qui suit le lot correspondant)
+    '''
+    generation, batch = reload_scheduler.request(force=force)
+    return (generation, job_manager.submit('restart', batch.follow, key=('reload', batch.id)))
+
+def run_validation():
+    '''Valide la configuration via la file de jobs et attend le résultat'''
+    job = submit_validation()
+    job.wait()
+    return (job.success, job.output)
+
+def wait_requested():
+    '''
+    wait=1 : la réponse attend la fin de la validation ou du rechargement.
+    Par défaut ils tournent en tâche de fond et la réponse (202) donne le
+    job à suivre, sans bloquer le worker pendant nagios -v
+    '''
+    return request.args.get('wait') == '1'
+
+def job_accepted(body, job):
+    '''Réponse 202 avec le job à suivre (Location : /api/jobs/<id>)'''
+    response = jsonify(dict(body, job=job.to_dict(include_output=False)))
+    response.status_code = 202
+    response.headers['Location'] = url_for('get_job', job_id=job.id)
+    return response
+
+def validated_write(message):
+    '''
+    Réponse d'une écriture réussie, suivie de la validation de la
+    configuration (en tâche de fond, ou attendue avec wait=1)
+    '''
+    job = submit_validation()
+    if not wait_requested():
+        return job_accepted({'success': True, 'message': message}, job)
+
+    job.wait()
+    if job.success:
+        return jsonify({'success': True, 'message': message, 'validation': job.output})
+    return jsonify({'success': False, 'error': 'Configuration invalide', 'validation': job.output}), 400
+
+def precheck_host(host_data, original_host_name=None):
+    '''Vérifications rapides d'un hôte avant nagios -v (liste d'erreurs)'''
+    if not app.config['PRE_VALIDATION']:
+        return []
+    return nagios_mgr.check_host(host_data, original_host_name)
+
+@app.before_request
+def start_request_timer():
+    '''Début du suivi de la durée de la requête et de ses phases'''
+    request.environ['nagios.start_time'] = time.perf_counter()
+    metrics.begin_request()
+
+@app.before_request
+def ensure_services():
+    '''Services créés à la première requête si l'application a été importée sans create_app()'''
+    if nagios_mgr is None:
+        create_app()
+
+@app.before_request
+def begin_manager_request():
+    '''Index et modèle objet revérifiés sur disque une seule fois par requête'''
+    nagios_mgr.begin_request()
+
+@app.teardown_request
+def end_manager_request(exc):
+    nagios_mgr.end_request()
+
+@app.after_request
+def record_request_timing(response):
+    '''Durée de la requête (métrique par route) et en-tête Server-Timing optionnel'''
+    start = request.environ.get('nagios.start_time')
+    timings = metrics.end_request()
+    if start is None:
+        return response
+
+    elapsed = time.perf_counter() - start
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.observe(HTTP_SECONDS, elapsed, method=request.method, route=route, status=response.status_code)
+
+    if app.config['SERVER_TIMING']:
+        response.headers['Server-Timing'] = server_timing(timings, elapsed)
+    return response
+
+def current_user():
+    '''
+    Utilisateur de la requête : session du navigateur, ou en-tête
+    Authorization (Basic ou Bearer <jeton>) pour les clients scriptés
+    '''
+    if 'username' in session:
+        return session['username']
+    if 'api_user' not in g:
+        g.api_user = authenticator.authenticate_header(request.authorization)
+    return g.api_user
+
+def unauthorized():
+    '''Réponse 401'''
+    response = jsonify({'error': 'Non authentifié'})
+    response.status_code = 401
+    # Pas de WWW-Authenticate pour l'interface : le navigateur afficherait sa fenêtre
+    if request.authorization is not None:
+        response.headers['WWW-Authenticate'] = 'Basic realm="Nagios Web Config"'
+    return response
 
 # Décorateur pour l'authentification
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if app.config['REQUIRE_AUTH'] and 'username' not in session:
-            return jsonify({'error': 'Non authentifié'}), 401
+        if app.config['REQUIRE_AUTH'] and not current_user():
+            return unauthorized()
         return f(*args, **kwargs)
     return decorated_function
 
 # Routes d'authentification
-from passlib.apache import HtpasswdFile
-
-# Charger le fichier htpasswd au démarrage
-htpasswd = HtpasswdFile(app.config['HTPASSWD_FILE'])
-
 @app.route('/api/login', methods=['POST'])
 def login():
     data = request.get_json()
@@ -37,7 +219,7 @@ def login():
     
     try:
         # Vérifier si l'utilisateur existe et si le mot de passe est correct
-        if htpasswd.check_password(username, password):
+        if authenticator.check_password(username, password):
             session['username'] = username
             return jsonify({'success': True, 'username': username})
         else:
@@ -57,19 +239,54 @@ def check_auth():
     if not app.config['REQUIRE_AUTH']:
         return jsonify({'authenticated': True, 'username': 'demo'})
 
-    if 'username' in session:
-        return jsonify({'authenticated': True, 'username': session['username']})
+    username = current_user()
+    if username:
+        return jsonify({'authenticated': True, 'username': username})
 
     return jsonify({'authenticated': False}), 401
 
+@app.route('/api/token', methods=['POST'])
+@login_required
+def create_token():
+    '''Jeton d'API pour l'utilisateur authentifié (en-tête Authorization: Bearer <jeton>)'''
+    username = current_user()
+    if not username:
+        return jsonify({'success': False, 'error': 'Authentification désactivée'}), 400
+    return jsonify({'success': True, 'token': authenticator.issue_token(username),
+                    'expires_in': authenticator.token_max_age})
+
 # Routes API pour les hôtes
 @app.route('/api/hosts', methods=['GET'])
 @login_required
 def get_hosts():
-    '''Récupère tous les hôtes'''
+    '''
+    Récupère les hôtes, avec pagination (limit, cursor), tri (sort=-alias),
+    projection (fields=host_name,address), recherche (q, match=prefix)
+    et comptages par valeur (facets=directory)
+    '''
     try:
-        hosts = nagios_mgr.get_all_hosts()
-        return jsonify({'success': True, 'hosts': hosts})
+        limit = request.args.get('limit', type=int)
+        if limit is not None and limit <= 0:
+            return jsonify({'success': False, 'error': 'limit invalide'}), 400
+
+        fields = request.args.get('fields')
+        facets = request.args.get('facets')
+
+        def build():
+            result = nagios_mgr.query_hosts(
+                q=request.args.get('q') or None,
+                sort=request.args.get('sort', 'host_name'),
+                limit=limit,
+                cursor=request.args.get('cursor') or None,
+                fields=fields.split(',') if fields else None,
+                prefix=request.args.get('match') == 'prefix',
+                facets=facets.split(',') if facets else None
+            )
+            return {'success': True, **result}
+
+        return response_cache.respond(('hosts', request.query_string), nagios_mgr.index_generation(), build)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -80,7 +297,9 @@ def get_host(host_name):
     try:
         host = nagios_mgr.get_host_by_name(host_name)
         if host:
-            return jsonify({'success': True, 'host': host})
+            # Attributs effectifs après résolution des modèles (use)
+            return jsonify({'success': True, 'host': host,
+                            'effective': nagios_mgr.get_effective_host(host_name)})
         else:
             return jsonify({'success': False, 'error': 'Hôte introuvable'}), 404
     except Exception as e:
@@ -98,33 +317,70 @@ def create_host():
         if not host_data or not directory:
             return jsonify({'success': False, 'error': 'Données invalides'}), 400
 
+        # Erreurs évidentes détectées sans lancer nagios -v
+        errors = precheck_host(host_data)
+        if errors:
+            return jsonify({'success': False, 'error': 'Configuration invalide', 'errors': errors}), 400
+
         success = nagios_mgr.create_host(host_data, directory)
 
         if success:
-            # Valider la configuration
-            valid, output = nagios_mgr.validate_configuration()
-
-            if valid:
-                return jsonify({
-                'success': True,
-                'message': 'Hôte créé avec succès',
-                'validation': output
-            })
-            else:
-            # NE PAS supprimer pour voir l'erreur
-            # nagios_mgr.delete_host(host_data['host_name'])  # Commenté temporairement
-            
-                return jsonify({
-                'success': False,
-                'error': 'Configuration invalide',
-                'validation': output  # ← Message d'erreur Nagios
-            }), 400
+            # Valider la configuration (l'hôte est conservé même si elle est invalide)
+            return validated_write('Hôte créé avec succès')
         else:
             return jsonify({'success': False, 'error': 'Échec de la création'}), 500
 
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/hosts/bulk', methods=['POST'])
+@login_required
+def bulk_hosts():
+    '''Applique un lot d'opérations sur les hôtes (JSON ou NDJSON)'''
+    try:
+        if request.mimetype in ('application/x-ndjson', 'application/ndjson'):
+            # Une opération JSON par ligne
+            operations = [json.loads(line) for line in request.stream if line.strip()]
+        else:
+            data = request.get_json()
+            operations = data.get('operations') if isinstance(data, dict) else data
+
+        if not isinstance(operations, list) or not operations \
+                or not all(isinstance(operation, dict) for operation in operations):
+            return jsonify({'success': False, 'error': 'Données invalides'}), 400
+
+        if not wait_requested():
+            # Lot appliqué et validé dans un job : la validation est faite dans
+            # le même thread (un job qui attendrait un autre job pourrait
+            # occuper tout le pool)
+            def run_bulk(output):
+                success, results, validation = nagios_mgr.apply_bulk(
+                    operations, validator=lambda: nagios_mgr.validate_configuration(on_output=output),
+                    precheck=app.config['PRE_VALIDATION']
+                )
+                return (success, validation, {'results': results})
+
+            return job_accepted({'success': True}, job_manager.submit('bulk', run_bulk))
+
+        success, results, output = nagios_mgr.apply_bulk(
+            operations, validator=run_validation, precheck=app.config['PRE_VALIDATION']
+        )
+
+        # 400 si rien n'a été appliqué (lot invalide ou annulé), sinon le
+        # détail des opérations en échec est dans results
+        applied = any(result['success'] for result in results)
+
+        return jsonify({
+            'success': success,
+            'results': results,
+            'validation': output
+        }), 200 if applied else 400
+
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Données invalides: {e}'}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/api/hosts/<host_name>', methods=['PUT'])
 @login_required
 def update_host(host_name):
@@ -136,24 +392,15 @@ def update_host(host_name):
         if not host_data:
             return jsonify({'success': False, 'error': 'Données invalides'}), 400
 
+        errors = precheck_host(dict(host_data, host_name=host_data.get('host_name', host_name)), host_name)
+        if errors:
+            return jsonify({'success': False, 'error': 'Configuration invalide', 'errors': errors}), 400
+
         success = nagios_mgr.update_host(host_name, host_data)
 
         if success:
             # Valider la configuration
-            valid, output = nagios_mgr.validate_configuration()
-
-            if valid:
-                return jsonify({
-                    'success': True,
-                    'message': 'Hôte mis à jour avec succès',
-                    'validation': output
-                })
-            else:
-                return jsonify({
-                    'success': False,
-                    'error': 'Configuration invalide',
-                    'validation': output
-                }), 400
+            return validated_write('Hôte mis à jour avec succès')
         else:
             return jsonify({'success': False, 'error': 'Échec de la mise à jour'}), 500
 
@@ -178,22 +425,182 @@ def delete_host(host_name):
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/changes', methods=['GET'])
+@login_required
+def get_changes():
+    '''
+    Modifications journalisées après since (numéro de séquence), dans
+    l'ordre. blocks=0 omet les blocs avant/après
+    '''
+    try:
+        since = request.args.get('since', 0, type=int)
+        limit = request.args.get('limit', 1000, type=int)
+        blocks = request.args.get('blocks', '1') != '0'
+        if since < 0 or limit <= 0:
+            return jsonify({'success': False, 'error': 'Paramètres invalides'}), 400
+
+        return jsonify(dict(nagios_mgr.changes_since(since, min(limit, 10000), blocks), success=True))
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/changes/rollback', methods=['POST'])
+@login_required
+def rollback_changes():
+    '''Annule les count dernières modifications faites par l'API'''
+    try:
+        data = request.get_json(silent=True) or {}
+        count = data.get('count', 1)
+        if not isinstance(count, int) or isinstance(count, bool) or count <= 0:
+            return jsonify({'success': False, 'error': 'Données invalides'}), 400
+
+        success, results = nagios_mgr.rollback(count)
+        if not results:
+            return jsonify({'success': False, 'error': 'Aucune modification à annuler'}), 404
+
+        # Annulations appliquées du plus récent au plus ancien : si la
+        # première a échoué, rien n'a été modifié
+        if not results[0]['success']:
+            return jsonify({'success': False, 'results': results}), 409
+
+        # Valider la configuration obtenue
+        job = submit_validation()
+        if not wait_requested():
+            return job_accepted({'success': success, 'results': results}, job)
+
+        job.wait()
+        return jsonify({
+            'success': success and job.success,
+            'results': results,
+            'validation': job.output
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/export', methods=['GET'])
+@login_required
+def export_hosts():
+    '''
+    Export de tous les hôtes en flux (format=ndjson ou csv), produit fichier
+    par fichier sans construire la liste complète en mémoire. directory
+    limite l'export à un répertoire et fields aux champs demandés
+    '''
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'success': False, 'error': 'Format invalide (ndjson ou csv)'}), 400
+
+    fields = request.args.get('fields')
+    fields = [field for field in fields.split(',') if field] if fields else None
+    directory = request.args.get('directory') or None
+
+    def generate():
+        records = nagios_mgr.iter_hosts(directory=directory, fields=fields)
+        try:
+            if export_format == 'csv':
+                yield from csv_chunks(records, fields or CSV_FIELDS)
+            else:
+                yield from ndjson_chunks(records)
+        except Exception as e:
+            # Les en-têtes sont déjà envoyés : le flux est simplement interrompu
+            print(f"Erreur lors de l'export: {e}")
+
+    if export_format == 'csv':
+        mimetype, extension = 'text/csv', 'csv'
+    else:
+        mimetype, extension = 'application/x-ndjson', 'ndjson'
+
+    response = Response(generate(), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="nagios-hosts.{extension}"'
+    response.headers['Cache-Control'] = 'no-cache'
+    # Pas de mise en tampon par un proxy nginx : les morceaux partent dès qu'ils sont prêts
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.route('/api/directories', methods=['GET'])
 @login_required
 def get_directories():
-    '''Liste tous les répertoires disponibles'''
+    '''
+    Liste tous les répertoires disponibles, avec le nombre d'hôtes et de
+    fichiers de chacun (tree)
+    '''
+    try:
+        def build():
+            tree = nagios_mgr.get_directory_tree()
+            return {'success': True, 'directories': [entry['path'] for entry in tree], 'tree': tree}
+
+        return response_cache.respond(('directories',), nagios_mgr.index_generation(), build)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# Routes API pour les services et les modèles
+@app.route('/api/services', methods=['GET'])
+@login_required
+def get_services():
+    '''
+    Récupère les services, éventuellement d'un seul hôte (host_name), avec
+    recherche (q), pagination (limit, offset) et attributs effectifs (effective=1)
+    '''
     try:
-        directories = nagios_mgr.get_directories()
-        return jsonify({'success': True, 'directories': directories})
+        limit = request.args.get('limit', type=int)
+        offset = request.args.get('offset', 0, type=int)
+        if (limit is not None and limit <= 0) or offset < 0:
+            return jsonify({'success': False, 'error': 'limit/offset invalide'}), 400
+
+        def build():
+            result = nagios_mgr.query_services(
+                host_name=request.args.get('host_name') or None,
+                q=request.args.get('q') or None,
+                limit=limit,
+                offset=offset,
+                effective=request.args.get('effective') in ('1', 'true')
+            )
+            return {'success': True, **result}
+
+        store = nagios_mgr.refresh_objects()
+        return response_cache.respond(('services', request.query_string), store.generation, build)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/templates', methods=['GET'])
+@login_required
+def get_templates():
+    '''Récupère les modèles, éventuellement d'un seul type (type=host)'''
+    try:
+        def build():
+            templates = nagios_mgr.get_templates(
+                object_type=request.args.get('type') or None,
+                effective=request.args.get('effective') in ('1', 'true')
+            )
+            return {'success': True, 'templates': templates}
+
+        store = nagios_mgr.refresh_objects()
+        return response_cache.respond(('templates', request.query_string), store.generation, build)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/templates/<object_type>/<name>', methods=['GET'])
+@login_required
+def get_template(object_type, name):
+    '''Récupère un modèle et ses attributs effectifs'''
+    try:
+        template = nagios_mgr.get_template(object_type, name)
+        if template:
+            return jsonify({'success': True, 'template': template})
+        else:
+            return jsonify({'success': False, 'error': 'Modèle introuvable'}), 404
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/validate', methods=['POST'])
 @login_required
 def validate_config():
-    '''Valide la configuration Nagios'''
+    '''Valide la configuration Nagios (en tâche de fond, ou attendue avec wait=1)'''
     try:
-        valid, output = nagios_mgr.validate_configuration()
+        job = submit_validation()
+        if not wait_requested():
+            return job_accepted({'success': True}, job)
+
+        job.wait()
+        valid, output = job.success, job.output
         return jsonify({
             'success': True,
             'valid': valid,
@@ -202,39 +609,158 @@ def validate_config():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/validate/stats', methods=['GET'])
+@login_required
+def validation_stats():
+    '''Statistiques du cache de validation'''
+    return jsonify({'success': True, 'cache': nagios_mgr.validation_cache_stats()})
+
 @app.route('/api/restart', methods=['POST'])
 @login_required
 def restart_nagios():
-    '''Redémarre Nagios'''
+    '''
+    Recharge Nagios (demande regroupée avec les demandes proches). Le
+    rechargement est suivi par un job, sauf avec wait=1 qui attend le résultat
+    '''
     try:
-        # D'abord valider
-        valid, validation_output = nagios_mgr.validate_configuration()
+        data = request.get_json(silent=True) or {}
+        if not wait_requested():
+            generation, job = submit_restart(force=bool(data.get('force')))
+            return job_accepted({'success': True, 'generation': generation}, job)
+
+        generation, batch = reload_scheduler.request(force=bool(data.get('force')))
+        batch.wait()
 
-        if not valid:
+        if batch.valid is False:
             return jsonify({
                 'success': False,
                 'error': 'Configuration invalide',
-                'output': validation_output
+                'output': batch.output,
+                'generation': generation
             }), 400
 
-        # Redémarrer
-        success, output = nagios_mgr.restart_nagios()
-
         return jsonify({
-            'success': success,
-            'message': 'Nagios redémarré avec succès' if success else 'Échec du redémarrage',
-            'output': output
+            'success': batch.success,
+            'message': 'Nagios rechargé avec succès' if batch.success else 'Échec du rechargement',
+            'output': batch.output,
+            'generation': generation,
+            'applied_generation': reload_scheduler.status()['applied_generation']
         })
 
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/reload', methods=['POST'])
+@login_required
+def queue_reload():
+    '''Demande un rechargement sans attendre son application'''
+    data = request.get_json(silent=True) or {}
+    generation, batch = reload_scheduler.request(force=bool(data.get('force')))
+    response = jsonify({'success': True, 'generation': generation, 'batch': batch.to_dict()})
+    response.status_code = 202
+    response.headers['Location'] = url_for('get_reload_batch', batch_id=batch.id)
+    return response
+
+@app.route('/api/reload', methods=['GET'])
+@login_required
+def reload_status():
+    '''Générations demandée et appliquée, lots en attente et en cours'''
+    return jsonify({'success': True, 'reload': reload_scheduler.status()})
+
+@app.route('/api/reload/<int:batch_id>', methods=['GET'])
+@login_required
+def get_reload_batch(batch_id):
+    '''État et sortie d'un lot de rechargement'''
+    batch = reload_scheduler.get(batch_id)
+    if not batch:
+        return jsonify({'success': False, 'error': 'Lot introuvable'}), 404
+    return jsonify({'success': True, 'batch': batch.to_dict(include_output=True)})
+
+# Routes API pour les tâches de fond
+@app.route('/api/jobs', methods=['POST'])
+@login_required
+def create_job():
+    '''Lance une validation ou un redémarrage en tâche de fond'''
+    try:
+        data = request.get_json(silent=True) or {}
+        job_type = data.get('type')
+
+        generation = None
+        if job_type == 'validate':
+            job = submit_validation()
+        elif job_type == 'restart':
+            generation, job = submit_restart(force=bool(data.get('force')))
+        else:
+            return jsonify({'success': False, 'error': 'Type de tâche invalide'}), 400
+
+        body = {'success': True, 'job': job.to_dict(include_output=False)}
+        if generation is not None:
+            body['generation'] = generation
+
+        response = jsonify(body)
+        response.status_code = 202
+        response.headers['Location'] = url_for('get_job', job_id=job.id)
+        return response
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/jobs', methods=['GET'])
+@login_required
+def list_jobs():
+    '''Liste les tâches récentes'''
+    return jsonify({'success': True, 'jobs': [job.to_dict(include_output=False) for job in job_manager.list()]})
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+@login_required
+def get_job(job_id):
+    '''État et sortie d'une tâche'''
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({'success': False, 'error': 'Tâche introuvable'}), 404
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+@app.route('/api/jobs/<job_id>/stream', methods=['GET'])
+@login_required
+def stream_job(job_id):
+    '''Sortie d'une tâche au fil de l'eau (Server-Sent Events)'''
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({'success': False, 'error': 'Tâche introuvable'}), 404
+
+    def events():
+        for line in job.stream():
+            if line is None:
+                yield ': keepalive\n\n'
+            else:
+                yield f"data: {line.rstrip(chr(10))}\n\n"
+        yield f"event: done\ndata: {json.dumps(job.to_dict(include_output=False))}\n\n"
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def metrics_token_valid():
+    '''Jeton fixe de /metrics (METRICS_TOKEN) présent dans l'en-tête Authorization'''
+    token = app.config['METRICS_TOKEN']
+    authorization = request.authorization
+    return bool(token) and authorization is not None and authorization.type == 'bearer' \
+        and hmac.compare_digest((authorization.token or '').encode('utf-8'), token.encode('utf-8'))
+
+# Route des métriques (compteurs propres à chaque processus)
+@app.route('/metrics', methods=['GET'])
+def export_metrics():
+    '''Métriques au format texte Prometheus (session, identifiants ou METRICS_TOKEN)'''
+    if app.config['REQUIRE_AUTH'] and not metrics_token_valid() and not current_user():
+        return unauthorized()
+    if not app.config['METRICS_ENABLED']:
+        return jsonify({'success': False, 'error': 'Métriques désactivées'}), 404
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 # Route pour servir l'application web
 @app.route('/')
 def index():
 	return render_template('index.html')
 if __name__ == '__main__':
-    app.run(
+    create_app().run(
         host=app.config['HOST'],
         port=app.config['PORT'],
         debug=app.config['DEBUG']
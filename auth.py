@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from passlib.apache import HtpasswdFile
+
+
+class Authenticator:
+    '''
+    Vérification des identifiants du fichier htpasswd de Nagios.
+
+    Le fichier est relu automatiquement quand sa date de modification
+    change. Les vérifications réussies sont mémorisées quelques secondes
+    (ttl) sous la forme d'un HMAC du couple utilisateur/mot de passe avec
+    une clé aléatoire propre au processus : un client qui s'authentifie à
+    chaque appel ne paie le hachage bcrypt/apr1 qu'une fois par ttl, et le
+    mot de passe n'est jamais conservé. Le cache est vidé à chaque
+    rechargement du fichier.
+
+    Les jetons d'API (itsdangerous) sont signés avec la clé de
+    l'application et liés au hachage courant du mot de passe : changer le
+    mot de passe ou supprimer l'utilisateur les révoque
+    '''
+
+    def __init__(self, htpasswd_path: str, secret_key: str, cache_ttl: float = 60.0,
+                 cache_size: int = 256, token_max_age: int = 3600):
+        self.htpasswd_path = htpasswd_path
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.token_max_age = token_max_age
+        self._htpasswd = HtpasswdFile(htpasswd_path)
+        self._serializer = URLSafeTimedSerializer(secret_key, salt='nagios-web-config-api-token')
+        self._cache_key = os.urandom(32)
+        self._verified: 'OrderedDict[bytes, float]' = OrderedDict()
+        # Nombre de rechargements du fichier : passlib le relit sur place,
+        # une vérification commencée avant un rechargement n'est pas mémorisée
+        self._reloads = 0
+        self._lock = threading.Lock()
+
+    def reload_if_changed(self) -> bool:
+        '''Relit le fichier htpasswd s'il a été modifié. Retourne True s'il a été relu'''
+        with self._lock:
+            try:
+                reloaded = self._htpasswd.load_if_changed()
+            except OSError as e:
+                print(f"Erreur lors de la lecture de {self.htpasswd_path}: {e}")
+                return False
+
+            if reloaded:
+                self._reloads += 1
+                self._verified.clear()
+            return reloaded
+
+    def check_password(self, username: Optional[str], password: Optional[str]) -> bool:
+        if not username or password is None:
+            return False
+
+        self.reload_if_changed()
+        digest = hmac.new(self._cache_key, f"{username}\0{password}".encode('utf-8'), hashlib.sha256).digest()
+        now = time.monotonic()
+
+        with self._lock:
+            expires_at = self._verified.get(digest)
+            if expires_at is not None:
+                if expires_at > now:
+                    return True
+                del self._verified[digest]
+
+            # Hachage complet hors du verrou (bcrypt est volontairement lent),
+            # sur l'entrée lue sous le verrou : un rechargement pendant le
+            # hachage ne change pas l'entrée vérifiée
+            reloads = self._reloads
+            hash_value = self._htpasswd.get_hash(username)
+            context = self._htpasswd.context
+
+        if hash_value is None or not context.verify(password.encode(self._htpasswd.encoding), hash_value):
+            return False
+
+        if self.cache_ttl > 0:
+            with self._lock:
+                if reloads == self._reloads:
+                    self._verified[digest] = now + self.cache_ttl
+                    self._verified.move_to_end(digest)
+                    while len(self._verified) > self.cache_size:
+                        self._verified.popitem(last=False)
+        return True
+
+    def issue_token(self, username: str) -> str:
+        '''Jeton d'API signé pour un utilisateur (valide token_max_age secondes)'''
+        return self._serializer.dumps({'u': username, 'h': self._password_tag(username)})
+
+    def verify_token(self, token: str) -> Optional[str]:
+        '''Utilisateur d'un jeton valide, None sinon (signature, expiration, mot de passe changé)'''
+        try:
+            data = self._serializer.loads(token, max_age=self.token_max_age)
+        except BadSignature:
+            return None
+
+        username = data.get('u') if isinstance(data, dict) else None
+        if not username:
+            return None
+
+        self.reload_if_changed()
+        tag = self._password_tag(username)
+        if tag is None or not hmac.compare_digest(tag, data.get('h', '')):
+            return None
+        return username
+
+    def authenticate_header(self, authorization) -> Optional[str]:
+        '''
+        Utilisateur authentifié par l'en-tête Authorization de la requête
+        (Basic ou Bearer <jeton>), None sinon
+        '''
+        if authorization is None:
+            return None
+        if authorization.type == 'basic':
+            if self.check_password(authorization.username, authorization.password):
+                return authorization.username
+            return None
+        if authorization.type == 'bearer' and authorization.token:
+            return self.verify_token(authorization.token)
+        return None
+
+    def _password_tag(self, username: str) -> Optional[str]:
+        with self._lock:
+            hash_value = self._htpasswd.get_hash(username)
+        if hash_value is None:
+            return None
+        return hashlib.sha256(hash_value).hexdigest()[:16]
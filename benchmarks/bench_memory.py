@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Mesure (tracemalloc) la mémoire occupée par l'index des hôtes chargé sur
+une arborescence synthétique, comparée à une représentation en
+dictionnaires (une copie des directives, de file_path et de directory par
+hôte, comme avant la forme compacte).
+
+    python benchmarks/bench_memory.py --hosts 50000
+'''
+
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nagios_manager import NagiosManager
+from synthetic import generate_tree
+
+
+def measure(load):
+    '''Mémoire allouée (octets) et conservée par le résultat de load()'''
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = load()
+    gc.collect()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    size = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    return size, result
+
+
+def load_compact(root):
+    manager = NagiosManager(root)
+    manager.refresh_index()
+    return manager
+
+
+def load_dicts(root):
+    '''Index équivalent en dictionnaires indépendants par hôte'''
+    manager = NagiosManager(root)
+    manager.refresh_index()
+    hosts = {}
+    for file_path in manager._file_order:
+        directory = os.path.dirname(file_path)
+        for span, host in manager._file_hosts[file_path].items():
+            # Nouvelles chaînes, comme après un parsing sans partage
+            host_data = {key: ''.join(value) for key, value in host.items()}
+            host_data['file_path'] = ''.join(file_path)
+            host_data['directory'] = ''.join(directory)
+            hosts[span, file_path] = host_data
+    del manager
+    return hosts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hosts', type=int, default=50000)
+    parser.add_argument('--hosts-per-file', type=int, default=5)
+    parser.add_argument('--directories', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        tree = generate_tree(root, args.hosts, args.hosts_per_file, args.directories)
+        print(f"{tree['hosts']} hôtes, {tree['files']} fichiers, {tree['directories']} répertoires")
+
+        print(f"{'représentation':>16} {'total (Mo)':>11} {'par hôte (o)':>13}")
+        results = {}
+        for label, load in (('dictionnaires', load_dicts), ('compacte', load_compact)):
+            size, result = measure(lambda: load(root))
+            results[label] = size
+            del result
+            print(f"{label:>16} {size / 1e6:>11.1f} {size / tree['hosts']:>13.0f}")
+
+        print(f"gain : {1 - results['compacte'] / results['dictionnaires']:.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Mesure le temps de chargement à froid de get_all_hosts() selon le nombre
+de workers (NAGIOS_PARSE_WORKERS) sur une arborescence synthétique.
+
+    python benchmarks/bench_parallel_load.py --hosts 50000 --workers 1,2,4,8
+'''
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nagios_manager import NagiosManager
+from synthetic import generate_tree
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hosts', type=int, default=20000)
+    parser.add_argument('--hosts-per-file', type=int, default=5)
+    parser.add_argument('--directories', type=int, default=20)
+    parser.add_argument('--workers', default='1,2,4,8')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    worker_counts = [int(w) for w in args.workers.split(',')]
+
+    with tempfile.TemporaryDirectory() as root:
+        tree = generate_tree(root, args.hosts, args.hosts_per_file, args.directories)
+        print(f"{tree['hosts']} hôtes, {tree['files']} fichiers, {tree['directories']} répertoires "
+              f"({os.cpu_count()} CPU)")
+
+        reference = None
+        baseline = None
+
+        print(f"{'workers':>8} {'meilleur (s)':>13} {'accélération':>13}")
+        for workers in worker_counts:
+            timings = []
+            for _ in range(args.repeat):
+                manager = NagiosManager(root, parse_workers=workers)
+                start = time.perf_counter()
+                hosts = manager.get_all_hosts()
+                timings.append(time.perf_counter() - start)
+
+            # Le résultat doit être identique (et dans le même ordre) quel que soit le mode
+            names = [host['host_name'] for host in hosts]
+            if reference is None:
+                reference = names
+            elif names != reference:
+                sys.exit(f"Résultat différent avec {workers} workers")
+
+            best = min(timings)
+            baseline = baseline or best
+            print(f"{workers:>8} {best:>13.3f} {baseline / best:>12.2f}x")
+
+
+if __name__ == '__main__':
+    main()
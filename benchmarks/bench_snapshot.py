@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Mesure le démarrage à froid d'un worker (premier get_all_hosts()) sans
+instantané, puis avec l'instantané de l'index (INDEX_SNAPSHOT_PATH), avec
+une partie des fichiers modifiés depuis l'écriture de l'instantané.
+
+    python benchmarks/bench_snapshot.py --hosts 50000 --modified 100
+'''
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nagios_manager import NagiosManager
+from synthetic import generate_tree
+
+
+def cold_start(root, snapshot_path=None):
+    '''Durée (s) de la création du gestionnaire et du premier get_all_hosts()'''
+    start = time.perf_counter()
+    manager = NagiosManager(root, snapshot_path=snapshot_path)
+    hosts = manager.get_all_hosts()
+    return time.perf_counter() - start, manager, hosts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hosts', type=int, default=50000)
+    parser.add_argument('--hosts-per-file', type=int, default=5)
+    parser.add_argument('--directories', type=int, default=20)
+    parser.add_argument('--modified', type=int, default=100, help="fichiers modifiés après l'instantané")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root, tempfile.TemporaryDirectory() as cache:
+        tree = generate_tree(root, args.hosts, args.hosts_per_file, args.directories)
+        snapshot_path = os.path.join(cache, 'index.snapshot')
+        print(f"{tree['hosts']} hôtes, {tree['files']} fichiers, {tree['directories']} répertoires")
+
+        elapsed, manager, reference = cold_start(root)
+        print(f"sans instantané           : {elapsed:.3f} s")
+
+        manager.snapshot_path = snapshot_path
+        start = time.perf_counter()
+        manager.save_snapshot()
+        print(f"écriture de l'instantané  : {time.perf_counter() - start:.3f} s "
+              f"({os.path.getsize(snapshot_path) / 1e6:.1f} Mo)")
+
+        elapsed, manager, hosts = cold_start(root, snapshot_path)
+        print(f"avec instantané           : {elapsed:.3f} s")
+        if hosts != reference:
+            sys.exit("Résultat différent avec l'instantané")
+
+        # Fichiers modifiés après l'instantané : seuls ceux-là sont re-parsés
+        for file_path in manager.find_host_files()[:args.modified]:
+            with open(file_path, 'a') as f:
+                f.write('\n')
+
+        elapsed, manager, hosts = cold_start(root, snapshot_path)
+        print(f"avec {args.modified} fichiers modifiés : {elapsed:.3f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Suite de benchmarks reproductible de NagiosManager et des routes Flask
+(client de test) sur une arborescence synthétique. Les résultats sont
+écrits en JSON pour être comparés d'une exécution à l'autre.
+
+    python benchmarks/bench_suite.py --hosts 20000 --output base.json
+    python benchmarks/bench_suite.py --hosts 20000 --compare base.json
+
+Avec --compare, le code de sortie vaut 1 si une mesure (médiane) est plus
+lente que la référence au-delà de --threshold. Sauf --validate, nagios -v
+n'est pas lancé par les routes qui modifient des hôtes : la validation est
+remplacée par un succès immédiat pour ne mesurer que l'application.
+'''
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from nagios_manager import NagiosManager
+from synthetic import generate_tree, host_names
+
+# Version du format du fichier de résultats
+RESULTS_VERSION = 1
+
+
+def summarize(samples: List[float]) -> Dict:
+    '''Statistiques (secondes) d'une série de mesures'''
+    return {
+        'runs': len(samples),
+        'min': min(samples),
+        'median': statistics.median(samples),
+        'mean': statistics.fmean(samples),
+        'max': max(samples),
+    }
+
+
+def timed(function: Callable[[], object], repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def timed_each(function: Callable[[str], object], names: List[str]) -> List[float]:
+    '''Durée de function(name) pour chaque nom (une mesure par appel)'''
+    samples = []
+    for name in names:
+        start = time.perf_counter()
+        function(name)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def editable_host(host: Dict) -> Dict:
+    '''Directives d'un hôte retourné par get_host_by_name, sans les champs calculés'''
+    return {key: value for key, value in host.items() if key not in ('file_path', 'directory')}
+
+
+def check(result, label: str):
+    if not result:
+        sys.exit(f"Échec de {label}")
+
+
+def bench_manager(root: str, names: List[str], args, rng: random.Random) -> Dict[str, List[float]]:
+    results = {}
+
+    results['manager.get_all_hosts.cold'] = timed(lambda: NagiosManager(root).get_all_hosts(), args.repeat)
+
+    manager = NagiosManager(root)
+    check(manager.get_all_hosts(), 'get_all_hosts')
+    results['manager.get_all_hosts.warm'] = timed(manager.get_all_hosts, args.repeat)
+    results['manager.get_directories'] = timed(manager.get_directories, args.repeat)
+
+    sample = rng.sample(names, min(len(names), args.operations * 3))
+    lookups, updates, deletes = (sample[i::3] for i in range(3))
+
+    results['manager.get_host_by_name'] = timed_each(
+        lambda name: check(manager.get_host_by_name(name), f"get_host_by_name({name})"), lookups)
+
+    def update(name):
+        host = editable_host(manager.get_host_by_name(name))
+        host['alias'] = f"{host['alias']} (modifié)"
+        check(manager.update_host(name, host), f"update_host({name})")
+
+    results['manager.update_host'] = timed_each(update, updates)
+    results['manager.delete_host'] = timed_each(
+        lambda name: check(manager.delete_host(name), f"delete_host({name})"), deletes)
+
+    return results
+
+
+def bench_endpoints(root: str, names: List[str], args, rng: random.Random) -> Dict[str, List[float]]:
+    '''Routes Flask via le client de test (l'application est importée sur root)'''
+    htpasswd = os.path.join(root, 'htpasswd.users')
+    open(htpasswd, 'a').close()
+    os.environ.update(NAGIOS_BASE_PATH=root, HTPASSWD_FILE=htpasswd, REQUIRE_AUTH='False')
+
+    import app as app_module
+    app_module.create_app()
+    if not args.validate:
+        app_module.submit_validation = lambda: app_module.job_manager.submit('validate', lambda output: (True, ''))
+    client = app_module.app.test_client()
+
+    def get(url):
+        response = client.get(url)
+        if response.status_code != 200:
+            sys.exit(f"GET {url} : {response.status_code}")
+
+    results = {}
+    for label, url in (('GET /api/hosts', '/api/hosts'),
+                       ('GET /api/hosts?limit=50', '/api/hosts?limit=50'),
+                       ('GET /api/hosts?q=', f"/api/hosts?q={names[len(names) // 2][:-2]}&limit=50"),
+                       ('GET /api/directories', '/api/directories'),
+                       ('GET /api/templates', '/api/templates?type=host')):
+        get(url)
+        results[label] = timed(lambda: get(url), args.repeat)
+
+    sample = rng.sample(names, min(len(names), args.operations * 2))
+    lookups, updates = sample[0::2], sample[1::2]
+    results['GET /api/hosts/<name>'] = timed_each(lambda name: get(f"/api/hosts/{name}"), lookups)
+
+    def update(name):
+        host = client.get(f"/api/hosts/{name}").get_json()['host']
+        host = dict(editable_host(host), alias=f"{host['alias']} (api)")
+        response = client.put(f"/api/hosts/{name}?wait=1", json={'host': host})
+        if response.status_code != 200:
+            sys.exit(f"PUT /api/hosts/{name} : {response.status_code} {response.get_data(as_text=True)}")
+
+    results['PUT /api/hosts/<name>'] = timed_each(update, updates)
+
+    def delete(name):
+        response = client.delete(f"/api/hosts/{name}")
+        if response.status_code != 200:
+            sys.exit(f"DELETE /api/hosts/{name} : {response.status_code}")
+
+    results['DELETE /api/hosts/<name>'] = timed_each(delete, lookups)
+    return results
+
+
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'commit': commit,
+    }
+
+
+def compare(results: Dict, reference_path: str, threshold: float) -> bool:
+    '''Affiche le rapport médiane courante / médiane de référence. Retourne False en cas de régression'''
+    with open(reference_path) as f:
+        reference = json.load(f)['results']
+
+    ok = True
+    print(f"\n{'mesure':<34} {'référence':>11} {'actuel':>11} {'rapport':>8}")
+    for name, stats in results.items():
+        if name not in reference:
+            continue
+        before, after = reference[name]['median'], stats['median']
+        ratio = after / before if before else float('inf')
+        flag = ''
+        if ratio > threshold:
+            flag = '  régression'
+            ok = False
+        print(f"{name:<34} {before * 1000:>9.3f}ms {after * 1000:>9.3f}ms {ratio:>7.2f}x{flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hosts', type=int, default=20000)
+    parser.add_argument('--hosts-per-file', type=int, default=5)
+    parser.add_argument('--directories', type=int, default=20)
+    parser.add_argument('--depth', type=int, default=2, help='profondeur des répertoires')
+    parser.add_argument('--template-depth', type=int, default=3, help='longueur de la chaîne de modèles')
+    parser.add_argument('--comment-ratio', type=float, default=0.2, help='densité de commentaires')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5, help='mesures par opération de lecture globale')
+    parser.add_argument('--operations', type=int, default=50, help="hôtes lus/modifiés/supprimés par opération")
+    parser.add_argument('--skip-endpoints', action='store_true', help='ne pas mesurer les routes Flask')
+    parser.add_argument('--validate', action='store_true', help='lancer nagios -v dans les routes')
+    parser.add_argument('--output', help='fichier JSON des résultats (sortie standard par défaut)')
+    parser.add_argument('--compare', help='fichier JSON de référence')
+    parser.add_argument('--threshold', type=float, default=1.25, help='rapport au-delà duquel une mesure régresse')
+    args = parser.parse_args()
+
+    tree_options = {'hosts': args.hosts, 'hosts_per_file': args.hosts_per_file, 'directories': args.directories,
+                    'depth': args.depth, 'template_depth': args.template_depth,
+                    'comment_ratio': args.comment_ratio, 'seed': args.seed}
+    names = host_names(args.hosts)
+    samples = {}
+
+    # Arborescence neuve pour chaque groupe : les suppressions modifient l'arborescence
+    with tempfile.TemporaryDirectory() as root:
+        generate_tree(root, **tree_options)
+        samples.update(bench_manager(root, names, args, random.Random(args.seed)))
+
+    if not args.skip_endpoints:
+        with tempfile.TemporaryDirectory() as root:
+            generate_tree(root, **tree_options)
+            samples.update(bench_endpoints(root, names, args, random.Random(args.seed)))
+
+    results = {name: summarize(values) for name, values in samples.items()}
+    report = {
+        'version': RESULTS_VERSION,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'environment': environment(),
+        'tree': tree_options,
+        'options': {'repeat': args.repeat, 'operations': args.operations, 'validate': args.validate},
+        'results': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        for name, stats in results.items():
+            print(f"{name:<34} médiane {stats['median'] * 1000:>9.3f} ms  (min {stats['min'] * 1000:.3f} ms)")
+    else:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+    if args.compare and not compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
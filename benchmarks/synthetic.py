@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Générateur d'arborescences de configuration Nagios synthétiques pour les benchmarks
+'''
+
+import os
+import random
+from typing import Dict, List
+
+# Directives portées par les modèles quand une chaîne de modèles est générée
+_TEMPLATE_DIRECTIVES = [
+    ('max_check_attempts', '5'),
+    ('check_interval', '5'),
+    ('retry_interval', '1'),
+    ('check_command', 'check-host-alive'),
+    ('notification_period', '24x7'),
+    ('contact_groups', 'admins'),
+]
+
+
+def generate_tree(root: str, hosts: int = 10000, hosts_per_file: int = 5, directories: int = 20,
+                  depth: int = 1, template_depth: int = 0, comment_ratio: float = 0.0,
+                  seed: int = 0) -> Dict:
+    '''
+    Crée une arborescence de configuration dans root : un nagios.cfg qui
+    référence chaque répertoire, et des fichiers d'hôtes répartis entre
+    les répertoires. Retourne un résumé (nombre d'hôtes, de fichiers...)
+
+    depth : profondeur des répertoires d'hôtes (site000/zone1/zone2...)
+    template_depth : longueur de la chaîne de modèles (generic-host ->
+        ... -> linux-server) écrite dans objects/templates.cfg avec les
+        commandes, contacts et périodes référencés ; les hôtes héritent
+        alors de leurs réglages au lieu de les répéter (0 = pas de modèles)
+    comment_ratio : probabilité d'une ligne de commentaire avant chaque directive
+    seed : graine du tirage des commentaires (même graine, même arborescence)
+    '''
+    rng = random.Random(seed)
+    os.makedirs(root, exist_ok=True)
+    site_paths = [os.path.join(root, f"site{d:03d}") for d in range(directories)]
+    dir_paths = [os.path.join(site_path, *[f"zone{level}" for level in range(1, depth)])
+                 for site_path in site_paths]
+
+    for dir_path in dir_paths:
+        os.makedirs(dir_path, exist_ok=True)
+
+    with open(os.path.join(root, 'nagios.cfg'), 'w') as f:
+        if template_depth > 0:
+            f.write(f"cfg_file={_write_templates(root, template_depth)}\n")
+        for site_path in site_paths:
+            f.write(f"cfg_dir={site_path}\n")
+
+    files = 0
+    for first in range(0, hosts, hosts_per_file):
+        dir_path = dir_paths[files % directories]
+        file_path = os.path.join(dir_path, f"hosts{files:06d}.cfg")
+
+        with open(file_path, 'w') as f:
+            for i in range(first, min(first + hosts_per_file, hosts)):
+                f.write(_host_block(i, template_depth > 0, comment_ratio, rng))
+
+        files += 1
+
+    return {'root': root, 'hosts': hosts, 'files': files, 'directories': directories,
+            'depth': depth, 'template_depth': template_depth, 'comment_ratio': comment_ratio, 'seed': seed}
+
+
+def host_names(hosts: int) -> List[str]:
+    '''Noms des hôtes générés par generate_tree'''
+    return [f"host{i:06d}" for i in range(hosts)]
+
+
+def _write_templates(root: str, template_depth: int) -> str:
+    '''Écrit la chaîne de modèles et les objets qu'elle référence, retourne le chemin du fichier'''
+    objects_dir = os.path.join(root, 'objects')
+    os.makedirs(objects_dir, exist_ok=True)
+    file_path = os.path.join(objects_dir, 'templates.cfg')
+
+    names = ['generic-host'] + [f"host-level{level}" for level in range(1, template_depth - 1)] + ['linux-server']
+    names = names[-template_depth:]
+
+    blocks = [
+        "define command {\n    command_name    check-host-alive\n"
+        "    command_line    $USER1$/check_ping -H $HOSTADDRESS$ -w 3000.0,80% -c 5000.0,100% -p 5\n}\n",
+        "define timeperiod {\n    timeperiod_name 24x7\n    alias           24 Hours A Day, 7 Days A Week\n"
+        "    monday          00:00-24:00\n}\n",
+        "define contact {\n    contact_name    nagiosadmin\n    alias           Nagios Admin\n    email           nagios@localhost\n}\n",
+        "define contactgroup {\n    contactgroup_name admins\n    members           nagiosadmin\n}\n",
+    ]
+
+    # Chaque niveau reprend une partie des directives, le dernier les a toutes
+    for level, name in enumerate(names):
+        lines = [f"    name                           {name}"]
+        if level:
+            lines.append(f"    use                            {names[level - 1]}")
+        count = len(_TEMPLATE_DIRECTIVES) * (level + 1) // len(names)
+        lines.extend(f"    {key:<30} {value}" for key, value in _TEMPLATE_DIRECTIVES[:count])
+        lines.append("    register                       0")
+        blocks.append("define host {\n" + '\n'.join(lines) + "\n}\n")
+
+    with open(file_path, 'w') as f:
+        f.write('\n'.join(blocks))
+    return file_path
+
+
+def _host_block(i: int, templated: bool = False, comment_ratio: float = 0.0,
+                rng: random.Random = None) -> str:
+    directives = [
+        ('use', 'linux-server ; modèle'),
+        ('host_name', f"host{i:06d}"),
+        ('alias', f"Serveur synthétique {i}"),
+        ('address', f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}"),
+    ]
+    if not templated:
+        directives.extend(_TEMPLATE_DIRECTIVES)
+
+    lines = [f"# Hôte généré n°{i}", "define host {"]
+    for key, value in directives:
+        if comment_ratio and rng.random() < comment_ratio:
+            lines.append(rng.choice(("    # commentaire de l'administrateur",
+                                     f"    ;{key:<30} ancienne valeur",
+                                     "")))
+        lines.append(f"    {key:<30} {value}")
+    lines.append("}")
+
+    return '\n'.join(lines) + "\n\n"
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+from typing import Dict, Iterable, List, Set
+
+# Directives de nagios.cfg qui incluent un fichier
+FILE_DIRECTIVES = ('cfg_file', 'resource_file')
+
+
+class CfgIncludes:
+    '''
+    Inclusions de nagios.cfg (cfg_file, resource_file, cfg_dir) en chemins
+    absolus normalisés. Les fichiers sont rangés par répertoire parent :
+    savoir si un chemin est déjà chargé par Nagios ne demande qu'une
+    recherche par ancêtre (O(profondeur)), quel que soit le nombre de lignes
+    '''
+
+    def __init__(self, base_dir: str):
+        self.base_dir = base_dir
+        # Fichiers et répertoires dans l'ordre de nagios.cfg
+        self.files: List[str] = []
+        self.dirs: List[str] = []
+        self._cfg_files: Dict[str, Set[str]] = {}
+        self._cfg_dirs: Set[str] = set()
+
+    @classmethod
+    def parse(cls, lines: Iterable[str], base_dir: str) -> 'CfgIncludes':
+        includes = cls(base_dir)
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith('#') or '=' not in line:
+                continue
+
+            key, value = line.split('=', 1)
+            key = key.strip()
+            if key in FILE_DIRECTIVES:
+                includes._add_file(includes.normalize(value.strip()), key)
+            elif key == 'cfg_dir':
+                includes._add_dir(includes.normalize(value.strip()))
+        return includes
+
+    def normalize(self, path: str) -> str:
+        return os.path.normpath(os.path.join(self.base_dir, path))
+
+    def covers(self, path: str) -> bool:
+        '''
+        Indique si Nagios charge déjà ce fichier : cité par cfg_file ou
+        situé (fichier .cfg) sous l'un des cfg_dir, à n'importe quelle
+        profondeur
+        '''
+        path = self.normalize(path)
+        parent = os.path.dirname(path)
+        if os.path.basename(path) in self._cfg_files.get(parent, ()):
+            return True
+        if not path.endswith('.cfg'):
+            return False
+
+        while True:
+            if parent in self._cfg_dirs:
+                return True
+            ancestor = os.path.dirname(parent)
+            if ancestor == parent:
+                return False
+            parent = ancestor
+
+    def with_files(self, paths: Iterable[str]) -> 'CfgIncludes':
+        '''Copie avec des lignes cfg_file supplémentaires (l'original reste inchangé)'''
+        includes = CfgIncludes(self.base_dir)
+        includes.files = list(self.files)
+        includes.dirs = list(self.dirs)
+        includes._cfg_files = dict(self._cfg_files)
+        includes._cfg_dirs = self._cfg_dirs
+
+        copied = set()
+        for path in map(self.normalize, paths):
+            parent = os.path.dirname(path)
+            if parent not in copied:
+                includes._cfg_files[parent] = set(includes._cfg_files.get(parent, ()))
+                copied.add(parent)
+            includes._add_file(path, 'cfg_file')
+        return includes
+
+    def _add_file(self, path: str, key: str):
+        self.files.append(path)
+        if key == 'cfg_file':
+            self._cfg_files.setdefault(os.path.dirname(path), set()).add(os.path.basename(path))
+
+    def _add_dir(self, path: str):
+        self.dirs.append(path)
+        self._cfg_dirs.add(path)
+
+
+def read_cfg_includes(nagios_cfg: str) -> CfgIncludes:
+    '''Lit les inclusions de nagios.cfg (chemins relatifs au répertoire de nagios.cfg)'''
+    with open(nagios_cfg, 'r') as f:
+        return CfgIncludes.parse(f, os.path.dirname(nagios_cfg))
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import sqlite3
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlite_db import SQLiteDatabase
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    time REAL NOT NULL,
+    source TEXT NOT NULL,
+    action TEXT NOT NULL,
+    host_name TEXT,
+    old_host_name TEXT,
+    file_path TEXT,
+    before TEXT,
+    after TEXT,
+    cfg_file TEXT,
+    reverts INTEGER,
+    reverted_by INTEGER
+);
+CREATE TABLE IF NOT EXISTS file_stamps (
+    path TEXT PRIMARY KEY,
+    stamp TEXT
+);
+'''
+
+_COLUMNS = ('seq', 'time', 'source', 'action', 'host_name', 'old_host_name', 'file_path',
+            'before', 'after', 'cfg_file', 'reverts', 'reverted_by')
+
+# Colonnes renseignées par l'appelant pour une entrée
+_ENTRY_COLUMNS = ('source', 'action', 'host_name', 'old_host_name', 'file_path', 'before', 'after', 'cfg_file',
+                  'reverts')
+
+
+class ChangeJournal:
+    '''
+    Journal en ajout seul des modifications de la configuration (base
+    SQLite) : chaque entrée reçoit un numéro de séquence croissant et
+    conserve le bloc de l'hôte avant et après la modification, ainsi que
+    la ligne cfg_file ajoutée à nagios.cfg (création) ou retirée (fichier
+    supprimé).
+
+    La dernière empreinte connue de chaque fichier est aussi enregistrée :
+    une modification déjà journalisée (par ce processus ou par un autre
+    partageant la base) n'est pas journalisée une seconde fois lorsqu'elle
+    est détectée sur le disque. Sans chemin, le journal est en mémoire et
+    propre au processus. Seules les max_entries dernières entrées sont
+    conservées
+    '''
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 100000, timeout: float = 30.0):
+        self.max_entries = max_entries
+        self._db = SQLiteDatabase(path, timeout, memory_name='nagios-change-journal')
+
+        self._db.connection().executescript(_SCHEMA)
+        with self._db.exclusive() as connection:
+            # Bases créées avant l'ajout de la colonne cfg_file
+            columns = {row[1] for row in connection.execute('PRAGMA table_info(changes)')}
+            if 'cfg_file' not in columns:
+                connection.execute('ALTER TABLE changes ADD COLUMN cfg_file TEXT')
+
+    def record(self, entries: List[Dict], stamps: Optional[Dict[str, Optional[Tuple]]] = None) -> List[int]:
+        '''
+        Ajoute des entrées (source, action, host_name, old_host_name,
+        file_path, before, after, cfg_file, reverts) et enregistre les empreintes des
+        fichiers écrits (None pour un fichier supprimé). Retourne les numéros
+        de séquence attribués
+        '''
+        with self._db.exclusive() as connection:
+            if stamps:
+                self._store_stamps(connection, stamps)
+            return self._insert(connection, entries)
+
+    def claim_stamps(self, stamps: Dict[str, Optional[Tuple]]):
+        '''Enregistre les empreintes de fichiers écrits par l'application (sans entrée)'''
+        with self._db.exclusive() as connection:
+            self._store_stamps(connection, stamps)
+
+    def record_detected(self, detected: List[Tuple[str, Optional[Tuple], List[Dict]]]) -> List[int]:
+        '''
+        Journalise des modifications détectées sur le disque : (fichier,
+        empreinte, entrées). Un fichier dont l'empreinte est déjà connue
+        (écrit par l'application ou déjà détecté) est ignoré
+        '''
+        seqs = []
+        with self._db.exclusive() as connection:
+            for file_path, stamp, entries in detected:
+                stamp_json = _stamp_json(stamp)
+                row = connection.execute('SELECT stamp FROM file_stamps WHERE path = ?', (file_path,)).fetchone()
+                if row is not None and row[0] == stamp_json:
+                    continue
+                self._store_stamps(connection, {file_path: stamp})
+                seqs.extend(self._insert(connection, entries))
+        return seqs
+
+    def since(self, seq: int, limit: Optional[int] = None, blocks: bool = True) -> List[Dict]:
+        '''Entrées de numéro strictement supérieur à seq, dans l'ordre'''
+        columns = _COLUMNS if blocks else tuple(c for c in _COLUMNS if c not in ('before', 'after'))
+        query = f"SELECT {', '.join(columns)} FROM changes WHERE seq > ? ORDER BY seq"
+        params: Tuple = (seq,)
+        if limit is not None:
+            query += ' LIMIT ?'
+            params += (limit,)
+        return [dict(zip(columns, row)) for row in self._db.connection().execute(query, params)]
+
+    def bounds(self) -> Tuple[int, int]:
+        '''(premier, dernier) numéro de séquence conservé, (0, 0) si le journal est vide'''
+        row = self._db.connection().execute('SELECT MIN(seq), MAX(seq) FROM changes').fetchone()
+        return (row[0] or 0, row[1] or 0)
+
+    def last_seq(self) -> int:
+        '''Dernier numéro attribué (y compris pour des entrées supprimées depuis)'''
+        row = self._db.connection().execute("SELECT seq FROM sqlite_sequence WHERE name = 'changes'").fetchone()
+        return row[0] if row else 0
+
+    def last_mutations(self, count: int) -> List[Dict]:
+        '''Les count dernières modifications faites par l'API et non annulées, de la plus récente à la plus ancienne'''
+        rows = self._db.connection().execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM changes WHERE source = 'api' AND reverted_by IS NULL "
+            "ORDER BY seq DESC LIMIT ?", (count,))
+        return [dict(zip(_COLUMNS, row)) for row in rows]
+
+    def _insert(self, connection: sqlite3.Connection, entries: List[Dict]) -> List[int]:
+        seqs = []
+        now = time.time()
+        for entry in entries:
+            cursor = connection.execute(
+                f"INSERT INTO changes (time, {', '.join(_ENTRY_COLUMNS)}) VALUES (?{', ?' * len(_ENTRY_COLUMNS)})",
+                (now, *(entry.get(column) for column in _ENTRY_COLUMNS)))
+            seq = cursor.lastrowid
+            seqs.append(seq)
+            if entry.get('reverts'):
+                connection.execute('UPDATE changes SET reverted_by = ? WHERE seq = ?', (seq, entry['reverts']))
+
+        if seqs and self.max_entries:
+            connection.execute('DELETE FROM changes WHERE seq <= ?', (seqs[-1] - self.max_entries,))
+        return seqs
+
+    @staticmethod
+    def _store_stamps(connection: sqlite3.Connection, stamps: Dict[str, Optional[Tuple]]):
+        connection.executemany('INSERT OR REPLACE INTO file_stamps (path, stamp) VALUES (?, ?)',
+                               [(path, _stamp_json(stamp)) for path, stamp in stamps.items()])
+
+
+def _stamp_json(stamp: Optional[Tuple]) -> Optional[str]:
+    return None if stamp is None else json.dumps(list(stamp))
@@ -14,9 +14,69 @@ class Config:
     NAGIOS_BASE_PATH = os.environ.get('NAGIOS_BASE_PATH') or '/usr/local/nagios/etc'
     NAGIOS_BIN = os.environ.get('NAGIOS_BIN') or '/usr/local/nagios/bin/nagios'
     NAGIOS_CFG = os.path.join(NAGIOS_BASE_PATH, 'nagios.cfg')
+
+    # Surveillance inotify de l'arborescence (évite un parcours complet à chaque requête)
+    NAGIOS_WATCH_CHANGES = os.environ.get('NAGIOS_WATCH_CHANGES', 'False').lower() == 'true'
+
+    # Nombre de processus pour le chargement à froid de l'arborescence (1 = séquentiel)
+    NAGIOS_PARSE_WORKERS = int(os.environ.get('NAGIOS_PARSE_WORKERS', 1))
+
+    # Instantané de l'index sur disque pour un démarrage rapide des workers
+    # (vide = désactivé) et délai minimal entre deux réécritures (secondes)
+    INDEX_SNAPSHOT_PATH = os.environ.get('INDEX_SNAPSHOT_PATH', '')
+    INDEX_SNAPSHOT_INTERVAL = float(os.environ.get('INDEX_SNAPSHOT_INTERVAL', 60))
+
+    # Répertoires exclus de la recherche d'hôtes et de la liste des répertoires
+    # (motifs fnmatch sur le nom du répertoire, séparés par des virgules)
+    EXCLUDED_DIRS = [pattern.strip() for pattern in
+                     os.environ.get('EXCLUDED_DIRS', 'objects,archives,.git,.svn,.hg').split(',') if pattern.strip()]
+
+    # Index des hôtes partagé entre les workers (base SQLite, vide = désactivé)
+    SHARED_INDEX_PATH = os.environ.get('SHARED_INDEX_PATH', '')
+
+    # Répertoire des fichiers de verrou des écritures (partagé par tous les
+    # workers, vide = .nagios-web-config-locks dans NAGIOS_BASE_PATH)
+    LOCK_DIR = os.environ.get('LOCK_DIR', '')
+
+    # Journal des modifications (base SQLite partagée par les workers, vide =
+    # en mémoire) et nombre d'entrées conservées
+    CHANGE_JOURNAL_PATH = os.environ.get('CHANGE_JOURNAL_PATH', '')
+    CHANGE_JOURNAL_SIZE = int(os.environ.get('CHANGE_JOURNAL_SIZE', 100000))
+
+    # Cache des résultats de "nagios -v" (nombre d'entrées, hachage du contenu des fichiers)
+    VALIDATION_CACHE_SIZE = int(os.environ.get('VALIDATION_CACHE_SIZE', 32))
+    VALIDATION_HASH_CONTENTS = os.environ.get('VALIDATION_HASH_CONTENTS', 'False').lower() == 'true'
+
+    # Vérifications rapides (modèles, commandes, contacts, doublons...) avant nagios -v
+    PRE_VALIDATION = os.environ.get('PRE_VALIDATION', 'True').lower() == 'true'
+
+    # Rechargement de Nagios : méthodes dans l'ordre de préférence (command_file,
+    # reload, restart), fichier de commandes externes et fenêtre de regroupement
+    # des demandes (secondes)
+    RELOAD_METHODS = [method.strip() for method in
+                      os.environ.get('RELOAD_METHODS', 'command_file,reload').split(',') if method.strip()]
+    NAGIOS_COMMAND_FILE = os.environ.get('NAGIOS_COMMAND_FILE') or '/usr/local/nagios/var/rw/nagios.cmd'
+    RELOAD_WINDOW = float(os.environ.get('RELOAD_WINDOW', 5))
+
+    # Métriques au format Prometheus sur /metrics, et en-tête Server-Timing
+    # (durée de chaque phase) ajouté à chaque réponse
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True').lower() == 'true'
+    SERVER_TIMING = os.environ.get('SERVER_TIMING', 'False').lower() == 'true'
+    # Jeton fixe accepté sur /metrics (Authorization: Bearer <jeton>) pour
+    # Prometheus, qui ne peut pas se connecter ; vide : authentification habituelle
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+    # Nombre de validations/redémarrages exécutés simultanément en tâche de fond
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
     
     # Fichier htpasswd Nagios pour l'authentification
     HTPASSWD_FILE = os.environ.get('HTPASSWD_FILE') or '/usr/local/nagios/etc/htpasswd.users'
+
+    # Durée (secondes) et taille du cache des identifiants vérifiés (0 = désactivé),
+    # durée de validité des jetons d'API
+    AUTH_CACHE_TTL = float(os.environ.get('AUTH_CACHE_TTL', 60))
+    AUTH_CACHE_SIZE = int(os.environ.get('AUTH_CACHE_SIZE', 256))
+    API_TOKEN_MAX_AGE = int(os.environ.get('API_TOKEN_MAX_AGE', 3600))
     
     # Configuration Flask
     DEBUG = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
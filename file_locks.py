@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import hashlib
+import os
+import stat
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:
+    # Hors Unix : verrous entre threads uniquement
+    fcntl = None
+
+# Nom du répertoire de verrous par défaut, créé dans le répertoire de configuration
+LOCK_DIR_NAME = '.nagios-web-config-locks'
+
+
+class _PathLock:
+    '''
+    Verrou d'un fichier : RLock entre les threads du processus, puis flock
+    exclusif sur un fichier de verrou entre les processus. Réentrant pour
+    le thread qui le détient
+    '''
+
+    def __init__(self, lock_path: str):
+        self.lock_path = lock_path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd: Optional[int] = None
+
+    def acquire(self, timeout: float):
+        deadline = time.monotonic() + timeout
+        if not self._thread_lock.acquire(timeout=timeout):
+            raise TimeoutError(f"Verrou {self.lock_path} non obtenu")
+
+        try:
+            if self._depth == 0 and fcntl is not None:
+                self._fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_NOFOLLOW', 0), 0o660)
+                self._flock(deadline)
+        except BaseException:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            self._thread_lock.release()
+            raise
+
+        self._depth += 1
+
+    def _flock(self, deadline: float):
+        while True:
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"Verrou {self.lock_path} détenu par un autre processus")
+                time.sleep(0.01)
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        self._thread_lock.release()
+
+
+class FileLockManager:
+    '''
+    Verrous d'écriture par fichier de configuration, entre threads et entre
+    processus (workers gunicorn). Les fichiers de verrou sont créés dans
+    lock_dir et non à côté des fichiers de configuration. Les lectures ne
+    prennent aucun verrou : les écritures étant atomiques (os.replace), un
+    lecteur voit toujours soit l'ancienne, soit la nouvelle version.
+
+    lock_dir doit appartenir à l'utilisateur courant (ou à root) et ne pas
+    être modifiable par tous : un autre utilisateur pourrait sinon y créer
+    les fichiers de verrou et bloquer les écritures
+    '''
+
+    def __init__(self, lock_dir: str, timeout: float = 30.0):
+        self.lock_dir = lock_dir
+        self.timeout = timeout
+        os.makedirs(lock_dir, mode=0o770, exist_ok=True)
+        _check_lock_dir(lock_dir)
+        self._locks: Dict[str, _PathLock] = {}
+        self._guard = threading.Lock()
+
+    def _get_lock(self, file_path: str) -> _PathLock:
+        key = os.path.realpath(file_path)
+        with self._guard:
+            lock = self._locks.get(key)
+            if lock is None:
+                digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+                lock = _PathLock(os.path.join(self.lock_dir, f"{digest}.lock"))
+                self._locks[key] = lock
+            return lock
+
+    @contextmanager
+    def lock(self, *file_paths: str) -> Iterator[None]:
+        '''
+        Verrouille un ou plusieurs fichiers pour une écriture. Les verrous
+        sont pris dans un ordre fixe pour éviter les interblocages
+        '''
+        locks = sorted({id(lock): lock for lock in map(self._get_lock, file_paths)}.values(),
+                       key=lambda lock: lock.lock_path)
+        acquired = []
+        try:
+            for lock in locks:
+                lock.acquire(self.timeout)
+                acquired.append(lock)
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+
+
+def _check_lock_dir(lock_dir: str):
+    '''Lève PermissionError si le répertoire de verrous n'est pas sûr'''
+    st = os.lstat(lock_dir)
+    if not stat.S_ISDIR(st.st_mode):
+        raise PermissionError(f"{lock_dir} n'est pas un répertoire")
+    if st.st_uid not in (os.geteuid(), 0):
+        raise PermissionError(f"Le répertoire de verrous {lock_dir} appartient à un autre utilisateur")
+    if st.st_mode & stat.S_IWOTH:
+        raise PermissionError(f"Le répertoire de verrous {lock_dir} est modifiable par tous")
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import csv
+import io
+import json
+from typing import Dict, Iterable, Iterator, List
+
+# Colonnes de l'export CSV quand fields n'est pas précisé
+CSV_FIELDS = ['host_name', 'alias', 'address', 'use', 'hostgroups', 'parents', 'check_command',
+              'contact_groups', 'contacts', 'directory', 'file_path']
+
+# Taille visée des morceaux de réponse (octets)
+CHUNK_SIZE = 64 * 1024
+
+
+def ndjson_chunks(records: Iterable[Dict], chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    '''Un objet JSON par ligne, regroupés en morceaux d'environ chunk_size octets'''
+    buffer = []
+    size = 0
+    for record in records:
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+        buffer.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+
+    if buffer:
+        yield b''.join(buffer)
+
+
+def csv_chunks(records: Iterable[Dict], fields: List[str], chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    '''CSV avec en-tête (colonnes fields), regroupé en morceaux d'environ chunk_size octets'''
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=fields, extrasaction='ignore', lineterminator='\r\n')
+    writer.writeheader()
+
+    for record in records:
+        writer.writerow(record)
+        if output.tell() >= chunk_size:
+            yield output.getvalue().encode('utf-8')
+            output.seek(0)
+            output.truncate()
+
+    if output.tell():
+        yield output.getvalue().encode('utf-8')
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import mmap
+import os
+import stat
+import struct
+import tempfile
+from typing import Any, Dict, Optional
+
+# En-tête : signature, version du format, taille des métadonnées (JSON)
+SNAPSHOT_MAGIC = b'NWMSNAP\0'
+# Version 2 : payload en JSON. La version 1 (pickle) exécutait du code
+# écrit dans le fichier par un tiers ; elle est ignorée
+SNAPSHOT_VERSION = 2
+_HEADER = struct.Struct('<8sII')
+
+
+def save_snapshot(path: str, meta: Dict, payload: Any) -> int:
+    '''
+    Écrit un instantané versionné : en-tête, métadonnées JSON puis payload
+    JSON (les tuples deviennent des listes). Le fichier est remplacé de
+    manière atomique et n'est lisible que par son propriétaire (0600).
+    Retourne la taille écrite
+    '''
+    meta_bytes = json.dumps(meta, sort_keys=True).encode('utf-8')
+    body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(meta_bytes)))
+            f.write(meta_bytes)
+            f.write(body)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    return _HEADER.size + len(meta_bytes) + len(body)
+
+
+def load_snapshot(path: str, meta: Dict) -> Optional[Any]:
+    '''
+    Charge un instantané projeté en mémoire (mmap). Retourne None s'il est
+    absent, illisible, d'une autre version du format, s'il n'appartient pas
+    à l'utilisateur courant ou est modifiable par d'autres, ou si ses
+    métadonnées ne correspondent pas à meta (autre configuration)
+    '''
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        print(f"Erreur lors de la lecture de {path}: {e}")
+        return None
+
+    with f:
+        st = os.fstat(f.fileno())
+        if st.st_uid != os.geteuid() or st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            print(f"Instantané {path} ignoré: il doit appartenir à l'utilisateur courant "
+                  f"et n'être modifiable que par lui")
+            return None
+
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Fichier vide
+            return None
+
+        with data:
+            try:
+                magic, version, meta_size = _HEADER.unpack_from(data)
+                if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                    return None
+
+                offset = _HEADER.size
+                if json.loads(data[offset:offset + meta_size]) != meta:
+                    return None
+
+                return json.loads(data[offset + meta_size:])
+
+            except Exception as e:
+                print(f"Instantané {path} ignoré: {e}")
+                return None
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+# Fonction exécutée par un job : reçoit un callback de sortie (une ligne à
+# la fois) et retourne (success, output), ou (success, output, result) avec
+# un résultat JSON exposé dans l'état du job
+JobFunction = Callable[[Callable[[str], None]], Tuple]
+
+
+class BackgroundTask:
+    '''
+    État et sortie d'une tâche exécutée en arrière-plan (job, lot de
+    rechargements) : statut, dates, lignes de sortie diffusées au fil de
+    l'eau et attente de la fin
+    '''
+
+    def __init__(self):
+        self.status = 'queued'
+        self.success: Optional[bool] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.lines: List[str] = []
+        self._condition = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ('succeeded', 'failed')
+
+    @property
+    def output(self) -> str:
+        with self._condition:
+            return ''.join(self.lines)
+
+    def append_output(self, line: str):
+        with self._condition:
+            self.lines.append(line)
+            self._condition.notify_all()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        '''Attend la fin de la tâche. Retourne False si le délai a expiré'''
+        with self._condition:
+            return self._condition.wait_for(lambda: self.finished, timeout)
+
+    def stream(self, keepalive: float = 15.0) -> Iterator[Optional[str]]:
+        '''
+        Produit les lignes de sortie au fil de l'eau jusqu'à la fin de la tâche.
+        Produit None quand aucune ligne n'est arrivée pendant keepalive secondes
+        '''
+        index = 0
+        while True:
+            with self._condition:
+                if index >= len(self.lines) and not self.finished:
+                    self._condition.wait(keepalive)
+                lines = self.lines[index:]
+                index += len(lines)
+                done = self.finished and index >= len(self.lines)
+
+            if lines:
+                yield from lines
+            elif not done:
+                yield None
+
+            if done:
+                return
+
+    def to_dict(self, include_output: bool = True) -> Dict:
+        result = {
+            'id': self.id,
+            'status': self.status,
+            'success': self.success,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+        if include_output:
+            result['output'] = self.output
+        return result
+
+    def _set_status(self, status: str, success: Optional[bool] = None):
+        with self._condition:
+            self.status = status
+            if status == 'running':
+                self.started_at = time.time()
+            elif self.finished:
+                self.success = success
+                self.finished_at = time.time()
+            self._condition.notify_all()
+
+
+class Job(BackgroundTask):
+    '''Tâche de fond (validation, redémarrage) et sa sortie'''
+
+    def __init__(self, job_type: str, key: Optional[Hashable] = None):
+        super().__init__()
+        self.id = uuid.uuid4().hex
+        self.type = job_type
+        self.key = key
+        self.result: Optional[Dict] = None
+
+    def to_dict(self, include_output: bool = True) -> Dict:
+        result = super().to_dict(include_output)
+        result['type'] = self.type
+        if self.result is not None:
+            result['result'] = self.result
+        return result
+
+
+class JobManager:
+    '''
+    Exécute les validations et redémarrages dans un pool borné de threads.
+    Deux demandes de même clé (par exemple une validation d'une configuration
+    inchangée) pendant qu'un job est en attente ou en cours partagent ce job
+    '''
+
+    def __init__(self, max_workers: int = 2, max_jobs: int = 100):
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='nagios-job')
+        self._jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self._active: Dict[Hashable, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, job_type: str, function: JobFunction, key: Optional[Hashable] = None) -> Job:
+        '''Soumet un job, ou retourne le job actif de même clé s'il existe'''
+        with self._lock:
+            if key is not None and key in self._active:
+                return self._active[key]
+
+            job = Job(job_type, key)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._active[key] = job
+            self._evict_finished()
+
+        self._executor.submit(self._run, job, function)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def _run(self, job: Job, function: JobFunction):
+        job._set_status('running')
+        try:
+            outcome = function(job.append_output)
+            success, output = outcome[:2]
+            if len(outcome) > 2:
+                job.result = outcome[2]
+            # Sortie non diffusée ligne par ligne (message d'erreur...)
+            if output and not job.lines:
+                job.append_output(output)
+        except Exception as e:
+            success = False
+            job.append_output(f"Erreur: {e}\n")
+        finally:
+            with self._lock:
+                if job.key is not None and self._active.get(job.key) is job:
+                    del self._active[job.key]
+
+        job._set_status('succeeded' if success else 'failed', success)
+
+    def _evict_finished(self):
+        '''Oublie les jobs terminés les plus anciens au-delà de max_jobs'''
+        excess = len(self._jobs) - self.max_jobs
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished][:max(excess, 0)]:
+            del self._jobs[job_id]
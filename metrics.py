@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Durée des phases de traitement (walk, parse, objects, write, validate, restart)
+PHASE_SECONDS = 'nagios_phase_seconds'
+# Durée des requêtes HTTP par route
+HTTP_SECONDS = 'nagios_http_request_seconds'
+FILES_PARSED = 'nagios_files_parsed_total'
+BYTES_READ = 'nagios_bytes_read_total'
+BYTES_WRITTEN = 'nagios_bytes_written_total'
+CACHE_LOOKUPS = 'nagios_cache_lookups_total'
+CACHE_HIT_RATIO = 'nagios_cache_hit_ratio'
+
+# Description des métriques : nom -> (type Prometheus, aide)
+DESCRIPTIONS = {
+    PHASE_SECONDS: ('histogram', 'Duration of processing phases (walk, parse, objects, write, validate, restart)'),
+    HTTP_SECONDS: ('histogram', 'Duration of HTTP requests by route'),
+    FILES_PARSED: ('counter', 'Configuration files parsed'),
+    BYTES_READ: ('counter', 'Bytes of configuration files parsed'),
+    BYTES_WRITTEN: ('counter', 'Bytes of configuration files written'),
+    CACHE_LOOKUPS: ('counter', 'Cache lookups by cache and result (hit, miss)'),
+    CACHE_HIT_RATIO: ('gauge', 'Ratio of cache lookups that were hits'),
+    'nagios_hosts': ('gauge', 'Hosts in the index'),
+    'nagios_host_files': ('gauge', 'Configuration files scanned for hosts'),
+    'nagios_index_generation': ('gauge', 'Generation of the host index'),
+    'nagios_objects_generation': ('gauge', 'Generation of the object store'),
+    'nagios_validation_cache_entries': ('gauge', 'Entries in the validation cache'),
+}
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+# Échantillon fourni par un collecteur : (nom, labels, valeur)
+Sample = Tuple[str, Dict[str, str], float]
+
+
+class _Histogram:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class Metrics:
+    '''
+    Registre de métriques en mémoire (compteurs, jauges, histogrammes)
+    exporté au format texte Prometheus. Les durées mesurées par timer()
+    pendant une requête suivie par begin_request() sont aussi cumulées par
+    phase pour l'en-tête Server-Timing de cette requête (par thread)
+    '''
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._gauges: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], _Histogram] = {}
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges[(name, _labels(labels))] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, _labels(labels))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(len(self.buckets) + 1)
+            histogram.counts[index] += 1
+            histogram.sum += value
+            histogram.count += 1
+
+    def cache_lookup(self, cache: str, hit: bool):
+        self.inc(CACHE_LOOKUPS, cache=cache, result='hit' if hit else 'miss')
+
+    @contextmanager
+    def timer(self, phase: str) -> Iterator[None]:
+        '''Mesure la durée d'une phase (histogramme et Server-Timing de la requête en cours)'''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe(PHASE_SECONDS, elapsed, phase=phase)
+            timings = getattr(self._local, 'timings', None)
+            if timings is not None:
+                timings[phase] = timings.get(phase, 0.0) + elapsed
+
+    def begin_request(self):
+        '''Commence le cumul des phases de la requête du thread courant'''
+        self._local.timings = {}
+
+    def end_request(self) -> Dict[str, float]:
+        '''Termine le cumul et retourne la durée (s) de chaque phase'''
+        timings = getattr(self._local, 'timings', None) or {}
+        self._local.timings = None
+        return timings
+
+    def add_collector(self, collector: Callable[[], Iterable[Sample]]):
+        '''Ajoute une fonction appelée à chaque export, qui fournit des jauges calculées'''
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        '''Export au format texte Prometheus (version 0.0.4)'''
+        gauges = []
+        for collector in self._collectors:
+            try:
+                gauges.extend(collector())
+            except Exception as e:
+                print(f"Erreur lors de la collecte des métriques: {e}")
+
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = [((name, _labels(labels)), value) for name, labels, value in gauges]
+            gauges.extend(self._gauges.items())
+            gauges.extend(self._hit_ratios(counters))
+            histograms = {key: (list(h.counts), h.sum, h.count) for key, h in self._histograms.items()}
+
+        families: Dict[str, List[str]] = {}
+        for (name, labels), value in sorted(counters.items()):
+            families.setdefault(name, []).append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for (name, labels), value in sorted(gauges):
+            families.setdefault(name, []).append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for (name, labels), (counts, total, count) in sorted(histograms.items()):
+            lines = families.setdefault(name, [])
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == math.inf else repr(bound)
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        output = []
+        for name, lines in families.items():
+            kind, help_text = DESCRIPTIONS.get(name, ('untyped', ''))
+            if help_text:
+                output.append(f"# HELP {name} {help_text}")
+            output.append(f"# TYPE {name} {kind}")
+            output.extend(lines)
+        return '\n'.join(output) + '\n'
+
+    @staticmethod
+    def _hit_ratios(counters: Dict) -> List:
+        lookups: Dict[str, List[float]] = {}
+        for (name, labels), value in counters.items():
+            if name == CACHE_LOOKUPS:
+                label_map = dict(labels)
+                totals = lookups.setdefault(label_map['cache'], [0, 0])
+                totals[0 if label_map['result'] == 'hit' else 1] += value
+
+        return [((CACHE_HIT_RATIO, (('cache', cache),)), hits / (hits + misses))
+                for cache, (hits, misses) in lookups.items() if hits + misses]
+
+
+def server_timing(timings: Dict[str, float], total: Optional[float] = None) -> str:
+    '''Valeur de l'en-tête Server-Timing (durées en millisecondes)'''
+    entries = [f"{phase};dur={elapsed * 1000:.1f}" for phase, elapsed in timings.items()]
+    if total is not None:
+        entries.append(f"total;dur={total * 1000:.1f}")
+    return ', '.join(entries)
+
+
+def _labels(labels: Dict) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    escaped = (f'{key}="{_escape(value)}"' for key, value in labels)
+    return '{' + ','.join(escaped) + '}'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from typing import AbstractSet, Dict, Iterable, List, Optional
+
+from object_store import ObjectStore
+
+# Directives d'un hôte qui référencent d'autres objets : directive -> (type, liste ?)
+HOST_REFERENCES = {
+    'use': ('host_template', True),
+    'parents': ('host', True),
+    'hostgroups': ('hostgroup', True),
+    'contacts': ('contact', True),
+    'contact_groups': ('contactgroup', True),
+    'check_period': ('timeperiod', False),
+    'notification_period': ('timeperiod', False),
+    'check_command': ('command', False),
+    'event_handler': ('command', False),
+}
+
+TYPE_LABELS = {
+    'host_template': 'modèle d\'hôte',
+    'host': 'hôte',
+    'hostgroup': 'groupe d\'hôtes',
+    'contact': 'contact',
+    'contactgroup': 'groupe de contacts',
+    'timeperiod': 'période',
+    'command': 'commande',
+}
+
+
+class ConfigChecker:
+    '''
+    Vérifications sémantiques rapides d'un hôte avant de lancer nagios -v :
+    modèles, commandes, contacts, groupes et périodes référencés doivent
+    exister dans le modèle objet, et le host_name ne doit pas être déjà utilisé.
+    '''
+
+    def __init__(self, store: ObjectStore):
+        self.store = store
+
+    def _known_names(self, object_type: str) -> AbstractSet[str]:
+        if object_type == 'host_template':
+            return self.store.template_names('host')
+        return self.store.names(object_type)
+
+    def check_host(self, host_data: Dict, original_host_name: Optional[str] = None,
+                   extra_hosts: Iterable[str] = ()) -> List[str]:
+        '''
+        Vérifie un hôte à créer (ou à mettre à jour si original_host_name est
+        fourni). extra_hosts liste des hôtes qui vont être créés en même temps.
+        Retourne la liste des erreurs (vide si tout est correct)
+        '''
+        errors = []
+        names = {object_type: self._known_names(object_type) for object_type in TYPE_LABELS}
+
+        host_name = host_data.get('host_name')
+        if not host_name:
+            errors.append("host_name est requis")
+        elif host_name != original_host_name and host_name in names['host']:
+            errors.append(f"L'hôte {host_name} existe déjà")
+
+        extra_hosts = set(extra_hosts)
+
+        for directive, (object_type, is_list) in HOST_REFERENCES.items():
+            value = (host_data.get(directive) or '').strip()
+            if not value:
+                continue
+
+            known = names[object_type]
+            # Aucun objet de ce type trouvé : défini ailleurs, on laisse nagios -v juger
+            if not known:
+                continue
+
+            for reference in self._split_references(value, directive, is_list):
+                if reference not in known and not (object_type == 'host' and reference in extra_hosts):
+                    errors.append(f"{directive} : {TYPE_LABELS[object_type]} « {reference} » introuvable")
+
+        return errors
+
+    def _split_references(self, value: str, directive: str, is_list: bool) -> List[str]:
+        '''Noms référencés par une valeur de directive'''
+        # "+" en tête : héritage additif
+        value = value.lstrip('+')
+
+        if directive in ('check_command', 'event_handler'):
+            # Les arguments suivent le nom de la commande après "!"
+            return [value.split('!', 1)[0].strip()]
+
+        if not is_list:
+            return [value]
+
+        references = []
+        for item in value.split(','):
+            item = item.strip().lstrip('!')
+            if item and item != 'null' and item != '*':
+                references.append(item)
+        return references
+
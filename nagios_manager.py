@@ -1,123 +1,960 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import atexit
+import base64
+import bisect
+import hashlib
+import json
+import multiprocessing
 import os
 import re
+import shutil
 import subprocess
-from typing import List, Dict, Optional
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Iterable, List, Dict, Optional, Tuple
+
+from cfg_includes import CfgIncludes, read_cfg_includes
+from change_journal import ChangeJournal
+from file_locks import LOCK_DIR_NAME, FileLockManager
+from index_snapshot import load_snapshot, save_snapshot
+from metrics import BYTES_READ, BYTES_WRITTEN, FILES_PARSED, Metrics
+from nagios_checker import ConfigChecker
+from nagios_parser import NagiosObject, compact_from_json, parse_host_file, parse_host_files, parse_objects
+from nagios_watcher import ConfigWatcher, is_excluded_dir
+from object_store import ObjectStore, included_file_stamps
+from reload_scheduler import build_reload_backends
+from shared_index import SharedIndex, SharedTransaction
+
+# Empreinte d'un fichier : (mtime en ns, taille, inode)
+FileStamp = Tuple[int, int, int]
+# Position d'un bloc dans son fichier : (début, fin)
+Span = Tuple[int, int]
+
+# Nombre minimal de fichiers à parser pour justifier un pool de processus
+PARALLEL_MIN_FILES = 64
+
+def _parse_context():
+    '''
+    Contexte du pool de parsing : forkserver (spawn à défaut). Un fork du
+    processus courant, qui a des threads (watcher, sauvegarde, jobs),
+    pourrait hériter d'un verrou détenu par l'un d'eux. Le serveur ne
+    précharge que le parseur et non le script principal, qui démarrerait
+    sinon ses propres services
+    '''
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(['nagios_parser'])
+    return context
+
+
+def _host_to_dict(host: NagiosObject) -> Dict:
+    '''Dictionnaire d'un hôte de l'index (directives, fichier et répertoire)'''
+    host_data = host.directives
+    host_data['file_path'] = host.file_path
+    host_data['directory'] = os.path.dirname(host.file_path)
+    return host_data
+
+
+def _host_field(host: NagiosObject, field: str, default: Optional[str] = '') -> Optional[str]:
+    '''Valeur d'une directive d'un hôte de l'index, file_path et directory compris'''
+    if field == 'file_path':
+        return host.file_path
+    if field == 'directory':
+        return os.path.dirname(host.file_path)
+    return host.get(field, default)
+
 
 class NagiosManager:
     '''
     Gestionnaire pour les fichiers de configuration Nagios Core
     '''
 
-    def __init__(self, nagios_base_path: str = '/usr/local/nagios/etc'):
+    def __init__(self, nagios_base_path: str = '/usr/local/nagios/etc', watch_changes: bool = False,
+                 parse_workers: int = 1, validation_cache_size: int = 32,
+                 validation_hash_contents: bool = False, snapshot_path: Optional[str] = None,
+                 snapshot_interval: float = 60.0, shared_index_path: Optional[str] = None,
+                 lock_dir: Optional[str] = None, reload_methods: Iterable[str] = ('command_file', 'reload'),
+                 command_file: str = '/usr/local/nagios/var/rw/nagios.cmd',
+                 metrics: Optional[Metrics] = None, journal_path: Optional[str] = None,
+                 journal_size: int = 100000, excluded_dirs: Iterable[str] = ('objects',)):
         self.nagios_base_path = nagios_base_path
         self.nagios_cfg = os.path.join(nagios_base_path, 'nagios.cfg')
         self.nagios_bin = '/usr/local/nagios/bin/nagios'
 
+        # Nombre de workers pour le chargement à froid (1 = séquentiel)
+        self.parse_workers = max(1, parse_workers)
+
+        # Cache des résultats de validation, indexé par l'empreinte de la
+        # configuration (nagios.cfg et tous les fichiers qu'il référence)
+        self.validation_cache_size = validation_cache_size
+        self.validation_hash_contents = validation_hash_contents
+        self._validation_cache: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._validation_lock = threading.Lock()
+        self._validation_hits = 0
+        self._validation_misses = 0
+
+        # Durées des phases (parcours, parsing, écriture, validation...),
+        # volumes lus/écrits et taux de succès des caches
+        self.metrics = metrics or Metrics()
+        self.metrics.add_collector(self._metrics_samples)
+
+        # Méthodes de rechargement de Nagios, dans l'ordre de préférence
+        # (remplaçables, par exemple par des doublures en test)
+        self.reload_backends = build_reload_backends(reload_methods, command_file, self._run_command)
+
+        # Modèle objet de toute la configuration (tous types, héritage résolu)
+        # et vérifications rapides avant nagios -v qui s'appuient dessus
+        self.objects = ObjectStore()
+        self._checker = ConfigChecker(self.objects)
+
+        # Verrous d'écriture par fichier, entre threads et entre processus
+        # (par défaut dans un répertoire caché de la configuration, ignoré
+        # par la recherche d'hôtes)
+        self._file_locks = FileLockManager(lock_dir or os.path.join(self.nagios_base_path, LOCK_DIR_NAME))
+
+        # Inclusions de nagios.cfg, relues seulement quand son empreinte change
+        self._cfg_includes: Optional[Tuple[FileStamp, CfgIncludes]] = None
+        self._cfg_includes_lock = threading.Lock()
+
+        # Journal des modifications (API et détectées sur le disque) : les
+        # modifications externes ne sont détectées qu'une fois l'index chargé,
+        # et journalisées en fin de rafraîchissement
+        self.journal = ChangeJournal(journal_path, journal_size)
+        self._journal_ready = False
+        self._detected_changes: List[Tuple[str, Optional[FileStamp], List[Dict]]] = []
+        self._journal_local = threading.local()
+        self._rollback_lock = threading.Lock()
+
+        # Rafraîchissements déjà faits pendant la requête HTTP en cours (par
+        # thread, entre begin_request et end_request) : l'index et le modèle
+        # objet ne sont revérifiés sur disque qu'une fois par requête
+        self._request_local = threading.local()
+
+        # Répertoires à exclure de la recherche d'hôtes et de la liste des
+        # répertoires (motifs fnmatch sur le nom du répertoire)
+        self.excluded_dirs = list(excluded_dirs)
+        if not lock_dir:
+            self.excluded_dirs.append(LOCK_DIR_NAME)
+
+        # Index des hôtes en mémoire, rafraîchi de manière incrémentale :
+        # seuls les fichiers dont l'empreinte a changé sont re-parsés
+        self._index_lock = threading.RLock()
+        # Ordre des verrous : verrous de fichiers, puis _index_lock (jamais
+        # l'inverse, les lecteurs ne doivent pas attendre un autre processus)
+        self._file_stamps: Dict[str, FileStamp] = {}
+        self._file_hosts: Dict[str, Dict[Span, NagiosObject]] = {}
+        self._file_order: List[str] = []
+        self._host_index: Dict[str, Tuple[str, Span]] = {}
+
+        # Sous-répertoires de la base, relevés lors du parcours complet (un
+        # répertoire créé ou supprimé en déclenche un avec la surveillance
+        # inotify), et leurs compteurs d'hôtes et de fichiers
+        self._directories: List[str] = []
+        self._directory_view: Optional[List[Dict]] = None
+
+        # Génération de l'index, incrémentée à chaque changement, et vues
+        # précalculées pour la recherche/le tri (reconstruites à la demande)
+        self._generation = 0
+        self._query_view: Optional[Dict] = None
+
+        # Surveillance optionnelle des modifications (inotify) : quand elle
+        # est active, seuls les fichiers signalés sont revérifiés
+        self._watcher: Optional[ConfigWatcher] = None
+        self._pending_paths = set()
+        self._needs_full_scan = True
+
+        # Index partagé optionnel entre processus (SQLite WAL) : un fichier
+        # modifié n'est parsé que par un seul worker, les autres relisent
+        # les lignes plus récentes que leur génération
+        self._shared: Optional[SharedIndex] = None
+        self._shared_generation = 0
+        self._shared_txn: Optional[SharedTransaction] = None
+        if shared_index_path:
+            self._shared = SharedIndex(shared_index_path, self._snapshot_meta())
+
+        # Instantané de l'index sur disque : un nouveau worker le recharge au
+        # lieu de tout parser, puis ne revérifie que les fichiers modifiés
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self._snapshot_saved_at: Optional[float] = None
+        self._snapshot_saving = False
+        self._snapshot_lock = threading.Lock()
+        if snapshot_path:
+            self.load_snapshot()
+            atexit.register(self.save_snapshot)
+
+        if watch_changes:
+            self.start_watcher()
+
     def find_host_files(self) -> List[str]:
         '''
         Recherche tous les fichiers .cfg contenant des définitions d'hôtes
         dans tous les sous-répertoires (sauf objects)
         '''
-        host_files = []
-        
-        # Répertoires à exclure
-        excluded_dirs = ['objects']
-        
-        for root, dirs, files in os.walk(self.nagios_base_path):
+        with self._index_lock:
+            self.refresh_index()
+            return [path for path in self._file_order if self._file_hosts.get(path)]
+
+    def _scan_cfg_files(self) -> Tuple[Dict[str, FileStamp], List[str]]:
+        '''
+        Parcourt l'arborescence et retourne l'empreinte de chaque fichier .cfg,
+        dans l'ordre du parcours, et la liste des sous-répertoires parcourus
+        '''
+        directories = []
+        if self.parse_workers <= 1:
+            return self._scan_directory(self.nagios_base_path, directories=directories), directories
+
+        # Les fichiers de la racine d'abord, puis chaque sous-répertoire
+        # parcouru dans un thread : l'ordre obtenu est celui d'os.walk
+        try:
+            root, dirs, files = next(os.walk(self.nagios_base_path))
+        except StopIteration:
+            return {}, directories
+
+        stamps = self._scan_directory(root, files=files)
+        subdirs = [os.path.join(root, d) for d in dirs if not is_excluded_dir(d, self.excluded_dirs)]
+
+        def scan(top):
+            found = []
+            return self._scan_directory(top, directories=found), found
+
+        with ThreadPoolExecutor(max_workers=self.parse_workers) as executor:
+            for sub_stamps, sub_directories in executor.map(scan, subdirs):
+                stamps.update(sub_stamps)
+                directories.extend(sub_directories)
+
+        return stamps, directories
+
+    def _scan_directory(self, top: str, files: Optional[List[str]] = None,
+                        directories: Optional[List[str]] = None) -> Dict[str, FileStamp]:
+        '''
+        Retourne l'empreinte des fichiers .cfg d'un répertoire et de ses
+        sous-répertoires, ou seulement des fichiers donnés s'ils sont précisés.
+        Les sous-répertoires parcourus sont ajoutés à directories
+        '''
+        stamps = {}
+
+        if files is not None:
+            walk = [(top, [], files)]
+        else:
+            walk = os.walk(top)
+
+        for root, dirs, files in walk:
             # Exclure les répertoires indésirables
-            dirs[:] = [d for d in dirs if d not in excluded_dirs]
-            
+            dirs[:] = [d for d in dirs if not is_excluded_dir(d, self.excluded_dirs)]
+            if directories is not None and root != self.nagios_base_path:
+                directories.append(root)
+
             for file in files:
                 if file.endswith('.cfg'):
                     file_path = os.path.join(root, file)
-                    if self._contains_host_definition(file_path):
-                        host_files.append(file_path)
-        
-        return host_files
+                    try:
+                        st = os.stat(file_path)
+                    except OSError:
+                        continue
+                    stamps[file_path] = (st.st_mtime_ns, st.st_size, st.st_ino)
 
+        return stamps
 
-    def _contains_host_definition(self, file_path: str) -> bool:
-        '''Vérifie si un fichier contient une définition d'hôte'''
-        try:
-            with open(file_path, 'r') as f:
-                content = f.read()
-                return 'define host' in content.lower()
-        except:
+    def refresh_index(self) -> bool:
+        '''
+        Met à jour l'index des hôtes : re-parse uniquement les fichiers
+        ajoutés ou modifiés et oublie les fichiers supprimés.
+        Retourne True si l'index a changé. Pendant une requête, seul le
+        premier appel (ou le premier après une écriture) revérifie le disque
+        '''
+        if self._is_fresh('index'):
             return False
 
-    def parse_host_file(self, file_path: str) -> List[Dict]:
+        with self._index_lock:
+            dirty = self._watcher.drain() if self._watcher else None
+            pending, self._pending_paths = self._pending_paths, set()
+
+            # Fichiers déjà indexés par un autre processus
+            synced = self._sync_shared()
+
+            if dirty is None or self._needs_full_scan:
+                self._needs_full_scan = False
+                changed = self._refresh_all()
+            else:
+                changed = self._refresh_paths(dirty | pending)
+
+            changed = changed or synced
+            self._flush_detected_changes()
+            self._journal_ready = True
+            self._mark_fresh('index')
+
+        if changed:
+            self._schedule_snapshot()
+        return changed
+
+    def _refresh_all(self) -> bool:
+        '''Rafraîchit l'index à partir d'un parcours complet de l'arborescence'''
+        with self.metrics.timer('walk'):
+            stamps, directories = self._scan_cfg_files()
+
+        with self._index_lock:
+            removed = set(self._file_hosts) - set(stamps)
+            stale = [(file_path, stamp) for file_path, stamp in stamps.items()
+                     if self._file_stamps.get(file_path) != stamp]
+            changed = bool(removed or stale)
+
+            if changed:
+                with self._shared_writes():
+                    for file_path in removed:
+                        self._forget_file(file_path)
+                        self._unshare_file(file_path)
+
+                    if self.parse_workers > 1 and len(stale) >= PARALLEL_MIN_FILES:
+                        self._index_files_parallel(stale)
+                    else:
+                        for file_path, stamp in stale:
+                            self._index_file(file_path, stamp)
+
+            file_order = list(stamps)
+            if file_order != self._file_order:
+                self._file_order = file_order
+                changed = True
+
+            directories.sort()
+            if directories != self._directories:
+                self._directories = directories
+                changed = True
+
+            if changed:
+                self._rebuild_host_index()
+                self._index_changed()
+
+            return changed
+
+    def _refresh_paths(self, paths: Iterable[str]) -> bool:
         '''
-        Parse un fichier de configuration et extrait toutes les définitions d'hôtes
+        Rafraîchit l'index pour les seuls fichiers signalés comme modifiés,
+        sans parcourir l'arborescence
         '''
-        hosts = []
+        with self._index_lock:
+            changed = False
+            paths = [file_path for file_path in paths if self._is_indexed_path(file_path)]
+            if not paths:
+                return False
+
+            with self._shared_writes():
+                for file_path in paths:
+                    try:
+                        st = os.stat(file_path)
+                    except OSError:
+                        st = None
+
+                    if st is None or not os.path.isfile(file_path):
+                        if file_path in self._file_hosts:
+                            self._forget_file(file_path)
+                            self._unshare_file(file_path)
+                            self._file_order.remove(file_path)
+                            changed = True
+                        continue
+
+                    stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
+                    if self._file_stamps.get(file_path) != stamp:
+                        if file_path not in self._file_hosts:
+                            self._file_order.append(file_path)
+                        self._index_file(file_path, stamp)
+                        changed = True
+
+            if changed:
+                self._rebuild_host_index()
+                self._index_changed()
+
+            return changed
+
+    def _is_indexed_path(self, file_path: str) -> bool:
+        '''Indique si un chemin fait partie des fichiers indexés'''
+        if not file_path.endswith('.cfg'):
+            return False
+
+        rel_path = os.path.relpath(file_path, self.nagios_base_path)
+        parts = rel_path.split(os.sep)
+        if parts[0] == os.pardir:
+            return False
+
+        return not any(is_excluded_dir(part, self.excluded_dirs) for part in parts[:-1])
+
+    def invalidate_index(self, file_path: Optional[str] = None):
+        '''
+        Invalide l'index pour un fichier, ou entièrement si aucun fichier
+        n'est précisé. Le prochain rafraîchissement re-parsera ces fichiers
+        '''
+        self._mark_stale()
+        with self._index_lock:
+            if file_path is None:
+                self._file_stamps.clear()
+                self._needs_full_scan = True
+            else:
+                self._file_stamps.pop(file_path, None)
+                self._pending_paths.add(file_path)
+
+    def start_watcher(self) -> bool:
+        '''
+        Démarre la surveillance inotify de l'arborescence.
+        Retourne False si elle est indisponible (parcours complet conservé)
+        '''
+        with self._index_lock:
+            if self._watcher:
+                return True
+
+            watcher = ConfigWatcher(self.nagios_base_path, self.excluded_dirs)
+            if not watcher.start():
+                return False
+
+            self._watcher = watcher
+            self._needs_full_scan = True
+            return True
+
+    def stop_watcher(self):
+        '''Arrête la surveillance inotify'''
+        with self._index_lock:
+            if self._watcher:
+                self._watcher.stop()
+                self._watcher = None
+
+    def _snapshot_meta(self) -> Dict:
+        '''Métadonnées qui doivent correspondre pour réutiliser un instantané'''
+        return {'base_path': self.nagios_base_path, 'excluded_dirs': self.excluded_dirs,
+                'nagios_cfg': self.nagios_cfg}
+
+    def load_snapshot(self) -> bool:
+        '''
+        Recharge l'index (hôtes et modèle objet) depuis l'instantané s'il
+        existe et correspond à cette configuration. Les empreintes sont
+        revérifiées au prochain rafraîchissement : seuls les fichiers
+        modifiés depuis l'instantané sont re-parsés
+        '''
+        if not self.snapshot_path:
+            return False
+
+        payload = load_snapshot(self.snapshot_path, self._snapshot_meta())
+        if payload is None:
+            return False
+
+        with self._index_lock:
+            self._file_stamps = {}
+            self._file_hosts = {}
+            for file_path, stamp, hosts in payload['hosts']:
+                self._file_stamps[file_path] = tuple(stamp)
+                self._file_hosts[file_path] = {
+                    host.span: host for host in (NagiosObject.from_compact(compact_from_json(compact), file_path)
+                                                 for compact in hosts)
+                }
+            self._file_order = [file_path for file_path, stamp, hosts in payload['hosts']]
+            self._needs_full_scan = True
+            # Les modifications faites depuis l'instantané seront journalisées
+            self._journal_ready = True
+            self._rebuild_host_index()
+            self._index_changed()
+
+        self.objects.restore_files([(file_path, tuple(stamp), [compact_from_json(obj) for obj in objects])
+                                    for file_path, stamp, objects in payload['objects']])
+        return True
+
+    def save_snapshot(self) -> bool:
+        '''Écrit l'instantané de l'index (hôtes et modèle objet) sur disque'''
+        if not self.snapshot_path:
+            return False
+
+        # Seule la copie compacte est faite sous le verrou, pas la sérialisation
+        with self._index_lock:
+            hosts = [(file_path, self._file_stamps[file_path],
+                      [host.to_compact() for host in self._file_hosts[file_path].values()])
+                     for file_path in self._file_order if file_path in self._file_stamps]
+        payload = {'hosts': hosts, 'objects': self.objects.export_files()}
 
         try:
-            with open(file_path, 'r') as f:
-                content = f.read()
+            save_snapshot(self.snapshot_path, self._snapshot_meta(), payload)
+        except Exception as e:
+            print(f"Erreur lors de l'écriture de l'instantané {self.snapshot_path}: {e}")
+            return False
+
+        self._snapshot_saved_at = time.monotonic()
+        return True
+
+    def _schedule_snapshot(self):
+        '''
+        Réécrit l'instantané en tâche de fond après un changement, au plus
+        une fois par snapshot_interval secondes
+        '''
+        if not self.snapshot_path:
+            return
+
+        with self._snapshot_lock:
+            if self._snapshot_saving or (self._snapshot_saved_at is not None and
+                                         time.monotonic() - self._snapshot_saved_at < self.snapshot_interval):
+                return
+            self._snapshot_saving = True
 
-            # Regex pour extraire les blocs define host
-            host_pattern = r'define\s+host\s*\{([^}]+)\}'
-            matches = re.finditer(host_pattern, content, re.DOTALL | re.IGNORECASE)
+        def save():
+            try:
+                self.save_snapshot()
+            finally:
+                self._snapshot_saving = False
 
-            for match in matches:
-                host_block = match.group(1)
-                host_data = self._parse_host_block(host_block)
-                host_data['file_path'] = file_path
-                host_data['directory'] = os.path.dirname(file_path)
-                hosts.append(host_data)
+        threading.Thread(target=save, name='nagios-snapshot', daemon=True).start()
 
+    def _index_file(self, file_path: str, stamp: FileStamp):
+        '''
+        Parse un fichier et met à jour son entrée dans l'index (ou reprend
+        les hôtes déjà parsés par un autre processus via l'index partagé)
+        '''
+        hosts = self._shared_hosts(file_path, stamp)
+        if hosts is None:
+            with self.metrics.timer('parse'):
+                hosts = parse_host_file(file_path)
+            self._count_parsed([stamp])
+            self._share_file(file_path, stamp, hosts)
+
+        self._store_file_hosts(file_path, stamp, hosts)
+
+    def _index_files_parallel(self, stale: List[Tuple[str, FileStamp]]):
+        '''
+        Parse un lot de fichiers dans un pool de processus. Les résultats
+        sont fusionnés dans l'ordre des fichiers, comme en séquentiel
+        '''
+        # Fichiers déjà parsés par un autre processus
+        unparsed = []
+        for file_path, stamp in stale:
+            hosts = self._shared_hosts(file_path, stamp)
+            if hosts is None:
+                unparsed.append((file_path, stamp))
+            else:
+                self._store_file_hosts(file_path, stamp, hosts)
+        stale = unparsed
+        if not stale:
+            return
+
+        file_paths = [file_path for file_path, stamp in stale]
+        batch_size = max(1, len(file_paths) // (self.parse_workers * 4))
+        batches = [file_paths[i:i + batch_size] for i in range(0, len(file_paths), batch_size)]
+
+        with self.metrics.timer('parse'), \
+                ProcessPoolExecutor(max_workers=self.parse_workers, mp_context=_parse_context()) as executor:
+            results = [entries for batch in executor.map(parse_host_files, batches)
+                       for entries in batch]
+        self._count_parsed(stamp for file_path, stamp in stale)
+
+        for (file_path, stamp), entries in zip(stale, results):
+            for host in entries:
+                # Chemin partagé par tous les hôtes du fichier
+                host.file_path = file_path
+            self._store_file_hosts(file_path, stamp, entries)
+            self._share_file(file_path, stamp, entries)
+
+    def _count_parsed(self, stamps: Iterable[FileStamp]):
+        '''Compte les fichiers parsés et leur taille (l'empreinte contient la taille)'''
+        sizes = [stamp[1] for stamp in stamps]
+        self.metrics.inc(FILES_PARSED, len(sizes), source='hosts')
+        self.metrics.inc(BYTES_READ, sum(sizes), source='hosts')
+
+    def _metrics_samples(self):
+        '''
+        Jauges calculées à chaque export des métriques. Lues sans verrou
+        (lectures d'attributs atomiques) : un export ne doit pas attendre la
+        fin d'une réindexation
+        '''
+        hosts, files = len(self._host_index), len(self._file_order)
+        generation = self._generation
+        validation_entries = len(self._validation_cache)
+
+        return [
+            ('nagios_hosts', {}, hosts),
+            ('nagios_host_files', {}, files),
+            ('nagios_index_generation', {}, generation),
+            ('nagios_objects_generation', {}, self.objects.generation),
+            ('nagios_validation_cache_entries', {}, validation_entries),
+        ]
+
+    @contextmanager
+    def _shared_writes(self):
+        '''
+        Regroupe les écritures dans l'index partagé en une transaction
+        exclusive : les fichiers indexés entre-temps par un autre processus
+        sont d'abord relus, pour ne pas les parser une seconde fois
+        '''
+        if self._shared is None or self._shared_txn is not None:
+            yield
+            return
+
+        with self._shared.transaction() as txn:
+            if self._apply_shared_changes(txn.changes_since(self._shared_generation)):
+                self._rebuild_host_index()
+                self._index_changed()
+            self._shared_txn = txn
+            try:
+                yield
+            finally:
+                self._shared_txn = None
+        self._shared_generation = txn.generation
+
+    def _sync_shared(self) -> bool:
+        '''Applique les fichiers indexés par d'autres processus. Retourne True si l'index a changé'''
+        if self._shared is None:
+            return False
+
+        generation, changes = self._shared.changes_since(self._shared_generation)
+        changed = self._apply_shared_changes(changes)
+        self._shared_generation = generation
+
+        if changed:
+            self._rebuild_host_index()
+            self._index_changed()
+        return changed
+
+    def _apply_shared_changes(self, changes: List) -> bool:
+        changed = False
+
+        for file_path, stamp, hosts in changes:
+            if stamp is None:
+                if file_path in self._file_hosts:
+                    self._forget_file(file_path)
+                    self._file_order.remove(file_path)
+                    changed = True
+            elif self._file_stamps.get(file_path) != stamp:
+                # Ne jamais remplacer une version plus récente (écrite par ce processus)
+                local_stamp = self._file_stamps.get(file_path)
+                if local_stamp is not None and stamp[0] <= local_stamp[0]:
+                    continue
+                if file_path not in self._file_hosts:
+                    self._file_order.append(file_path)
+                self._store_file_hosts(file_path, stamp,
+                                       (NagiosObject.from_compact(compact, file_path) for compact in hosts))
+                changed = True
+
+        return changed
+
+    def _shared_hosts(self, file_path: str, stamp: FileStamp) -> Optional[List[NagiosObject]]:
+        '''Hôtes d'un fichier déjà parsés par un autre processus (même empreinte)'''
+        if self._shared_txn is None:
+            return None
+        hosts = self._shared_txn.get(file_path, stamp)
+        self.metrics.cache_lookup('shared_index', hosts is not None)
+        if hosts is None:
+            return None
+        return [NagiosObject.from_compact(compact, file_path) for compact in hosts]
+
+    def _share_file(self, file_path: str, stamp: FileStamp, hosts: Iterable[NagiosObject]):
+        if self._shared_txn is not None:
+            self._shared_txn.put(file_path, stamp, [host.to_compact() for host in hosts])
+
+    def _unshare_file(self, file_path: str):
+        if self._shared_txn is not None:
+            self._shared_txn.remove(file_path)
+
+    def _forget_file(self, file_path: str):
+        '''Retire un fichier de l'index'''
+        self._file_stamps.pop(file_path, None)
+        hosts = self._file_hosts.pop(file_path, None)
+        if hosts and self._journal_ready:
+            self._detect_changes(file_path, None, hosts, {})
+
+    def _store_file_hosts(self, file_path: str, stamp: FileStamp, hosts: Iterable[NagiosObject]):
+        '''Remplace les hôtes indexés d'un fichier re-parsé (modification externe comprise)'''
+        entries = {host.span: host for host in hosts}
+        if self._journal_ready:
+            self._detect_changes(file_path, stamp, self._file_hosts.get(file_path, {}), entries)
+        self._file_hosts[file_path] = entries
+        self._file_stamps[file_path] = stamp
+
+    def _detect_changes(self, file_path: str, stamp: Optional[FileStamp], old: Dict[Span, NagiosObject],
+                        new: Dict[Span, NagiosObject]):
+        '''
+        Compare les hôtes d'un fichier avant et après sa modification sur le
+        disque. Les blocs sont régénérés à partir des directives (les
+        commentaires ne sont pas conservés). Une modification écrite par
+        l'application est ignorée lors de l'écriture dans le journal
+        '''
+        old_hosts = {host.get('host_name') or host.get('name'): host for host in old.values()}
+        new_hosts = {host.get('host_name') or host.get('name'): host for host in new.values()}
+        entries = []
+
+        for host_name, host in new_hosts.items():
+            previous = old_hosts.get(host_name)
+            if previous is None:
+                entries.append(self._change_entry('external', 'create', host_name, file_path,
+                                                  None, self._generate_host_config(host.directives)))
+            elif previous.directives != host.directives:
+                entries.append(self._change_entry('external', 'update', host_name, file_path,
+                                                  self._generate_host_config(previous.directives),
+                                                  self._generate_host_config(host.directives)))
+        for host_name, host in old_hosts.items():
+            if host_name not in new_hosts:
+                entries.append(self._change_entry('external', 'delete', host_name, file_path,
+                                                  self._generate_host_config(host.directives), None))
+
+        if entries:
+            self._detected_changes.append((file_path, stamp, entries))
+
+    def _flush_detected_changes(self):
+        '''Écrit dans le journal les modifications externes détectées (une transaction)'''
+        if not self._detected_changes:
+            return
+        detected, self._detected_changes = self._detected_changes, []
+        try:
+            self.journal.record_detected(detected)
         except Exception as e:
-            print(f"Erreur lors de la lecture de {file_path}: {e}")
+            print(f"Erreur lors de l'écriture du journal des modifications: {e}")
 
-        return hosts
+    def _index_changed(self):
+        '''Signale un changement de l'index : nouvelle génération, vues périmées'''
+        self._generation += 1
+        self._query_view = None
+        self._directory_view = None
 
-    def _parse_host_block(self, block: str) -> Dict:
-        '''Parse un bloc de définition d'hôte'''
-        host_data = {}
+    def index_generation(self) -> int:
+        '''Génération courante de l'index des hôtes (après rafraîchissement)'''
+        with self._index_lock:
+            self.refresh_index()
+            return self._generation
 
-        # Regex pour extraire les directives
-        directive_pattern = r'^\s*([a-z_]+)\s+(.+)$'
+    def _rebuild_host_index(self):
+        '''Reconstruit l'index host_name -> (fichier, position)'''
+        host_index = {}
 
-        for line in block.split('\n'):
-            line = line.strip()
-            # Ignorer les commentaires
-            if line.startswith('#') or not line:
-                continue
+        for file_path in self._file_order:
+            for span, host in self._file_hosts.get(file_path, {}).items():
+                host_name = host.get('host_name')
+                # En cas de doublon, la première définition rencontrée l'emporte
+                if host_name and host_name not in host_index:
+                    host_index[host_name] = (file_path, span)
 
-            match = re.match(directive_pattern, line, re.IGNORECASE)
-            if match:
-                key = match.group(1).strip()
-                value = match.group(2).strip()
-                # Enlever les commentaires en fin de ligne
-                if '#' in value:
-                    value = value[:value.index('#')].strip()
-                host_data[key] = value
+        self._host_index = host_index
 
-        return host_data
+    def parse_host_file(self, file_path: str) -> List[Dict]:
+        '''
+        Parse un fichier de configuration et extrait toutes les définitions d'hôtes
+        '''
+        return [_host_to_dict(host) for host in parse_host_file(file_path)]
 
     def get_all_hosts(self) -> List[Dict]:
         '''Récupère tous les hôtes configurés'''
         all_hosts = []
-        host_files = self.find_host_files()
 
-        for file_path in host_files:
-            hosts = self.parse_host_file(file_path)
-            all_hosts.extend(hosts)
+        with self._index_lock:
+            self.refresh_index()
+
+            for file_path in self._file_order:
+                all_hosts.extend(_host_to_dict(host) for host in self._file_hosts[file_path].values())
 
         return all_hosts
 
+    def iter_hosts(self, directory: Optional[str] = None,
+                   fields: Optional[List[str]] = None) -> Iterable[Dict]:
+        '''
+        Parcourt les hôtes fichier par fichier sans construire la liste
+        complète : l'index n'est verrouillé que le temps de relever les
+        fichiers, les dictionnaires sont produits au fur et à mesure.
+        directory (absolu ou relatif à la base) limite le parcours à ce
+        répertoire et ses sous-répertoires ; fields limite les champs
+        '''
+        prefix = None
+        if directory:
+            prefix = os.path.normpath(os.path.join(self.nagios_base_path, directory))
+
+        with self._index_lock:
+            self.refresh_index()
+            files = [(file_path, list(self._file_hosts[file_path].values()))
+                     for file_path in self._file_order
+                     if prefix is None or file_path.startswith(prefix + os.sep)]
+
+        for file_path, hosts in files:
+            for host in hosts:
+                if fields:
+                    yield {field: _host_field(host, field, None) for field in fields}
+                else:
+                    yield _host_to_dict(host)
+
+    def query_hosts(self, q: Optional[str] = None, sort: str = 'host_name', limit: Optional[int] = None,
+                    cursor: Optional[str] = None, fields: Optional[List[str]] = None,
+                    prefix: bool = False, facets: Optional[List[str]] = None) -> Dict:
+        '''
+        Recherche paginée dans les hôtes.
+            q       : sous-chaîne cherchée dans host_name, alias et address
+                      (ou préfixe de host_name si prefix est vrai)
+            sort    : directive de tri, préfixée par "-" pour un tri décroissant
+            limit   : nombre maximal d'hôtes retournés (tous si None)
+            cursor  : curseur opaque retourné par la page précédente
+            fields  : directives à retourner (toutes si None)
+            facets  : directives pour lesquelles compter les hôtes par valeur
+        Retourne {'hosts', 'total', 'next_cursor'} et 'facets' si demandé
+        '''
+        descending = sort.startswith('-')
+        sort_field = sort.lstrip('-') or 'host_name'
+
+        with self._index_lock:
+            self.refresh_index()
+            view = self._get_query_view()
+            hosts = view['hosts']
+            keys = self._get_sort_keys(view, sort_field)
+            order = view['orders'][sort_field]
+
+            # Filtrage sur les vues précalculées
+            if q:
+                needle = q.lower()
+                if prefix:
+                    names = view['names']
+                    first = bisect.bisect_left(names, (needle,))
+                    last = bisect.bisect_left(names, (needle + '\uffff',))
+                    matched = {position for name, position in names[first:last]}
+                else:
+                    matched = {position for position, text in enumerate(view['search']) if needle in text}
+                order = [position for position in order if position in matched]
+
+            if descending:
+                order = order[::-1]
+
+            total = len(order)
+            facet_counts = None
+            if facets:
+                facet_counts = {}
+                for facet in facets:
+                    counts = {}
+                    for position in order:
+                        value = _host_field(hosts[position], facet)
+                        counts[value] = counts.get(value, 0) + 1
+                    facet_counts[facet] = counts
+
+            # Pagination par clé : la page suivante commence après la clé du
+            # curseur (valeur triée, host_name), sans la position dans la vue
+            # qui change quand un hôte est ajouté ou supprimé avant
+            start = 0
+            if cursor:
+                cursor_key = self._decode_cursor(cursor)
+                page_keys = [keys[position][:2] for position in order]
+                if descending:
+                    start = len(page_keys) - bisect.bisect_left(page_keys[::-1], cursor_key)
+                else:
+                    start = bisect.bisect_right(page_keys, cursor_key)
+
+            end = total if limit is None else min(total, start + limit)
+            page = order[start:end]
+
+            if fields:
+                result_hosts = []
+                for position in page:
+                    values = ((field, _host_field(hosts[position], field, None)) for field in fields)
+                    result_hosts.append({field: value for field, value in values if value is not None})
+            else:
+                result_hosts = [_host_to_dict(hosts[position]) for position in page]
+
+            next_cursor = None
+            if page and end < total:
+                next_cursor = self._encode_cursor(keys[page[-1]][:2])
+
+        result = {'hosts': result_hosts, 'total': total, 'next_cursor': next_cursor}
+        if facet_counts is not None:
+            result['facets'] = facet_counts
+        return result
+
+    def _get_query_view(self) -> Dict:
+        '''
+        Vue précalculée de l'index pour les recherches : liste des hôtes,
+        textes de recherche en minuscules, noms triés et ordres de tri.
+        Reconstruite uniquement quand l'index change
+        '''
+        if self._query_view is None:
+            hosts = [host for file_path in self._file_order for host in self._file_hosts[file_path].values()]
+            self._query_view = {
+                'hosts': hosts,
+                'search': ['\0'.join((host.get('host_name', ''), host.get('alias', ''),
+                                      host.get('address', ''))).lower() for host in hosts],
+                'names': sorted((host.get('host_name', '').lower(), position)
+                                for position, host in enumerate(hosts)),
+                'keys': {},
+                'orders': {},
+            }
+        return self._query_view
+
+    def _get_sort_keys(self, view: Dict, field: str) -> List[Tuple]:
+        '''Clés de tri (uniques) d'une directive, calculées une fois par génération'''
+        if field not in view['keys']:
+            keys = [(_host_field(host, field).lower(), host.get('host_name', ''), position)
+                    for position, host in enumerate(view['hosts'])]
+            view['keys'][field] = keys
+            view['orders'][field] = sorted(range(len(keys)), key=keys.__getitem__)
+        return view['keys'][field]
+
+    def _encode_cursor(self, key: Tuple) -> str:
+        return base64.urlsafe_b64encode(json.dumps(list(key)).encode('utf-8')).decode('ascii')
+
+    def _decode_cursor(self, cursor: str) -> Tuple:
+        try:
+            # Les anciens curseurs contiennent aussi la position : ignorée
+            value, host_name = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))[:2]
+            return (str(value), str(host_name))
+        except Exception:
+            raise ValueError("Curseur invalide")
+
     def get_host_by_name(self, host_name: str) -> Optional[Dict]:
         '''Récupère un hôte par son nom'''
-        all_hosts = self.get_all_hosts()
+        with self._index_lock:
+            self.refresh_index()
+
+            entry = self._host_index.get(host_name)
+            if not entry:
+                return None
 
-        for host in all_hosts:
-            if host.get('host_name') == host_name:
-                return host
+            file_path, span = entry
+            return _host_to_dict(self._file_hosts[file_path][span])
 
-        return None
+    def get_effective_host(self, host_name: str) -> Optional[Dict]:
+        '''Attributs effectifs d'un hôte (chaîne use résolue), None si inconnu'''
+        store = self.refresh_objects()
+        host = store.get('host', host_name)
+        return store.effective(host) if host else None
+
+    def query_services(self, host_name: Optional[str] = None, q: Optional[str] = None,
+                       limit: Optional[int] = None, offset: int = 0, effective: bool = False) -> Dict:
+        '''
+        Liste les services (hors modèles) : ceux d'un hôte via l'index inverse
+        si host_name est fourni, filtrés par q (sous-chaîne de
+        service_description), paginés par limit/offset.
+        Retourne {'services', 'total', 'next_offset'}
+        '''
+        store = self.refresh_objects()
+
+        if host_name:
+            services = store.services_for_host(host_name)
+        else:
+            services = [service for service in store.objects('service')
+                        if service.get('register') != '0']
+
+        if q:
+            q = q.lower()
+            services = [service for service in services
+                        if q in store.effective(service).get('service_description', '').lower()]
+
+        end = len(services) if limit is None else offset + limit
+        page = services[offset:end]
+
+        return {
+            'services': [store.to_dict(service, effective) for service in page],
+            'total': len(services),
+            'next_offset': end if end < len(services) else None,
+        }
+
+    def get_templates(self, object_type: Optional[str] = None, effective: bool = False) -> List[Dict]:
+        '''Liste les modèles (définitions avec une directive name)'''
+        store = self.refresh_objects()
+        return [store.to_dict(template, effective) for template in store.templates(object_type)]
+
+    def get_template(self, object_type: str, name: str) -> Optional[Dict]:
+        '''Récupère un modèle avec ses attributs effectifs'''
+        store = self.refresh_objects()
+        template = store.get_template(object_type, name)
+        return store.to_dict(template, effective=True) if template else None
 
     def create_host(self, host_data: Dict, directory: str) -> bool:
         '''
@@ -128,34 +965,29 @@ class NagiosManager:
             if not host_name:
                 raise ValueError("host_name est requis")
 
-            # CORRECTION : gérer les chemins absolus et relatifs
-            if directory.startswith('/'):
-                # Chemin absolu déjà fourni
-                full_dir_path = directory
-            else:
-                # Chemin relatif, on le combine avec la base
-                full_dir_path = os.path.join(self.nagios_base_path, directory)
+            file_path = self._host_file_path(host_name, directory)
+            full_dir_path = os.path.dirname(file_path)
 
             # Vérifier que le répertoire existe, sinon le créer
             if not os.path.exists(full_dir_path):
                 os.makedirs(full_dir_path, mode=0o775)
 
-            # Chemin du fichier
-            file_path = os.path.join(full_dir_path, f"{host_name}.cfg")
-
-            # Vérifier que le fichier n'existe pas déjà
-            if os.path.exists(file_path):
-                raise FileExistsError(f"Le fichier {file_path} existe déjà")
-
             # Générer le contenu du fichier
-            content = self._generate_host_config(host_data)
+            content = self._generate_host_config(host_data).encode('utf-8')
 
-            # Écrire le fichier
-            with open(file_path, 'w') as f:
-                f.write(content)
+            with self._file_locks.lock(file_path, self.nagios_cfg):
+                # Vérifier que le fichier n'existe pas déjà
+                if os.path.exists(file_path):
+                    raise FileExistsError(f"Le fichier {file_path} existe déjà")
 
-            # Ajouter le fichier à nagios.cfg si nécessaire
-            self._add_cfg_file_to_nagios_cfg(file_path)
+                # Écrire le fichier
+                self._atomic_write(file_path, lambda dst: dst.write(content))
+                self.invalidate_index(file_path)
+
+                # Ajouter le fichier à nagios.cfg si nécessaire
+                added = self._add_cfg_file_to_nagios_cfg(file_path)
+                self._record_change('create', host_name, file_path, None, content,
+                                    cfg_file=file_path if added else None)
 
             return True
 
@@ -165,38 +997,34 @@ class NagiosManager:
             traceback.print_exc()
             return False
 
+    def _host_file_path(self, host_name: str, directory: str) -> str:
+        '''Chemin du fichier de configuration d'un nouvel hôte'''
+        # CORRECTION : gérer les chemins absolus et relatifs
+        if directory.startswith('/'):
+            # Chemin absolu déjà fourni
+            full_dir_path = directory
+        else:
+            # Chemin relatif, on le combine avec la base
+            full_dir_path = os.path.join(self.nagios_base_path, directory)
+
+        return os.path.join(full_dir_path, f"{host_name}.cfg")
+
     def update_host(self, original_host_name: str, host_data: Dict) -> bool:
         '''
         Met à jour un hôte existant
         '''
         try:
-            # Trouver l'hôte existant
-            existing_host = self.get_host_by_name(original_host_name)
-            if not existing_host:
-                raise ValueError(f"Hôte {original_host_name} introuvable")
-
-            file_path = existing_host['file_path']
+            new_block = self._generate_host_config(host_data).encode('utf-8')
+            host_name = host_data.get('host_name', original_host_name)
 
-            # Lire le fichier complet
-            with open(file_path, 'r') as f:
-                content = f.read()
+            # Trouver le bloc exact de l'hôte et remplacer uniquement ce bloc
+            old_host_name = original_host_name if host_name != original_host_name else None
+            self._replace_host_block(
+                original_host_name, new_block,
+                on_replaced=lambda file_path, before, cfg_file: self._record_change(
+                    'update', host_name, file_path, before, new_block, old_host_name=old_host_name))
 
-            # Remplacer le bloc de l'hôte
-            new_block = self._generate_host_config(host_data)
-
-            # Pattern pour trouver le bloc de l'hôte
-            pattern = r'define\s+host\s*\{[^}]+host_name\s+' + re.escape(original_host_name) + r'[^}]*\}'
-
-            if re.search(pattern, content, re.DOTALL | re.IGNORECASE):
-                new_content = re.sub(pattern, new_block, content, flags=re.DOTALL | re.IGNORECASE)
-
-                # Écrire le fichier mis à jour
-                with open(file_path, 'w') as f:
-                    f.write(new_content)
-
-                return True
-            else:
-                raise ValueError(f"Définition de l'hôte {original_host_name} introuvable dans {file_path}")
+            return True
 
         except Exception as e:
             print(f"Erreur lors de la mise à jour de l'hôte: {e}")
@@ -209,42 +1037,783 @@ class NagiosManager:
         Supprime un hôte
         '''
         try:
-            # Trouver l'hôte
-            host = self.get_host_by_name(host_name)
-            if not host:
-                raise ValueError(f"Hôte {host_name} introuvable")
-
-            file_path = host['file_path']
+            # Trouver le bloc exact de l'hôte et le retirer
+            self._replace_host_block(
+                host_name, b'',
+                on_replaced=lambda file_path, before, cfg_file: self._record_change(
+                    'delete', host_name, file_path, before, None, cfg_file=cfg_file))
 
-            # Lire le fichier
-            with open(file_path, 'r') as f:
-                content = f.read()
+            return True
 
-            # Supprimer le bloc de l'hôte
-            pattern = r'define\s+host\s*\{[^}]+host_name\s+' + re.escape(host_name) + r'[^}]*\}'
-            new_content = re.sub(pattern, '', content, flags=re.DOTALL | re.IGNORECASE)
+        except Exception as e:
+            print(f"Erreur lors de la suppression de l'hôte: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
 
-            # Si le fichier ne contient plus de définitions, le supprimer
-            if not self._contains_host_definition_in_text(new_content):
+    def _replace_host_block(self, host_name: str, replacement: bytes, expected: Optional[str] = None,
+                            on_replaced: Optional[Callable[[str, bytes, Optional[str]], None]] = None
+                            ) -> Tuple[str, bytes]:
+        '''
+        Remplace le bloc d'un hôte (le supprime si replacement est vide) et
+        retourne (fichier, ancien bloc). Un fichier qui ne contient plus de
+        définitions est supprimé, ainsi que sa ligne cfg_file dans
+        nagios.cfg. Si expected est précisé, le bloc actuel doit définir le
+        même hôte, sinon ValueError est levée.
+        on_replaced(fichier, ancien bloc, fichier retiré de nagios.cfg ou None)
+        est appelé avant la libération des verrous (journalisation avec
+        l'empreinte du fichier écrit)
+        '''
+        # nagios.cfg est verrouillé avec le fichier si celui-ci peut être supprimé
+        also = (self.nagios_cfg,) if not replacement else ()
+        with self._locked_host_block(host_name, *also) as (file_path, span):
+            before = self._read_block(file_path, span)
+            if expected is not None and not self._same_definition(before, expected):
+                raise ValueError(f"L'hôte {host_name} a été modifié depuis")
+
+            cfg_file = None
+            if replacement:
+                self._splice_file(file_path, span, replacement)
+            elif len(self._file_hosts[file_path]) == 1 and not self._has_other_definitions(file_path, span):
+                # Le fichier ne contient plus de définitions : le supprimer
                 os.remove(file_path)
+                self.invalidate_index(file_path)
+                if self._remove_cfg_files_from_nagios_cfg([file_path]):
+                    cfg_file = file_path
                 print(f"Fichier {file_path} supprimé")
             else:
-                # Sinon, réécrire le fichier sans l'hôte
-                with open(file_path, 'w') as f:
-                    f.write(new_content)
+                # Sinon, retirer uniquement le bloc de l'hôte
+                self._splice_file(file_path, span, b'')
                 print(f"Hôte {host_name} supprimé de {file_path}")
 
-            return True
+            if on_replaced:
+                on_replaced(file_path, before, cfg_file)
+            return (file_path, before)
+
+    def _insert_host_block(self, file_path: str, block: bytes) -> List[str]:
+        '''
+        Ajoute un bloc d'hôte à la fin d'un fichier, ou crée le fichier (et
+        l'ajoute à nagios.cfg) s'il n'existe plus. Appelé fichiers verrouillés.
+        Retourne les fichiers ajoutés à nagios.cfg
+        '''
+        with self._file_locks.lock(file_path, self.nagios_cfg):
+            try:
+                with open(file_path, 'rb') as f:
+                    original = f.read()
+            except FileNotFoundError:
+                original = None
+
+            if original is None:
+                os.makedirs(os.path.dirname(file_path), mode=0o775, exist_ok=True)
+                content = block
+            else:
+                separator = b'\n' if original and not original.endswith(b'\n') else b''
+                content = original + separator + block
+            if not content.endswith(b'\n'):
+                content += b'\n'
 
+            self._atomic_write(file_path, lambda dst: dst.write(content))
+            self.invalidate_index(file_path)
+            return self._add_cfg_file_to_nagios_cfg(file_path) if original is None else []
+
+    def changes_since(self, seq: int = 0, limit: Optional[int] = None, blocks: bool = True) -> Dict:
+        '''
+        Modifications journalisées après seq (les modifications externes
+        sont d'abord détectées par un rafraîchissement de l'index).
+        truncated indique que des entrées suivant seq ont été purgées :
+        le client doit alors tout relire
+        '''
+        self.refresh_index()
+        changes = self.journal.since(seq, limit, blocks)
+        first, last = self.journal.bounds()
+        return {
+            'changes': changes,
+            'last_seq': self.journal.last_seq(),
+            'next_since': changes[-1]['seq'] if changes else max(seq, last),
+            'truncated': bool(first) and seq < first - 1,
+        }
+
+    def rollback(self, count: int = 1) -> Tuple[bool, List[Dict]]:
+        '''
+        Annule les count dernières modifications faites par l'API, de la
+        plus récente à la plus ancienne, en rétablissant le bloc exact
+        d'avant chaque modification. S'arrête à la première modification
+        qui ne peut pas être annulée (hôte modifié depuis). Chaque annulation
+        est journalisée (source rollback). Retourne (succès, résultat par
+        modification)
+        '''
+        results = []
+        with self._rollback_lock:
+            self.refresh_index()
+            for entry in self.journal.last_mutations(count):
+                result = {'seq': entry['seq'], 'action': entry['action'], 'host_name': entry['host_name'],
+                          'success': True}
+                results.append(result)
+                try:
+                    with self._journal_source('rollback', entry['seq']):
+                        self._revert_change(entry)
+                except Exception as e:
+                    result.update(success=False, error=str(e))
+                    break
+
+        return (bool(results) and all(result['success'] for result in results), results)
+
+    def _revert_change(self, entry: Dict, record: bool = True):
+        '''Annule une entrée du journal (sans journaliser l'annulation si record est faux)'''
+        action, host_name, file_path = entry['action'], entry['host_name'], entry['file_path']
+        before = entry['before'].encode('utf-8') if entry['before'] is not None else None
+
+        if action == 'create':
+            self._replace_host_block(
+                host_name, b'', expected=entry['after'],
+                on_replaced=(lambda located_path, after, cfg_file: self._record_change(
+                    'delete', host_name, located_path, after, None, cfg_file=cfg_file)) if record else None)
+
+        elif action == 'update':
+            old_name = entry['old_host_name'] or host_name
+            if old_name != host_name and old_name in self._host_index:
+                raise ValueError(f"L'hôte {old_name} existe de nouveau")
+            self._replace_host_block(
+                host_name, before, expected=entry['after'],
+                on_replaced=(lambda located_path, after, cfg_file: self._record_change(
+                    'update', old_name, located_path, after, before,
+                    old_host_name=host_name if old_name != host_name else None)) if record else None)
+
+        elif action == 'delete':
+            with self._file_locks.lock(file_path, self.nagios_cfg):
+                self._mark_stale()
+                self.refresh_index()
+                if host_name in self._host_index:
+                    raise ValueError(f"L'hôte {host_name} existe de nouveau")
+                added = self._insert_host_block(file_path, before)
+                if record:
+                    self._record_change('create', host_name, file_path, None, before,
+                                        cfg_file=file_path if added else None)
+
+        else:
+            raise ValueError(f"Action inconnue : {action}")
+
+    @contextmanager
+    def _journal_source(self, source: str, reverts: Optional[int] = None):
+        '''Source (et entrée annulée) des modifications journalisées par le thread courant'''
+        self._journal_local.context = (source, reverts)
+        try:
+            yield
+        finally:
+            self._journal_local.context = None
+
+    def _change_entry(self, source: str, action: str, host_name: str, file_path: str, before, after,
+                      old_host_name: Optional[str] = None, reverts: Optional[int] = None,
+                      cfg_file: Optional[str] = None) -> Dict:
+        '''Entrée du journal (blocs en texte)'''
+        if isinstance(before, bytes):
+            before = before.decode('utf-8', 'replace')
+        if isinstance(after, bytes):
+            after = after.decode('utf-8', 'replace')
+        return {'source': source, 'action': action, 'host_name': host_name, 'old_host_name': old_host_name,
+                'file_path': file_path, 'before': before, 'after': after, 'cfg_file': cfg_file, 'reverts': reverts}
+
+    def _record_change(self, action: str, host_name: str, file_path: str, before, after,
+                       old_host_name: Optional[str] = None, cfg_file: Optional[str] = None):
+        '''
+        Journalise une modification faite par l'application, avec la nouvelle
+        empreinte du fichier : elle ne sera pas journalisée une seconde fois
+        comme modification externe
+        '''
+        source, reverts = getattr(self._journal_local, 'context', None) or ('api', None)
+        entry = self._change_entry(source, action, host_name, file_path, before, after, old_host_name, reverts,
+                                   cfg_file)
+        try:
+            self.journal.record([entry], {file_path: self._current_stamp(file_path)})
         except Exception as e:
-            print(f"Erreur lors de la suppression de l'hôte: {e}")
-            import traceback
-            traceback.print_exc()
+            print(f"Erreur lors de l'écriture du journal des modifications: {e}")
+
+    def _claim_written_files(self, file_paths: Iterable[str]) -> Dict[str, Optional[FileStamp]]:
+        '''Enregistre dans le journal l'empreinte des fichiers écrits par un lot et la retourne'''
+        stamps = {file_path: self._current_stamp(file_path) for file_path in file_paths}
+        try:
+            self.journal.claim_stamps(stamps)
+        except Exception as e:
+            print(f"Erreur lors de l'écriture du journal des modifications: {e}")
+        return stamps
+
+    @staticmethod
+    def _current_stamp(file_path: str) -> Optional[FileStamp]:
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def check_host(self, host_data: Dict, original_host_name: Optional[str] = None,
+                   extra_hosts: Iterable[str] = ()) -> List[str]:
+        '''
+        Vérifie un hôte sans lancer nagios -v : host_name unique, modèles
+        (use), commandes, contacts, groupes et périodes référencés existants.
+        Retourne la liste des erreurs (vide si tout est correct)
+        '''
+        self.refresh_objects()
+        return self._checker.check_host(host_data, original_host_name, extra_hosts)
+
+    def refresh_objects(self) -> ObjectStore:
+        '''
+        Met à jour le modèle objet à partir des fichiers inclus par nagios.cfg
+        (seuls les fichiers modifiés sont re-parsés) et le retourne. Pendant
+        une requête, seul le premier appel revérifie le disque
+        '''
+        if self._is_fresh('objects'):
+            return self.objects
+
+        cfg_files, cfg_dirs = self._read_nagios_cfg_includes()
+        with self.metrics.timer('walk'):
+            stamps = included_file_stamps(cfg_files, cfg_dirs)
+        with self.metrics.timer('objects'):
+            changed = self.objects.refresh(stamps)
+        if changed:
+            self._schedule_snapshot()
+        self._mark_fresh('objects')
+        return self.objects
+
+    def begin_request(self):
+        '''
+        Début d'une requête HTTP : jusqu'à end_request, refresh_index et
+        refresh_objects ne relisent le disque qu'une fois (de nouveau après
+        une écriture faite par la requête)
+        '''
+        self._request_local.fresh = set()
+
+    def end_request(self):
+        self._request_local.fresh = None
+
+    def _is_fresh(self, name: str) -> bool:
+        fresh = getattr(self._request_local, 'fresh', None)
+        return fresh is not None and name in fresh
+
+    def _mark_fresh(self, name: str):
+        fresh = getattr(self._request_local, 'fresh', None)
+        if fresh is not None:
+            fresh.add(name)
+
+    def _mark_stale(self):
+        '''Après une écriture : le prochain rafraîchissement de la requête relit le disque'''
+        fresh = getattr(self._request_local, 'fresh', None)
+        if fresh is not None:
+            fresh.clear()
+
+    def apply_bulk(self, operations: List[Dict], validate: bool = True,
+                   validator: Optional[Callable[[], tuple]] = None,
+                   precheck: bool = True) -> Tuple[bool, List[Dict], str]:
+        '''
+        Applique un lot d'opérations sur les hôtes :
+            {"action": "create", "host": {...}, "directory": "linux"}
+            {"action": "update", "host_name": "web1", "host": {...}}
+            {"action": "delete", "host_name": "web1"}
+
+        Les modifications sont regroupées par fichier (chaque fichier n'est
+        écrit qu'une fois) et la configuration n'est validée qu'une seule fois
+        à la fin (validator, par défaut validate_configuration). Si la
+        validation échoue, les modifications du lot sont annulées (voir
+        _restore_backups). Avec precheck,
+        chaque hôte créé ou modifié passe d'abord par check_host. Les
+        fichiers touchés restent verrouillés de l'écriture jusqu'à la fin de
+        la validation (ou de la restauration) et les opérations appliquées ne
+        sont journalisées qu'après la validation.
+        Retourne (success, résultat par opération, sortie de la validation)
+        '''
+        # Hôtes créés par le lot, utilisables comme parents
+        created = None
+        if precheck:
+            self.refresh_objects()
+            created = {(operation.get('host') or {}).get('host_name') for operation in operations
+                       if operation.get('action') == 'create'}
+
+        for attempt in range(3):
+            # Entrées du journal des opérations écrites, contenu d'origine et
+            # empreinte après écriture de chaque fichier touché
+            changes: List[Dict] = []
+            backups: Dict[str, Optional[bytes]] = {}
+            written: Dict[str, Optional[FileStamp]] = {}
+            with self._index_lock:
+                results, edits, new_files = self._plan_bulk(operations, created)
+
+            # Verrous des fichiers touchés (et de nagios.cfg) avant l'index,
+            # conservés jusqu'à la fin de la validation ou de la restauration
+            with self._file_locks.lock(*edits, *new_files, self.nagios_cfg):
+                error = None
+                with self._index_lock:
+                    # Un autre écrivain a pu déplacer les hôtes avant la prise des verrous
+                    self._mark_stale()
+                    self.refresh_index()
+                    if not self._bulk_plan_current(edits):
+                        continue
+
+                    try:
+                        self._write_bulk_changes(edits, new_files, results, backups, changes, written)
+                    except Exception as e:
+                        print(f"Erreur lors de l'écriture du lot: {e}")
+                        error = e
+
+                # Restauration hors du verrou de l'index (ordre : fichiers puis index)
+                if error is not None:
+                    self._restore_backups(backups, changes, written)
+                    self._fail_results(results, f"Annulé : {error}")
+                    return (False, results, '')
+
+                if not any(result['success'] for result in results):
+                    return (False, results, '')
+
+                output = ''
+                if validate:
+                    valid, output = (validator or self.validate_configuration)()
+                    if not valid:
+                        self._restore_backups(backups, changes, written)
+                        self._fail_results(results, 'Annulé : configuration invalide')
+                        return (False, results, output)
+
+                try:
+                    self.journal.record(changes)
+                except Exception as e:
+                    print(f"Erreur lors de l'écriture du journal des modifications: {e}")
+
+            return (all(result['success'] for result in results), results, output)
+
+        self._fail_results(results, 'Annulé : fichiers modifiés pendant la préparation du lot')
+        return (False, results, '')
+
+    def _plan_bulk(self, operations: List[Dict], created: Optional[set]) -> Tuple[List[Dict], Dict, Dict]:
+        '''
+        Prépare toutes les opérations d'un lot à partir de l'index. Retourne
+        (résultat par opération, modifications par fichier existant, nouveaux fichiers)
+        '''
+        results = []
+        # Fichier existant -> liste de (position, remplacement, host_name attendu, index)
+        edits: Dict[str, List[Tuple[Span, bytes, str, int]]] = {}
+        # Nouveau fichier -> (contenu, index)
+        new_files: Dict[str, Tuple[bytes, int]] = {}
+
+        self.refresh_index()
+        touched = set()
+        for index, operation in enumerate(operations):
+            result = {'index': index, 'action': operation.get('action'), 'success': True}
+            try:
+                result['host_name'] = self._plan_bulk_operation(operation, index, edits, new_files, touched,
+                                                                created)
+            except Exception as e:
+                result.update(success=False, error=str(e))
+            results.append(result)
+
+        return (results, edits, new_files)
+
+    def _bulk_plan_current(self, edits: Dict) -> bool:
+        '''Vérifie que les hôtes modifiés par un lot sont toujours aux positions prévues'''
+        return all(self._host_index.get(host_name) == (file_path, span)
+                   for file_path, file_edits in edits.items()
+                   for span, replacement, host_name, index in file_edits)
+
+    def _plan_bulk_operation(self, operation: Dict, index: int, edits: Dict, new_files: Dict, touched: set,
+                             created: Optional[set] = None) -> str:
+        '''
+        Prépare une opération d'un lot et retourne le nom de l'hôte concerné.
+        Si created est fourni (hôtes créés par le lot), l'hôte est vérifié
+        par le vérificateur avant d'être planifié
+        '''
+        action = operation.get('action')
+        host_data = operation.get('host') or {}
+
+        if action == 'create':
+            host_name = host_data.get('host_name')
+            directory = operation.get('directory')
+            if not host_name or not directory:
+                raise ValueError("host_name et directory sont requis")
+            if host_name in touched or (host_name in self._host_index):
+                raise ValueError(f"L'hôte {host_name} existe déjà")
+
+            file_path = self._host_file_path(host_name, directory)
+            if file_path in new_files or os.path.exists(file_path):
+                raise FileExistsError(f"Le fichier {file_path} existe déjà")
+            self._precheck_bulk_host(host_data, None, created)
+
+            new_files[file_path] = (self._generate_host_config(host_data).encode('utf-8'), index)
+            touched.add(host_name)
+            return host_name
+
+        if action not in ('update', 'delete'):
+            raise ValueError(f"Action inconnue : {action}")
+
+        host_name = operation.get('host_name') or host_data.get('host_name')
+        if not host_name:
+            raise ValueError("host_name est requis")
+        if host_name in touched:
+            raise ValueError(f"L'hôte {host_name} est déjà modifié par ce lot")
+
+        entry = self._host_index.get(host_name)
+        if not entry:
+            raise ValueError(f"Hôte {host_name} introuvable")
+
+        if action == 'update':
+            if not host_data:
+                raise ValueError("Données invalides")
+            new_name = host_data.get('host_name', host_name)
+            if new_name != host_name and (new_name in touched or new_name in self._host_index):
+                raise ValueError(f"L'hôte {new_name} existe déjà")
+            self._precheck_bulk_host(dict(host_data, host_name=new_name), host_name, created)
+            replacement = self._generate_host_config(host_data).encode('utf-8')
+            touched.add(new_name)
+        else:
+            replacement = b''
+
+        file_path, span = entry
+        edits.setdefault(file_path, []).append((span, replacement, host_name, index))
+        touched.add(host_name)
+        return host_name
+
+    def _precheck_bulk_host(self, host_data: Dict, original_host_name: Optional[str], created: Optional[set]):
+        '''Lève ValueError si le vérificateur trouve des erreurs'''
+        if created is None:
+            return
+        errors = self._checker.check_host(host_data, original_host_name, created)
+        if errors:
+            raise ValueError('; '.join(errors))
+
+    def _write_bulk_changes(self, edits: Dict, new_files: Dict, results: List[Dict], backups: Dict,
+                            changes: List[Dict], written: Dict):
+        '''
+        Écrit les modifications d'un lot, une seule écriture par fichier.
+        Le contenu d'origine de chaque fichier touché est conservé dans backups,
+        son empreinte après écriture dans written, et les entrées du journal
+        de chaque opération appliquée sont ajoutées à changes. Appelé fichiers
+        verrouillés
+        '''
+        try:
+            self._write_locked_bulk_changes(edits, new_files, results, backups, changes)
+        finally:
+            written.update(self._claim_written_files(backups))
+
+    def _write_locked_bulk_changes(self, edits: Dict, new_files: Dict, results: List[Dict], backups: Dict,
+                                   changes: List[Dict]):
+        '''Corps de _write_bulk_changes, appelé fichiers verrouillés'''
+        # Fichiers supprimés, dont la ligne cfg_file est retirée de nagios.cfg
+        removed = []
+        for file_path, file_edits in edits.items():
+            with open(file_path, 'rb') as f:
+                original = f.read()
+
+            content = original
+            applied = []
+            # De la fin vers le début pour que les positions restent valides
+            for (start, end), replacement, host_name, index in sorted(file_edits, reverse=True):
+                if not self._is_host_block(original[start:end], host_name):
+                    results[index].update(success=False, error=f"Hôte {host_name} modifié entre-temps")
+                    continue
+                content = content[:start] + replacement + content[end:]
+                applied.append((index, self._bulk_change_entry(file_path, host_name, original[start:end],
+                                                               replacement)))
+
+            if not applied:
+                continue
+            changes.extend(entry for index, entry in sorted(applied))
+
+            backups[file_path] = original
+            if re.search(rb'^[ \t]*define\b', content, re.MULTILINE | re.IGNORECASE):
+                self._atomic_write(file_path, lambda dst: dst.write(content))
+            else:
+                os.remove(file_path)
+                removed.append(file_path)
+            self.invalidate_index(file_path)
+
+        if not new_files and not removed:
+            return
+
+        with open(self.nagios_cfg, 'rb') as f:
+            cfg_backup = f.read()
+
+        written = []
+        for file_path, (content, index) in new_files.items():
+            full_dir_path = os.path.dirname(file_path)
+            if not os.path.exists(full_dir_path):
+                os.makedirs(full_dir_path, mode=0o775)
+
+            if os.path.exists(file_path):
+                results[index].update(success=False, error=f"Le fichier {file_path} existe déjà")
+                continue
+
+            backups[file_path] = None
+            self._atomic_write(file_path, lambda dst: dst.write(content))
+            self.invalidate_index(file_path)
+            written.append(file_path)
+            changes.append(self._change_entry('api', 'create', results[index]['host_name'], file_path,
+                                              None, content))
+
+        # Une seule réécriture de nagios.cfg pour tout le lot
+        added, removed = self._update_nagios_cfg_files(add=written, remove=removed)
+        if added or removed:
+            backups[self.nagios_cfg] = cfg_backup
+        for entry in changes:
+            if entry['file_path'] in (added if entry['action'] == 'create' else removed):
+                entry['cfg_file'] = entry['file_path']
+
+    def _bulk_change_entry(self, file_path: str, host_name: str, before: bytes, replacement: bytes) -> Dict:
+        '''Entrée du journal d'une modification ou suppression d'un lot'''
+        if not replacement:
+            return self._change_entry('api', 'delete', host_name, file_path, before, None)
+
+        new_name = next(parse_objects(replacement, ('host',))).get('host_name') or host_name
+        return self._change_entry('api', 'update', new_name, file_path, before, replacement,
+                                  old_host_name=host_name if new_name != host_name else None)
+
+    def _restore_backups(self, backups: Dict[str, Optional[bytes]], changes: List[Dict],
+                         written: Dict[str, Optional[FileStamp]]):
+        '''
+        Restaure les fichiers sauvegardés par _write_bulk_changes. Un fichier
+        modifié depuis son écriture par le lot (empreinte différente de
+        written, par exemple édité à la main pendant la validation) n'est pas
+        restauré en entier : seules les modifications du lot y sont annulées.
+        Appelé par apply_bulk avec les verrous des fichiers du lot déjà pris,
+        mais pas celui de l'index (toujours pris après les verrous de fichiers)
+        '''
+        for file_path, content in backups.items():
+            try:
+                if file_path in written and self._current_stamp(file_path) != written[file_path]:
+                    self._undo_bulk_changes(file_path, changes)
+                elif content is None:
+                    if os.path.exists(file_path):
+                        os.remove(file_path)
+                else:
+                    self._atomic_write(file_path, lambda dst: dst.write(content))
+            except (OSError, ValueError) as e:
+                print(f"Erreur lors de la restauration de {file_path}: {e}")
+            self.invalidate_index(file_path)
+        self._claim_written_files(backups)
+
+    def _undo_bulk_changes(self, file_path: str, changes: List[Dict]):
+        '''
+        Annule dans un fichier modifié entre-temps les seules opérations du
+        lot qui le concernent, de la dernière à la première (pour nagios.cfg :
+        les lignes cfg_file ajoutées ou retirées par le lot)
+        '''
+        if file_path == self.nagios_cfg:
+            cfg_files = [entry for entry in changes if entry['cfg_file']]
+            self._update_nagios_cfg_files(
+                add=[entry['file_path'] for entry in cfg_files
+                     if entry['action'] == 'delete' and os.path.exists(entry['file_path'])],
+                remove=[entry['file_path'] for entry in cfg_files
+                        if entry['action'] == 'create' and not os.path.exists(entry['file_path'])])
+            return
+
+        for entry in reversed(changes):
+            if entry['file_path'] == file_path:
+                try:
+                    self._revert_change(entry, record=False)
+                except ValueError as e:
+                    print(f"Erreur lors de l'annulation de {entry['action']} {entry['host_name']}: {e}")
+
+    def _fail_results(self, results: List[Dict], error: str):
+        '''Marque en échec toutes les opérations réussies d'un lot annulé'''
+        for result in results:
+            if result['success']:
+                result.update(success=False, error=error)
+
+    def _locate_host_block(self, host_name: str) -> Tuple[str, Span]:
+        '''
+        Retourne le fichier et la position du bloc d'un hôte, après avoir
+        vérifié sur disque que la position indexée est toujours valide
+        '''
+        for attempt in range(2):
+            # Une écriture relit toujours le disque, même pendant une requête
+            self._mark_stale()
+            self.refresh_index()
+
+            entry = self._host_index.get(host_name)
+            if not entry:
+                break
+
+            if self._block_on_disk_matches(entry[0], entry[1], host_name):
+                return entry
+
+            # Le fichier a changé depuis la dernière indexation
+            self.invalidate_index(entry[0])
+
+        raise ValueError(f"Hôte {host_name} introuvable")
+
+    @contextmanager
+    def _locked_host_block(self, host_name: str, *also: str):
+        '''
+        Localise le bloc d'un hôte et verrouille son fichier (et les fichiers
+        also) en écriture, puis l'index. La position est revérifiée sous les verrous : un autre
+        processus a pu modifier le fichier entre-temps
+        '''
+        for attempt in range(3):
+            with self._index_lock:
+                file_path, span = self._locate_host_block(host_name)
+
+            # Verrou du fichier d'abord, puis l'index : les lecteurs ne sont
+            # pas bloqués pendant l'attente du verrou entre processus
+            with self._file_locks.lock(file_path, *also), self._index_lock:
+                if not self._block_on_disk_matches(file_path, span, host_name):
+                    self.invalidate_index(file_path)
+                    located_path, span = self._locate_host_block(host_name)
+                    if located_path != file_path:
+                        # L'hôte a changé de fichier : verrouiller le bon
+                        continue
+
+                yield (file_path, span)
+                return
+
+        raise ValueError(f"Hôte {host_name} introuvable")
+
+    def _block_on_disk_matches(self, file_path: str, span: Span, host_name: str) -> bool:
+        '''Vérifie que la position donnée contient toujours la définition de l'hôte'''
+        try:
+            block = self._read_block(file_path, span)
+        except OSError:
             return False
 
-    def _contains_host_definition_in_text(self, text: str) -> bool:
-        '''Vérifie si le texte contient une définition d'hôte'''
-        return bool(re.search(r'define\s+host\s*\{', text, re.IGNORECASE))
+        return self._is_host_block(block, host_name)
+
+    @staticmethod
+    def _read_block(file_path: str, span: Span) -> bytes:
+        start, end = span
+        with open(file_path, 'rb') as f:
+            f.seek(start)
+            return f.read(end - start)
+
+    @staticmethod
+    def _same_definition(block: bytes, expected: str) -> bool:
+        '''Vérifie qu'un bloc définit un seul hôte, avec les mêmes directives que expected'''
+        current = list(parse_objects(block, ('host',)))
+        wanted = list(parse_objects(expected.encode('utf-8'), ('host',)))
+        return len(current) == len(wanted) == 1 and current[0].directives == wanted[0].directives
+
+    def _is_host_block(self, block: bytes, host_name: str) -> bool:
+        '''Vérifie qu'un bloc lu sur disque est exactement la définition de l'hôte'''
+        objects = list(parse_objects(block, ('host',)))
+        return len(objects) == 1 and objects[0].span == (0, len(block)) \
+            and objects[0].get('host_name') == host_name
+
+    def _has_other_definitions(self, file_path: str, span: Span) -> bool:
+        '''Vérifie si un fichier contient d'autres définitions que le bloc donné'''
+        start, end = span
+        with open(file_path, 'rb') as f:
+            content = f.read(start)
+            f.seek(end)
+            content += f.read()
+
+        return bool(re.search(rb'^[ \t]*define\b', content, re.MULTILINE | re.IGNORECASE))
+
+    def _splice_file(self, file_path: str, span: Span, replacement: bytes):
+        '''
+        Remplace la région span d'un fichier par replacement, via un fichier
+        temporaire et os.replace, puis met à jour l'index de ce fichier
+        sans le re-parser
+        '''
+        start, end = span
+
+        def write_content(dst):
+            with open(file_path, 'rb') as src:
+                remaining = start
+                while remaining > 0:
+                    chunk = src.read(min(remaining, 1024 * 1024))
+                    if not chunk:
+                        break
+                    dst.write(chunk)
+                    remaining -= len(chunk)
+
+                dst.write(replacement)
+                src.seek(end)
+                shutil.copyfileobj(src, dst)
+
+        with self._file_locks.lock(file_path):
+            self._atomic_write(file_path, write_content)
+            self._update_index_after_splice(file_path, span, replacement)
+
+    def _atomic_write(self, file_path: str, write_content):
+        '''
+        Écrit un fichier de manière atomique : write_content(f) remplit un
+        fichier temporaire du même répertoire, qui remplace ensuite le fichier
+        d'origine via os.replace. Les droits du fichier d'origine sont conservés
+        '''
+        try:
+            st = os.stat(file_path)
+        except FileNotFoundError:
+            st = None
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(file_path),
+                                        prefix=f".{os.path.basename(file_path)}.", suffix='.tmp')
+        try:
+            with self.metrics.timer('write'), os.fdopen(fd, 'wb') as dst:
+                write_content(dst)
+                dst.flush()
+                os.fsync(dst.fileno())
+                self.metrics.inc(BYTES_WRITTEN, dst.tell())
+
+            if st is not None:
+                # Conserver les droits (et si possible le propriétaire) du fichier d'origine
+                os.chmod(tmp_path, st.st_mode & 0o7777)
+                try:
+                    os.chown(tmp_path, st.st_uid, st.st_gid)
+                except OSError:
+                    pass
+            else:
+                os.chmod(tmp_path, 0o664)
+
+            os.replace(tmp_path, file_path)
+            self._mark_stale()
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _update_index_after_splice(self, file_path: str, span: Span, replacement: bytes):
+        '''
+        Met à jour l'entrée d'index d'un fichier modifié par _splice_file :
+        le bloc remplacé est re-parsé seul, les suivants sont décalés
+        '''
+        start, end = span
+        delta = len(replacement) - (end - start)
+        new_entries = {}
+        renamed = False
+
+        for old_span, host in self._file_hosts.get(file_path, {}).items():
+            if old_span == span:
+                old_name = host.get('host_name')
+                for new_host in parse_objects(replacement, ('host',)):
+                    new_host.file_path = host.file_path
+                    new_host.start += start
+                    new_host.end += start
+                    new_entries[new_host.span] = new_host
+                    renamed = renamed or new_host.get('host_name') != old_name
+                if not replacement:
+                    renamed = True
+            elif old_span[0] >= end:
+                host.start += delta
+                host.end += delta
+                new_entries[host.span] = host
+            else:
+                new_entries[old_span] = host
+
+        st = os.stat(file_path)
+        self._file_hosts[file_path] = new_entries
+        self._file_stamps[file_path] = (st.st_mtime_ns, st.st_size, st.st_ino)
+        self._index_changed()
+
+        if renamed:
+            self._rebuild_host_index()
+        else:
+            # Même nom : seules les positions de ce fichier changent
+            for host_name in {host.get('host_name') for host in new_entries.values()}:
+                indexed = self._host_index.get(host_name)
+                if indexed and indexed[0] == file_path:
+                    old_span = indexed[1]
+                    if old_span == span:
+                        self._host_index[host_name] = (file_path, (start, start + len(replacement)))
+                    elif old_span[0] >= end:
+                        self._host_index[host_name] = (file_path, (old_span[0] + delta, old_span[1] + delta))
+
+        # Publier la nouvelle version du fichier aux autres processus
+        with self._shared_writes():
+            self._share_file(file_path, self._file_stamps[file_path], new_entries.values())
 
     def _generate_host_config(self, host_data: Dict) -> str:
         '''Génère le contenu de configuration pour un hôte'''
@@ -274,77 +1843,309 @@ class NagiosManager:
 
         return '\n'.join(lines)
 
-    def _add_cfg_file_to_nagios_cfg(self, file_path: str):
+    def _add_cfg_file_to_nagios_cfg(self, file_path: str) -> List[str]:
         '''
         Ajoute un fichier de configuration à nagios.cfg si nécessaire
         '''
+        return self._add_cfg_files_to_nagios_cfg([file_path])
+
+    def _add_cfg_files_to_nagios_cfg(self, file_paths: List[str]) -> List[str]:
+        '''
+        Ajoute en une seule réécriture de nagios.cfg les fichiers qu'il ne
+        charge pas encore (ni par cfg_file, ni par un cfg_dir parent).
+        Retourne les fichiers ajoutés
+        '''
+        return self._update_nagios_cfg_files(add=file_paths)[0]
+
+    def _remove_cfg_files_from_nagios_cfg(self, file_paths: List[str]) -> List[str]:
+        '''
+        Retire de nagios.cfg les lignes cfg_file de fichiers supprimés (nagios -v
+        échouerait sinon). Retourne les fichiers retirés
+        '''
+        return self._update_nagios_cfg_files(remove=file_paths)[1]
+
+    def _update_nagios_cfg_files(self, add: Iterable[str] = (),
+                                 remove: Iterable[str] = ()) -> Tuple[List[str], List[str]]:
+        '''
+        Ajoute et retire des lignes cfg_file de nagios.cfg en une seule
+        réécriture. Retourne (fichiers ajoutés, fichiers retirés)
+        '''
         try:
-            with open(self.nagios_cfg, 'r') as f:
-                content = f.read()
+            with self._file_locks.lock(self.nagios_cfg):
+                includes = self.cfg_includes()
+                missing = [path for path in dict.fromkeys(add) if not includes.covers(path)]
+                unwanted = {includes.normalize(path) for path in remove}
+
+                with open(self.nagios_cfg, 'rb') as f:
+                    lines = f.read().splitlines(keepends=True)
+
+                kept, removed = [], []
+                for line in lines:
+                    key, separator, value = line.decode('utf-8', 'replace').strip().partition('=')
+                    if separator and key.strip() == 'cfg_file' and includes.normalize(value.strip()) in unwanted:
+                        removed.append(includes.normalize(value.strip()))
+                        continue
+                    kept.append(line)
+
+                if not missing and not removed:
+                    return ([], [])
+
+                content = b''.join(kept)
+                if content and not content.endswith(b'\n'):
+                    content += b'\n'
+                content += ''.join(f"cfg_file={path}\n" for path in missing).encode('utf-8')
+
+                # Réécriture atomique, puis mise à jour du cache sans relire le
+                # fichier (relu au prochain accès si des lignes ont été retirées)
+                self._atomic_write(self.nagios_cfg, lambda dst: dst.write(content))
+                st = os.stat(self.nagios_cfg)
+                with self._cfg_includes_lock:
+                    self._cfg_includes = None if removed else \
+                        ((st.st_mtime_ns, st.st_size, st.st_ino), includes.with_files(missing))
+                return (missing, removed)
 
-            # Vérifier si le fichier ou son répertoire est déjà référencé
-            directory = os.path.dirname(file_path)
+        except Exception as e:
+            print(f"Erreur lors de la mise à jour de nagios.cfg: {e}")
+            return ([], [])
 
-            # Vérifier cfg_dir
-            if f"cfg_dir={directory}" in content:
-                return  # Le répertoire est déjà inclus
+    def config_fingerprint(self) -> str:
+        '''
+        Empreinte de la configuration vue par nagios -v : nagios.cfg, le
+        binaire nagios et chaque fichier référencé par cfg_file, cfg_dir ou
+        resource_file (chemin, mtime, taille, inode, et contenu si
+        validation_hash_contents est actif). Deux validations de même
+        empreinte donnent le même résultat
+        '''
+        digest = hashlib.sha1()
+
+        cfg_files, cfg_dirs = self._read_nagios_cfg_includes()
+        paths = [self.nagios_bin, self.nagios_cfg] + cfg_files
+        for cfg_dir in cfg_dirs:
+            for root, dirs, files in os.walk(cfg_dir):
+                dirs.sort()
+                paths.extend(os.path.join(root, file) for file in sorted(files) if file.endswith('.cfg'))
+
+        for path in paths:
+            digest.update(path.encode('utf-8', 'surrogateescape'))
+            try:
+                st = os.stat(path)
+            except OSError:
+                digest.update(b'\0missing')
+                continue
 
-            # Vérifier cfg_file
-            if f"cfg_file={file_path}" in content:
-                return  # Le fichier est déjà inclus
+            digest.update(f"\0{st.st_mtime_ns}:{st.st_size}:{st.st_ino}".encode('ascii'))
+            if self.validation_hash_contents and path != self.nagios_bin:
+                with open(path, 'rb') as f:
+                    digest.update(hashlib.sha1(f.read()).digest())
 
-            # Ajouter une ligne cfg_file
-            with open(self.nagios_cfg, 'a') as f:
-                f.write(f"\ncfg_file={file_path}\n")
+        return digest.hexdigest()
 
-        except Exception as e:
-            print(f"Erreur lors de l'ajout à nagios.cfg: {e}")
+    def _read_nagios_cfg_includes(self) -> Tuple[List[str], List[str]]:
+        '''
+        Retourne (fichiers, répertoires) inclus par nagios.cfg
+        (cfg_file/resource_file, cfg_dir), en chemins absolus
+        '''
+        includes = self.cfg_includes()
+        return (includes.files, includes.dirs)
 
-    def validate_configuration(self) -> tuple:
+    def cfg_includes(self) -> CfgIncludes:
+        '''
+        Inclusions de nagios.cfg, analysées une fois puis réutilisées tant que
+        le fichier ne change pas (mtime, taille, inode)
+        '''
+        with self._cfg_includes_lock:
+            try:
+                st = os.stat(self.nagios_cfg)
+                stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
+                hit = self._cfg_includes is not None and self._cfg_includes[0] == stamp
+                self.metrics.cache_lookup('nagios_cfg', hit)
+                if hit:
+                    return self._cfg_includes[1]
+
+                includes = read_cfg_includes(self.nagios_cfg)
+            except OSError as e:
+                print(f"Erreur lors de la lecture de {self.nagios_cfg}: {e}")
+                return CfgIncludes(os.path.dirname(self.nagios_cfg))
+
+            self._cfg_includes = (stamp, includes)
+            return includes
+
+    def validate_configuration(self, on_output: Optional[Callable[[str], None]] = None,
+                               use_cache: bool = True, fingerprint: Optional[str] = None) -> tuple:
         '''
         Valide la configuration Nagios
+        on_output, si fourni, reçoit chaque ligne de sortie au fil de l'eau.
+        Le résultat est réutilisé tant que l'empreinte de la configuration
+        ne change pas. fingerprint évite de recalculer une empreinte que
+        l'appelant vient d'obtenir ; elle est recalculée après l'exécution
+        et le résultat n'est mémorisé que si elle est inchangée
         Retourne (success: bool, output: str)
         '''
         try:
-            result = subprocess.run(
-                [self.nagios_bin, '-v', self.nagios_cfg],
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-
-            return (result.returncode == 0, result.stdout + result.stderr)
+            if not use_cache:
+                fingerprint = None
+            elif fingerprint is None:
+                fingerprint = self.config_fingerprint()
+
+            if fingerprint is not None:
+                with self._validation_lock:
+                    cached = self._validation_cache.get(fingerprint)
+                    if cached is not None:
+                        self._validation_cache.move_to_end(fingerprint)
+                        self._validation_hits += 1
+                    else:
+                        self._validation_misses += 1
+                self.metrics.cache_lookup('validation', cached is not None)
+
+                if cached is not None:
+                    if on_output:
+                        for line in cached[1].splitlines(keepends=True):
+                            on_output(line)
+                    return cached
+
+            with self.metrics.timer('validate'):
+                result = self._run_command([self.nagios_bin, '-v', self.nagios_cfg], on_output)
+
+            # Mémorisé seulement si la configuration n'a pas changé depuis le
+            # calcul de l'empreinte (job resté en file, fichiers modifiés
+            # pendant nagios -v) : le résultat ne correspondrait à aucune
+            # des deux versions
+            if fingerprint is not None and self.config_fingerprint() == fingerprint:
+                with self._validation_lock:
+                    self._validation_cache[fingerprint] = result
+                    while len(self._validation_cache) > self.validation_cache_size:
+                        self._validation_cache.popitem(last=False)
+
+            return result
 
         except Exception as e:
             return (False, f"Erreur lors de la validation: {e}")
 
-    def restart_nagios(self) -> tuple:
+    def validation_cache_stats(self) -> Dict:
+        '''Statistiques du cache de validation'''
+        with self._validation_lock:
+            lookups = self._validation_hits + self._validation_misses
+            return {
+                'hits': self._validation_hits,
+                'misses': self._validation_misses,
+                'hit_ratio': self._validation_hits / lookups if lookups else 0.0,
+                'entries': len(self._validation_cache),
+                'max_entries': self.validation_cache_size,
+            }
+
+    def restart_nagios(self, on_output: Optional[Callable[[str], None]] = None) -> tuple:
         '''
         Redémarre Nagios
         Retourne (success: bool, output: str)
         '''
         try:
-            result = subprocess.run(
-                ['systemctl', 'restart', 'nagios'],
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-
-            return (result.returncode == 0, result.stdout + result.stderr)
+            with self.metrics.timer('restart'):
+                return self._run_command(['systemctl', 'restart', 'nagios'], on_output)
 
         except Exception as e:
             return (False, f"Erreur lors du redémarrage: {e}")
 
-    def get_directories(self) -> List[str]:
-        '''Liste tous les sous-répertoires dans le chemin de base Nagios'''
-        directories = []
+    def reload_nagios(self, on_output: Optional[Callable[[str], None]] = None) -> tuple:
+        '''
+        Recharge Nagios par la première méthode disponible qui réussit
+        (fichier de commandes, systemctl reload...), sans validation
+        Retourne (success: bool, output: str)
+        '''
+        outputs = []
+        for backend in self.reload_backends:
+            if not backend.available():
+                outputs.append(f"[{backend.name}] indisponible\n")
+                continue
 
-        for root, dirs, files in os.walk(self.nagios_base_path):
-            # Calculer le chemin relatif
-            rel_path = os.path.relpath(root, self.nagios_base_path)
-            if rel_path != '.':
-                # Retourner le chemin absolu complet
-                directories.append(root)
+            try:
+                with self.metrics.timer('restart'):
+                    success, output = backend.reload(on_output)
+            except Exception as e:
+                success, output = (False, f"Erreur: {e}\n")
+
+            outputs.append(f"[{backend.name}] {output}")
+            if success:
+                return (True, ''.join(outputs))
+
+        if not self.reload_backends:
+            outputs.append("Aucune méthode de rechargement configurée\n")
+        return (False, ''.join(outputs))
 
-        return sorted(directories)
+    def _run_command(self, args: List[str], on_output: Optional[Callable[[str], None]] = None,
+                     timeout: int = 30) -> tuple:
+        '''
+        Exécute une commande en lisant sa sortie ligne par ligne
+        Retourne (success: bool, output: str)
+        '''
+        process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        timed_out = threading.Event()
+
+        def kill():
+            timed_out.set()
+            process.kill()
+
+        timer = threading.Timer(timeout, kill)
+        timer.start()
+
+        lines = []
+        try:
+            for line in process.stdout:
+                lines.append(line)
+                if on_output:
+                    on_output(line)
+            returncode = process.wait()
+        finally:
+            timer.cancel()
+            process.stdout.close()
+
+        if timed_out.is_set():
+            raise subprocess.TimeoutExpired(args, timeout, output=''.join(lines))
+
+        return (returncode == 0, ''.join(lines))
+
+    def get_directories(self) -> List[str]:
+        '''
+        Liste tous les sous-répertoires dans le chemin de base Nagios (hors
+        répertoires exclus), relevés lors du rafraîchissement de l'index
+        '''
+        with self._index_lock:
+            self.refresh_index()
+            return list(self._directories)
+
+    def get_directory_tree(self) -> List[Dict]:
+        '''
+        Sous-répertoires avec le nombre d'hôtes et de fichiers .cfg qu'ils
+        contiennent directement (hosts, files) et dans toute leur
+        sous-arborescence (total_hosts, total_files). Recalculé seulement
+        quand l'index change
+        '''
+        with self._index_lock:
+            self.refresh_index()
+            if self._directory_view is None:
+                self._directory_view = self._build_directory_view()
+            return [dict(entry) for entry in self._directory_view]
+
+    def _build_directory_view(self) -> List[Dict]:
+        counts = {directory: [0, 0] for directory in self._directories}
+        for file_path in self._file_order:
+            entry = counts.get(os.path.dirname(file_path))
+            if entry is not None:
+                entry[0] += len(self._file_hosts.get(file_path, ()))
+                entry[1] += 1
+
+        # Cumul des sous-arborescences, des répertoires les plus profonds vers la racine
+        totals = {directory: list(entry) for directory, entry in counts.items()}
+        for directory in sorted(counts, key=lambda d: d.count(os.sep), reverse=True):
+            parent = totals.get(os.path.dirname(directory))
+            if parent is not None:
+                parent[0] += totals[directory][0]
+                parent[1] += totals[directory][1]
+
+        return [{
+            'path': directory,
+            'relative_path': os.path.relpath(directory, self.nagios_base_path),
+            'hosts': counts[directory][0],
+            'files': counts[directory][1],
+            'total_hosts': totals[directory][0],
+            'total_files': totals[directory][1],
+        } for directory in self._directories]
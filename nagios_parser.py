@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import mmap
+import re
+import sys
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Bloc "define <type> { ... }" : seul un "}" en début de ligne ferme la
+# définition (comme dans Nagios), les accolades dans les valeurs sont permises
+_BLOCK_RE = re.compile(
+    rb'^[ \t]*define[ \t]+([^\s{]+)[ \t]*\{[^\n]*(\n(?:(?![ \t]*\})[^\n]*\n)*)[ \t]*\}[^\n]*(?:\n|\Z)',
+    re.MULTILINE | re.IGNORECASE
+)
+
+# Directive "clé valeur" en début de ligne ; les lignes commençant par # ou ;
+# sont ignorées et un ";" en fin de ligne introduit un commentaire
+_DIRECTIVE_RE = re.compile(r'\n[ \t]*([^\s#;}]\S*)[ \t]*([^\s;]*(?:[ \t]+[^\s;]+)*)')
+
+# Variante plus lente qui respecte l'échappement "\;" dans les valeurs
+_ESCAPED_DIRECTIVE_RE = re.compile(
+    r'\n[ \t]*([^\s#;}]\S*)[ \t]*((?:[^\s;\\]|\\[^\n]|[ \t]+(?=[^\s;]))*)'
+)
+
+# Ligne terminée par "\" (hors "\\") : continuation sur la ligne suivante
+_CONTINUATION_RE = re.compile(r'(?<!\\)\\[ \t\r]*\n[ \t]*')
+
+
+# Tuples de noms de directives partagés entre objets de même structure
+_KEY_LAYOUTS: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+
+def _compact(directives: Dict[str, str]) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    '''
+    Représentation compacte de directives : (noms, valeurs). Le tuple des
+    noms est partagé entre tous les objets qui ont les mêmes directives et
+    les valeurs sont internées : une valeur répétée (modèle, commande,
+    période...) n'est stockée qu'une fois
+    '''
+    keys = tuple(directives)
+    shared_keys = _KEY_LAYOUTS.get(keys)
+    if shared_keys is None:
+        shared_keys = tuple(map(sys.intern, keys))
+        _KEY_LAYOUTS[shared_keys] = shared_keys
+
+    return (shared_keys, tuple(map(sys.intern, directives.values())))
+
+
+def compact_from_json(compact: List) -> Tuple:
+    '''Forme compacte relue du JSON (listes) : tuples et chaînes internées'''
+    object_type, keys, values, start, end = compact
+    return (sys.intern(object_type), tuple(map(sys.intern, keys)), tuple(map(sys.intern, values)), start, end)
+
+
+class NagiosObject:
+    '''
+    Définition d'objet Nagios (define <type> { ... }) avec sa position
+    en octets dans le fichier source.
+
+    Les directives sont conservées sous forme compacte (tuples partagés et
+    valeurs internées) ; directives construit un dictionnaire à la demande
+    '''
+
+    __slots__ = ('object_type', 'keys', 'values', 'start', 'end', 'file_path')
+
+    def __init__(self, object_type: str, directives: Dict[str, str], start: int, end: int,
+                 file_path: Optional[str] = None):
+        self.object_type = sys.intern(object_type)
+        self.keys, self.values = _compact(directives)
+        # Position du bloc : du début de la ligne "define" à la fin de la ligne "}"
+        self.start = start
+        self.end = end
+        self.file_path = file_path
+
+    @property
+    def span(self):
+        return (self.start, self.end)
+
+    @property
+    def directives(self) -> Dict[str, str]:
+        '''Directives sous forme de dictionnaire (nouvelle copie à chaque appel)'''
+        return dict(zip(self.keys, self.values))
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        '''Valeur d'une directive'''
+        try:
+            return self.values[self.keys.index(key)]
+        except ValueError:
+            return default
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        return zip(self.keys, self.values)
+
+    def to_compact(self) -> Tuple:
+        '''Forme compacte sérialisable (sans le fichier, partagé par ses objets)'''
+        return (self.object_type, self.keys, self.values, self.start, self.end)
+
+    @classmethod
+    def from_compact(cls, compact: Tuple, file_path: Optional[str] = None) -> 'NagiosObject':
+        '''Reconstruit un objet à partir de to_compact(), sans re-parser'''
+        obj = cls.__new__(cls)
+        obj.object_type, keys, obj.values, obj.start, obj.end = compact
+        obj.keys = _KEY_LAYOUTS.setdefault(keys, keys)
+        obj.file_path = file_path
+        return obj
+
+    def __reduce__(self):
+        # Reconstruit la forme compacte (valeurs internées) après un passage
+        # entre processus
+        return (NagiosObject, (self.object_type, self.directives, self.start, self.end, self.file_path))
+
+    def __repr__(self):
+        return f"NagiosObject({self.object_type!r}, {self.directives!r}, span={self.span})"
+
+
+def iter_objects(file_path: str, object_types: Optional[Iterable[str]] = None) -> Iterator[NagiosObject]:
+    '''
+    Parse un fichier de configuration Nagios projeté en mémoire (mmap) et
+    produit chaque objet défini, sans charger le fichier entier.
+    Si object_types est fourni, seuls ces types sont retournés
+    '''
+    with open(file_path, 'rb') as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Fichier vide
+            return
+
+        try:
+            for obj in parse_objects(data, object_types):
+                obj.file_path = file_path
+                yield obj
+        finally:
+            data.close()
+
+
+def parse_host_file(file_path: str) -> List[NagiosObject]:
+    '''
+    Parse un fichier de configuration et retourne chaque définition d'hôte
+    (forme compacte, avec sa position en octets dans le fichier)
+    '''
+    try:
+        return list(iter_objects(file_path, ('host',)))
+    except Exception as e:
+        print(f"Erreur lors de la lecture de {file_path}: {e}")
+        return []
+
+
+def parse_host_files(file_paths: List[str]) -> List[List[NagiosObject]]:
+    '''
+    Parse un lot de fichiers. Exécuté dans les processus du pool de
+    parsing : ce module ne doit rien démarrer à l'import
+    '''
+    return [parse_host_file(file_path) for file_path in file_paths]
+
+
+def parse_objects(data, object_types: Optional[Iterable[str]] = None) -> Iterator[NagiosObject]:
+    '''
+    Parse un contenu binaire (bytes ou mmap) de configuration Nagios en une
+    seule passe.
+
+    Gère les commentaires (lignes commençant par # ou ;, commentaires ;
+    en fin de ligne sauf s'ils sont échappés par \\;), les lignes de
+    continuation terminées par \\ et les valeurs contenant des accolades.
+    '''
+    wanted = {t.lower() for t in object_types} if object_types is not None else None
+
+    for match in _BLOCK_RE.finditer(data):
+        object_type = match.group(1).decode('ascii', 'replace').lower()
+        if wanted is not None and object_type not in wanted:
+            continue
+
+        yield NagiosObject(object_type, parse_directives(match.group(2)), match.start(), match.end())
+
+
+def parse_directives(body: bytes) -> Dict[str, str]:
+    '''Parse le corps d'une définition en dictionnaire de directives'''
+    text = body.decode('utf-8', 'replace')
+
+    if '\\' not in text:
+        return dict(_DIRECTIVE_RE.findall(text))
+
+    text = _CONTINUATION_RE.sub('', text)
+    return {key: value.replace('\\;', ';') for key, value in _ESCAPED_DIRECTIVE_RE.findall(text)}
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import ctypes
+import ctypes.util
+import errno
+import fnmatch
+import os
+import select
+import struct
+import threading
+from typing import Iterable, Optional, Set
+
+# Constantes inotify (voir <sys/inotify.h>)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def is_excluded_dir(name: str, patterns: Iterable[str]) -> bool:
+    '''Indique si un nom de répertoire correspond à l'un des motifs d'exclusion (fnmatch)'''
+    return any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns)
+
+
+def _load_libc():
+    '''Charge la libc si elle expose l'API inotify'''
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class ConfigWatcher:
+    '''
+    Surveille une arborescence de configuration via inotify dans un thread
+    et collecte les fichiers créés, modifiés, déplacés ou supprimés.
+
+    Seules les modifications faites sur la machine locale sont vues : sur un
+    montage NFS, les écritures d'autres clients ne génèrent aucun événement.
+    '''
+
+    def __init__(self, root: str, excluded_dirs: Iterable[str] = ()):
+        self.root = root
+        self.excluded_dirs = list(excluded_dirs)
+
+        self._libc = None
+        self._fd = -1
+        self._watches = {}
+        self._thread = None
+        self._stop_event = threading.Event()
+
+        self._lock = threading.Lock()
+        self._dirty: Set[str] = set()
+        # Un rescan complet est nécessaire (débordement, nouveau répertoire...)
+        self._needs_rescan = True
+
+    @staticmethod
+    def available() -> bool:
+        '''Indique si inotify est utilisable sur ce système'''
+        libc = _load_libc()
+        return libc is not None and hasattr(libc, 'inotify_init1')
+
+    def start(self) -> bool:
+        '''
+        Démarre la surveillance. Retourne False si inotify est indisponible
+        ou si les watches n'ont pas pu être posés
+        '''
+        if self.is_alive():
+            return True
+
+        self._libc = _load_libc()
+        if self._libc is None:
+            return False
+
+        fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return False
+        self._fd = fd
+
+        try:
+            self._add_watch_tree(self.root)
+        except OSError as e:
+            print(f"Surveillance inotify indisponible: {e}")
+            self._close()
+            return False
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='nagios-config-watcher', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        '''Arrête la surveillance'''
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._close()
+
+    def is_alive(self) -> bool:
+        '''Indique si le thread de surveillance tourne'''
+        return self._thread is not None and self._thread.is_alive()
+
+    def drain(self) -> Optional[Set[str]]:
+        '''
+        Retourne et vide l'ensemble des fichiers modifiés depuis le dernier
+        appel, ou None si un parcours complet de l'arborescence est nécessaire
+        '''
+        with self._lock:
+            if self._needs_rescan or not self.is_alive():
+                self._needs_rescan = False
+                self._dirty = set()
+                return None
+
+            dirty, self._dirty = self._dirty, set()
+            return dirty
+
+    def _close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+        self._fd = -1
+        self._watches = {}
+
+    def _add_watch_tree(self, top: str):
+        '''Pose un watch sur un répertoire et tous ses sous-répertoires'''
+        for root, dirs, files in os.walk(top):
+            dirs[:] = [d for d in dirs if not is_excluded_dir(d, self.excluded_dirs)]
+            self._add_watch(root)
+
+    def _add_watch(self, path: str):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            # Le répertoire a pu disparaître entre-temps
+            if err in (errno.ENOENT, errno.ENOTDIR):
+                return
+            raise OSError(err, os.strerror(err), path)
+        self._watches[wd] = path
+
+    def _run(self):
+        poller = select.poll()
+        poller.register(self._fd, select.POLLIN)
+
+        while not self._stop_event.is_set():
+            if not poller.poll(500):
+                continue
+
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                continue
+            except OSError as e:
+                print(f"Erreur de lecture inotify: {e}")
+                break
+
+            self._handle_events(data)
+
+    def _handle_events(self, data: bytes):
+        offset = 0
+        dirty = set()
+        rescan = False
+
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                rescan = True
+                continue
+
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+
+            directory = self._watches.get(wd)
+            if directory is None:
+                continue
+
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                rescan = True
+                continue
+
+            path = os.path.join(directory, name) if name else directory
+
+            if mask & IN_ISDIR:
+                if is_excluded_dir(name, self.excluded_dirs):
+                    continue
+                # Un répertoire qui apparaît ou disparaît change l'ensemble
+                # des fichiers : on surveille le nouveau et on redemande un parcours
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    try:
+                        self._add_watch_tree(path)
+                    except OSError as e:
+                        # Limite de watches atteinte : retour au parcours complet
+                        print(f"Impossible de surveiller {path}: {e}")
+                        self._stop_event.set()
+                rescan = True
+                continue
+
+            dirty.add(path)
+
+        with self._lock:
+            self._dirty.update(dirty)
+            if rescan:
+                self._needs_rescan = True
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import threading
+from typing import AbstractSet, Dict, Iterable, List, Optional, Set, Tuple
+
+from nagios_parser import NagiosObject, iter_objects
+
+# Directive portant le nom des objets de chaque type (les services, dépendances
+# et escalades n'ont pas de nom propre)
+NAME_DIRECTIVES = {
+    'host': 'host_name',
+    'hostgroup': 'hostgroup_name',
+    'servicegroup': 'servicegroup_name',
+    'contact': 'contact_name',
+    'contactgroup': 'contactgroup_name',
+    'timeperiod': 'timeperiod_name',
+    'command': 'command_name',
+}
+
+# Directives propres à une définition, jamais héritées d'un modèle
+NOT_INHERITED = ('name', 'register', 'use')
+
+# Modèle référencé par un objet : (type, nom)
+TemplateKey = Tuple[str, str]
+
+
+def split_list(value: Optional[str]) -> List[str]:
+    '''Découpe une liste de noms Nagios ("a, b,c")'''
+    if not value:
+        return []
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def included_file_stamps(cfg_files: List[str], cfg_dirs: List[str]) -> Dict[str, Tuple]:
+    '''
+    Empreintes de tous les fichiers .cfg inclus (cfg_file puis contenu des
+    cfg_dir), dans l'ordre de chargement de Nagios
+    '''
+    paths = list(cfg_files)
+    for cfg_dir in cfg_dirs:
+        for root, dirs, files in os.walk(cfg_dir):
+            dirs.sort()
+            paths.extend(os.path.join(root, file) for file in sorted(files) if file.endswith('.cfg'))
+
+    stamps = {}
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        stamps[path] = (st.st_mtime_ns, st.st_size, st.st_ino)
+    return stamps
+
+
+class ObjectStore:
+    '''
+    Modèle objet de toute la configuration : tous les types d'objets définis
+    dans les fichiers inclus par nagios.cfg, indexés par type et par nom,
+    avec un index inverse des services par hôte.
+
+    L'héritage (use) est résolu à la demande et mémorisé ; quand un modèle
+    change, seuls les objets qui en dépendent sont recalculés.
+    '''
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._file_stamps: Dict[str, Tuple] = {}
+        self._file_objects: Dict[str, List[NagiosObject]] = {}
+        self._file_order: List[str] = []
+
+        # Incrémentée à chaque changement de la configuration
+        self.generation = 0
+
+        # Index par type, par nom et des modèles (reconstruits à la demande)
+        self._indexes: Optional[Dict] = None
+        self._service_index: Optional[Dict[str, List[NagiosObject]]] = None
+
+        # Attributs effectifs mémorisés : fichier -> position -> (valeurs, modèles utilisés)
+        self._effective: Dict[str, Dict[int, Tuple[Dict[str, str], Set[TemplateKey]]]] = {}
+        # Modèle -> objets dont les attributs effectifs en dépendent
+        self._dependents: Dict[TemplateKey, Set[Tuple[str, int]]] = {}
+
+    def refresh(self, stamps: Dict[str, Tuple]) -> bool:
+        '''
+        Met à jour le modèle à partir des empreintes des fichiers inclus :
+        seuls les fichiers modifiés sont re-parsés. Retourne True si la
+        configuration a changé
+        '''
+        with self._lock:
+            changed = [path for path in self._file_objects if path not in stamps]
+            changed += [path for path, stamp in stamps.items() if self._file_stamps.get(path) != stamp]
+            order = list(stamps)
+
+            if not changed and order == self._file_order:
+                return False
+
+            touched: Set[TemplateKey] = set()
+            for file_path in changed:
+                touched.update(self._template_keys(self._file_objects.get(file_path, ())))
+
+                if file_path in stamps:
+                    self._file_objects[file_path] = self._parse_file(file_path)
+                    self._file_stamps[file_path] = stamps[file_path]
+                    touched.update(self._template_keys(self._file_objects[file_path]))
+                else:
+                    self._file_objects.pop(file_path, None)
+                    self._file_stamps.pop(file_path, None)
+
+                self._effective.pop(file_path, None)
+
+            # L'ordre des fichiers décide quelle définition d'un nom l'emporte
+            if order != self._file_order:
+                self._file_order = order
+                self._effective.clear()
+                self._dependents.clear()
+            else:
+                self._invalidate_dependents(touched)
+
+            self._indexes = None
+            self._service_index = None
+            self.generation += 1
+            return True
+
+    def export_files(self) -> List[Tuple[str, Tuple, List[Tuple]]]:
+        '''Fichiers chargés, avec leur empreinte et leurs objets sous forme compacte'''
+        with self._lock:
+            return [(file_path, self._file_stamps[file_path],
+                     [obj.to_compact() for obj in self._file_objects[file_path]])
+                    for file_path in self._file_order if file_path in self._file_stamps]
+
+    def restore_files(self, files: List[Tuple[str, Tuple, List[Tuple]]]):
+        '''
+        Recharge les fichiers produits par export_files (instantané) : le
+        prochain refresh ne re-parse que ceux dont l'empreinte a changé
+        '''
+        with self._lock:
+            self._file_stamps = {}
+            self._file_objects = {}
+            for file_path, stamp, objects in files:
+                self._file_stamps[file_path] = stamp
+                self._file_objects[file_path] = [NagiosObject.from_compact(obj, file_path) for obj in objects]
+            self._file_order = [file_path for file_path, stamp, objects in files]
+
+            self._effective.clear()
+            self._dependents.clear()
+            self._indexes = None
+            self._service_index = None
+            self.generation += 1
+
+    def _parse_file(self, file_path: str) -> List[NagiosObject]:
+        try:
+            return list(iter_objects(file_path))
+        except Exception as e:
+            print(f"Erreur lors de la lecture de {file_path}: {e}")
+            return []
+
+    def _template_keys(self, objects: Iterable[NagiosObject]) -> Set[TemplateKey]:
+        return {(obj.object_type, obj.get('name')) for obj in objects if obj.get('name')}
+
+    def _invalidate_dependents(self, templates: Set[TemplateKey]):
+        '''Oublie les attributs effectifs des objets qui héritent des modèles donnés'''
+        for key in templates:
+            for file_path, start in self._dependents.pop(key, ()):
+                memo = self._effective.get(file_path)
+                if memo is not None:
+                    memo.pop(start, None)
+
+    def _get_indexes(self) -> Dict:
+        if self._indexes is None:
+            by_type: Dict[str, List[NagiosObject]] = {}
+            by_name: Dict[str, Dict[str, NagiosObject]] = {}
+            templates: Dict[str, Dict[str, NagiosObject]] = {}
+
+            for file_path in self._file_order:
+                for obj in self._file_objects.get(file_path, ()):
+                    by_type.setdefault(obj.object_type, []).append(obj)
+
+                    # La première définition d'un nom l'emporte
+                    name_directive = NAME_DIRECTIVES.get(obj.object_type)
+                    name = obj.get(name_directive) if name_directive else None
+                    if name:
+                        by_name.setdefault(obj.object_type, {}).setdefault(name, obj)
+
+                    template_name = obj.get('name')
+                    if template_name:
+                        templates.setdefault(obj.object_type, {}).setdefault(template_name, obj)
+
+            self._indexes = {'by_type': by_type, 'by_name': by_name, 'templates': templates}
+        return self._indexes
+
+    def objects(self, object_type: str) -> List[NagiosObject]:
+        '''Tous les objets d'un type, dans l'ordre de la configuration'''
+        with self._lock:
+            return list(self._get_indexes()['by_type'].get(object_type, ()))
+
+    def get(self, object_type: str, name: str) -> Optional[NagiosObject]:
+        '''Objet d'un type par son nom (host_name, command_name...)'''
+        with self._lock:
+            return self._get_indexes()['by_name'].get(object_type, {}).get(name)
+
+    def names(self, object_type: str) -> AbstractSet[str]:
+        '''Noms des objets d'un type (vue en lecture seule, sans copie)'''
+        with self._lock:
+            return self._get_indexes()['by_name'].get(object_type, {}).keys()
+
+    def templates(self, object_type: Optional[str] = None) -> List[NagiosObject]:
+        '''Modèles (définitions avec une directive name), éventuellement d'un seul type'''
+        with self._lock:
+            templates = self._get_indexes()['templates']
+            types = [object_type] if object_type else sorted(templates)
+            return [obj for t in types for obj in templates.get(t, {}).values()]
+
+    def get_template(self, object_type: str, name: str) -> Optional[NagiosObject]:
+        with self._lock:
+            return self._get_indexes()['templates'].get(object_type, {}).get(name)
+
+    def template_names(self, object_type: str) -> AbstractSet[str]:
+        with self._lock:
+            return self._get_indexes()['templates'].get(object_type, {}).keys()
+
+    def effective(self, obj: NagiosObject) -> Dict[str, str]:
+        '''
+        Attributs effectifs d'un objet après résolution de la chaîne use :
+        le premier modèle listé l'emporte, les valeurs "+..." s'ajoutent à la
+        valeur héritée et "null" annule la valeur héritée
+        '''
+        with self._lock:
+            return self._values(obj)
+
+    def _values(self, obj: NagiosObject) -> Dict[str, str]:
+        '''Attributs effectifs, sans les directives annulées par "null"'''
+        return {key: value for key, value in self._resolve(obj, ())[0].items() if value != 'null'}
+
+    def _resolve(self, obj: NagiosObject, stack: Tuple) -> Tuple[Dict[str, str], Set[TemplateKey]]:
+        memo = self._effective.setdefault(obj.file_path, {}) if obj.file_path in self._file_objects else None
+        if memo is not None and obj.start in memo:
+            return memo[obj.start]
+
+        values: Dict[str, str] = {}
+        depends: Set[TemplateKey] = set()
+        templates = self._get_indexes()['templates'].get(obj.object_type, {})
+
+        # Du dernier modèle au premier : les premiers écrasent les suivants
+        for template_name in reversed(split_list(obj.get('use'))):
+            depends.add((obj.object_type, template_name))
+            template = templates.get(template_name)
+            # Modèle introuvable ou héritage circulaire : ignoré
+            if template is None or template is obj or any(template is parent for parent in stack):
+                continue
+
+            inherited, template_depends = self._resolve(template, stack + (obj,))
+            depends |= template_depends
+            for key, value in inherited.items():
+                if key not in NOT_INHERITED:
+                    values[key] = value
+
+        for key, value in obj.items():
+            if value.startswith('+') and key not in NOT_INHERITED:
+                inherited_value = values.get(key)
+                if inherited_value and inherited_value != 'null':
+                    values[key] = f"{inherited_value},{value[1:]}"
+                else:
+                    values[key] = value[1:]
+            else:
+                values[key] = value
+
+        # "null" est conservé ici : un modèle qui annule une directive l'emporte
+        # aussi sur les modèles listés après lui
+        result = (values, depends)
+
+        if memo is not None:
+            memo[obj.start] = result
+            for key in depends:
+                self._dependents.setdefault(key, set()).add((obj.file_path, obj.start))
+
+        return result
+
+    def services_for_host(self, host_name: str) -> List[NagiosObject]:
+        '''Services appliqués à un hôte (host_name ou hostgroup_name effectifs)'''
+        with self._lock:
+            return list(self._get_service_index().get(host_name, ()))
+
+    def _get_service_index(self) -> Dict[str, List[NagiosObject]]:
+        if self._service_index is None:
+            all_hosts = list(self._get_indexes()['by_name'].get('host', ()))
+            members = self._hostgroup_members()
+            index: Dict[str, List[NagiosObject]] = {}
+
+            for service in self._get_indexes()['by_type'].get('service', ()):
+                if service.get('register') == '0':
+                    continue
+
+                values = self._values(service)
+                hosts = []
+                excluded = set()
+
+                # "!nom" exclut un hôte ou un groupe, "*" désigne tous les hôtes
+                for host in split_list(values.get('host_name')):
+                    if host.startswith('!'):
+                        excluded.add(host[1:])
+                    else:
+                        hosts.append(host)
+                for group in split_list(values.get('hostgroup_name')):
+                    if group.startswith('!'):
+                        excluded.update(members.get(group[1:], ()))
+                    else:
+                        hosts.extend(members.get(group, ()))
+                if '*' in hosts:
+                    hosts = all_hosts
+
+                for host in dict.fromkeys(hosts):
+                    if host not in excluded:
+                        index.setdefault(host, []).append(service)
+
+            self._service_index = index
+        return self._service_index
+
+    def _hostgroup_members(self) -> Dict[str, List[str]]:
+        '''Membres de chaque groupe d'hôtes (members du groupe et hostgroups des hôtes)'''
+        members: Dict[str, List[str]] = {}
+        indexes = self._get_indexes()
+
+        for hostgroup in indexes['by_type'].get('hostgroup', ()):
+            values = self._values(hostgroup)
+            if values.get('hostgroup_name'):
+                members.setdefault(values['hostgroup_name'], []).extend(split_list(values.get('members')))
+
+        for host_name, host in indexes['by_name'].get('host', {}).items():
+            for group in split_list(self._values(host).get('hostgroups')):
+                members.setdefault(group, []).append(host_name)
+
+        return members
+
+    def to_dict(self, obj: NagiosObject, effective: bool = False) -> Dict:
+        '''Représentation JSON d'un objet (directives, type, fichier)'''
+        result = obj.directives
+        result['object_type'] = obj.object_type
+        result['file_path'] = obj.file_path
+        if effective:
+            result['effective'] = self.effective(obj)
+        return result
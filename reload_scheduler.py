@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+from jobs import BackgroundTask
+
+# Exécute une commande : (arguments, callback de sortie) -> (success, output)
+CommandRunner = Callable[[List[str], Optional[Callable[[str], None]]], Tuple[bool, str]]
+
+# Rechargement : callback de sortie -> (success, output)
+ReloadStep = Callable[[Callable[[str], None]], Tuple[bool, str]]
+
+# Validation : (callback de sortie, empreinte de la configuration ou None) -> (success, output)
+ValidateStep = Callable[[Callable[[str], None], Optional[str]], Tuple[bool, str]]
+
+RELOAD_METHODS = ('command_file', 'reload', 'restart')
+
+
+class CommandFileReloader:
+    '''
+    Rechargement gracieux par le fichier de commandes externes de Nagios
+    (RESTART_PROGRAM) : les états des contrôles sont conservés
+    '''
+
+    name = 'command_file'
+
+    def __init__(self, command_file: str, opener: Callable[[str, int], int] = os.open):
+        self.command_file = command_file
+        self._opener = opener
+
+    def available(self) -> bool:
+        return os.path.exists(self.command_file)
+
+    def reload(self, on_output: Optional[Callable[[str], None]] = None) -> Tuple[bool, str]:
+        command = f"[{int(time.time())}] RESTART_PROGRAM\n"
+        try:
+            # Non bloquant : échoue (ENXIO) si Nagios ne lit pas le tube
+            fd = self._opener(self.command_file, os.O_WRONLY | os.O_NONBLOCK | os.O_APPEND)
+            try:
+                os.write(fd, command.encode('utf-8'))
+            finally:
+                os.close(fd)
+        except OSError as e:
+            return (False, f"Écriture impossible dans {self.command_file}: {e}\n")
+
+        output = f"Commande RESTART_PROGRAM envoyée à {self.command_file}\n"
+        if on_output:
+            on_output(output)
+        return (True, output)
+
+
+class SystemctlReloader:
+    '''Rechargement (ou redémarrage complet) par systemctl'''
+
+    def __init__(self, runner: CommandRunner, action: str = 'reload', unit: str = 'nagios'):
+        self.name = action
+        self.action = action
+        self.unit = unit
+        self._runner = runner
+
+    def available(self) -> bool:
+        return True
+
+    def reload(self, on_output: Optional[Callable[[str], None]] = None) -> Tuple[bool, str]:
+        return self._runner(['systemctl', self.action, self.unit], on_output)
+
+
+def build_reload_backends(methods, command_file: str, runner: CommandRunner) -> List:
+    '''
+    Méthodes de rechargement dans l'ordre de préférence, parmi
+    command_file, reload (systemctl reload) et restart (systemctl restart)
+    '''
+    backends = []
+    for method in methods:
+        if method == 'command_file':
+            backends.append(CommandFileReloader(command_file))
+        elif method in ('reload', 'restart'):
+            backends.append(SystemctlReloader(runner, method))
+        else:
+            raise ValueError(f"Méthode de rechargement inconnue : {method}")
+    return backends
+
+
+class ReloadBatch(BackgroundTask):
+    '''Demandes de rechargement regroupées, validées et appliquées ensemble'''
+
+    _ids = itertools.count(1)
+
+    def __init__(self, generation: int, deadline: float):
+        super().__init__()
+        self.id = next(self._ids)
+        self.first_generation = generation
+        self.generation = generation
+        self.requests = 0
+        self.force = False
+        self.deadline = deadline
+        self.valid: Optional[bool] = None
+
+    def follow(self, on_output: Callable[[str], None]) -> Tuple[bool, str]:
+        '''Transmet la sortie du lot au fil de l'eau jusqu'à sa fin'''
+        for line in self.stream():
+            if line is not None:
+                on_output(line)
+        return (bool(self.success), self.output)
+
+    def to_dict(self, include_output: bool = False) -> Dict:
+        result = super().to_dict(include_output)
+        result.update(valid=self.valid, first_generation=self.first_generation, generation=self.generation,
+                      requests=self.requests)
+        return result
+
+
+class ReloadScheduler:
+    '''
+    Regroupe les demandes de rechargement de Nagios. Chaque demande reçoit
+    une génération croissante ; les demandes arrivées pendant window
+    secondes après la première forment un lot, validé une seule fois puis
+    appliqué par reload. Les demandes arrivées pendant l'application d'un
+    lot sont reportées sur le lot suivant.
+
+    Si fingerprint est fourni, un lot dont la configuration n'a pas changé
+    depuis le dernier rechargement réussi n'est pas rejoué (sauf force).
+    L'empreinte, calculée une fois par lot, est transmise à validate
+    '''
+
+    def __init__(self, validate: ValidateStep, reload: ReloadStep, window: float = 5.0,
+                 fingerprint: Optional[Callable[[], str]] = None, history: int = 20):
+        self.window = window
+        self._validate = validate
+        self._reload = reload
+        self._fingerprint = fingerprint
+        self._condition = threading.Condition()
+        self._queued_generation = 0
+        self._applied_generation = 0
+        self._applied_fingerprint: Optional[str] = None
+        self._pending: Optional[ReloadBatch] = None
+        self._running: Optional[ReloadBatch] = None
+        self._history: deque = deque(maxlen=history)
+        self._thread: Optional[threading.Thread] = None
+
+    def request(self, force: bool = False) -> Tuple[int, ReloadBatch]:
+        '''Demande un rechargement. Retourne la génération attribuée et son lot'''
+        with self._condition:
+            self._queued_generation += 1
+            generation = self._queued_generation
+
+            batch = self._pending
+            if batch is None:
+                batch = self._pending = ReloadBatch(generation, time.monotonic() + self.window)
+            batch.generation = generation
+            batch.requests += 1
+            batch.force = batch.force or force
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='nagios-reload', daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+        return (generation, batch)
+
+    def get(self, batch_id: int) -> Optional[ReloadBatch]:
+        with self._condition:
+            for batch in (self._pending, self._running, *self._history):
+                if batch is not None and batch.id == batch_id:
+                    return batch
+        return None
+
+    def status(self) -> Dict:
+        '''Générations demandée et appliquée, lots en attente, en cours et dernier lot terminé'''
+        with self._condition:
+            return {
+                'window': self.window,
+                'queued_generation': self._queued_generation,
+                'applied_generation': self._applied_generation,
+                'pending': self._pending.to_dict() if self._pending else None,
+                'running': self._running.to_dict() if self._running else None,
+                'last': self._history[-1].to_dict(include_output=True) if self._history else None,
+            }
+
+    def _run(self):
+        while True:
+            with self._condition:
+                batch = self._pending
+                if batch is None:
+                    self._condition.wait()
+                    continue
+                delay = batch.deadline - time.monotonic()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+                self._pending = None
+                self._running = batch
+
+            success = False
+            fingerprint = None
+            try:
+                batch._set_status('running')
+                fingerprint = self._fingerprint() if self._fingerprint else None
+                success = self._apply(batch, fingerprint)
+            except Exception as e:
+                batch.append_output(f"Erreur: {e}\n")
+
+            with self._condition:
+                self._running = None
+                if success:
+                    self._applied_generation = max(self._applied_generation, batch.generation)
+                    self._applied_fingerprint = fingerprint
+                self._history.append(batch)
+
+            batch._set_status('succeeded' if success else 'failed', success)
+
+    def _apply(self, batch: ReloadBatch, fingerprint: Optional[str]) -> bool:
+        if not batch.force and fingerprint is not None and fingerprint == self._applied_fingerprint:
+            batch.valid = True
+            batch.append_output("Configuration inchangée depuis le dernier rechargement\n")
+            return True
+
+        valid, output = self._validate(batch.append_output, fingerprint)
+        batch.valid = valid
+        if output and not batch.lines:
+            batch.append_output(output)
+        if not valid:
+            return False
+
+        lines = len(batch.lines)
+        success, output = self._reload(batch.append_output)
+        if output and len(batch.lines) == lines:
+            batch.append_output(output)
+        return success
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Callable, Dict, Hashable
+
+from flask import Response, current_app, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Suffixe de l'ETag par codage : un ETag fort doit différer entre les
+# représentations (identité, gzip, brotli) d'une même ressource
+_ETAG_SUFFIXES = {'identity': '', 'gzip': '-gz', 'br': '-br'}
+
+
+class ResponseCache:
+    '''
+    Cache des réponses JSON des listes (hôtes, répertoires) : le corps encodé
+    (et ses versions compressées) est réutilisé tant que la génération de la
+    configuration ne change pas. Gère ETag / Last-Modified et les requêtes
+    conditionnelles (304)
+    '''
+
+    def __init__(self, max_entries: int = 64, min_compress_size: int = 1024, metrics=None):
+        self.max_entries = max_entries
+        self.min_compress_size = min_compress_size
+        # Registre de métriques optionnel (succès/échecs du cache)
+        self.metrics = metrics
+        self._entries: 'OrderedDict[Hashable, Dict]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def respond(self, key: Hashable, generation, build: Callable[[], Dict]) -> Response:
+        '''
+        Retourne la réponse pour key : le corps n'est reconstruit (via build)
+        que si la génération a changé depuis la mise en cache
+        '''
+        entry = self._get_entry(key, generation, build)
+        encoding = self._choose_encoding(entry['body'])
+        etag = entry['etag'] + _ETAG_SUFFIXES[encoding]
+
+        if request.if_none_match:
+            # Comparaison faible : un ETag W/"..." (ajouté par un proxy qui recompresse) correspond aussi
+            not_modified = request.if_none_match.contains_weak(etag)
+        else:
+            # Date non fiable si le contenu a changé dans la seconde de la version précédente
+            not_modified = request.if_modified_since is not None and not entry['same_second'] \
+                and entry['last_modified'] <= request.if_modified_since
+
+        if not_modified:
+            response = Response(status=304)
+        else:
+            response = Response(self._encoded_body(entry, encoding), mimetype='application/json')
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+
+        response.set_etag(etag)
+        response.last_modified = entry['last_modified']
+        response.headers['Cache-Control'] = 'no-cache'
+        response.vary.add('Accept-Encoding')
+        return response
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _get_entry(self, key: Hashable, generation, build: Callable[[], Dict]) -> Dict:
+        with self._lock:
+            entry = self._entries.get(key)
+            hit = entry is not None and entry['generation'] == generation
+            if hit:
+                self._entries.move_to_end(key)
+
+        if self.metrics is not None:
+            self.metrics.cache_lookup('response', hit)
+        if hit:
+            return entry
+
+        body = current_app.json.dumps(build()).encode('utf-8')
+        etag = hashlib.sha1(body).hexdigest()[:20]
+
+        # Contenu identique malgré une nouvelle génération : même date. Sinon
+        # la date courante, à la seconde près (jamais dans le futur). Si elle
+        # est égale à celle de la version précédente, If-Modified-Since ne
+        # peut pas distinguer les deux : seul l'ETag donne alors un 304
+        if entry is not None and entry['etag'] == etag:
+            last_modified, same_second = entry['last_modified'], entry['same_second']
+        else:
+            last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+            same_second = entry is not None and entry['last_modified'] >= last_modified
+
+        new_entry = {
+            'generation': generation,
+            'body': body,
+            'etag': etag,
+            'last_modified': last_modified,
+            'same_second': same_second,
+            'encoded': {},
+        }
+
+        with self._lock:
+            self._entries[key] = new_entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return new_entry
+
+    def _choose_encoding(self, body: bytes) -> str:
+        if len(body) < self.min_compress_size:
+            return 'identity'
+
+        accepted = request.accept_encodings
+        if brotli is not None and accepted['br']:
+            return 'br'
+        if accepted['gzip']:
+            return 'gzip'
+        return 'identity'
+
+    def _encoded_body(self, entry: Dict, encoding: str) -> bytes:
+        '''Corps encodé, compressé une seule fois par entrée de cache'''
+        if encoding == 'identity':
+            return entry['body']
+
+        encoded = entry['encoded'].get(encoding)
+        if encoded is None:
+            if encoding == 'br':
+                encoded = brotli.compress(entry['body'], quality=5)
+            else:
+                encoded = gzip.compress(entry['body'], compresslevel=6)
+            entry['encoded'][encoding] = encoded
+        return encoded
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import sqlite3
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from nagios_parser import compact_from_json
+from sqlite_db import SQLiteDatabase
+
+# Ligne d'un fichier : (chemin, empreinte, objets sous forme compacte) ;
+# empreinte et objets valent None pour un fichier supprimé
+SharedFile = Tuple[str, Optional[Tuple], Optional[List[Tuple]]]
+
+# Version du format des lignes : les objets sont stockés en JSON (jamais
+# en pickle, qui exécuterait du code écrit dans la base par un tiers). Une
+# base d'un autre format est vidée à l'ouverture
+_FORMAT = 2
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    generation INTEGER NOT NULL,
+    stamp TEXT,
+    hosts TEXT
+);
+CREATE INDEX IF NOT EXISTS files_generation ON files (generation);
+'''
+
+
+class SharedTransaction:
+    '''
+    Transaction d'écriture sur l'index partagé : un seul processus à la fois.
+    Les fichiers écrits reçoivent la génération suivante, publiée au commit
+    '''
+
+    def __init__(self, connection: sqlite3.Connection, generation: int):
+        self._connection = connection
+        self.generation = generation
+        self.written = False
+
+    def changes_since(self, generation: int) -> List[SharedFile]:
+        return _select_changes(self._connection, generation)
+
+    def get(self, path: str, stamp: Tuple) -> Optional[List[Tuple]]:
+        '''Objets d'un fichier déjà indexé par un processus, si son empreinte correspond'''
+        row = self._connection.execute(
+            'SELECT stamp, hosts FROM files WHERE path = ?', (path,)
+        ).fetchone()
+        if row is None or row[0] is None or tuple(json.loads(row[0])) != tuple(stamp):
+            return None
+        return _decode_hosts(row[1])
+
+    def put(self, path: str, stamp: Tuple, hosts: List[Tuple]):
+        self._write(path, json.dumps(list(stamp)), json.dumps(hosts, separators=(',', ':')))
+
+    def remove(self, path: str):
+        self._write(path, None, None)
+
+    def _write(self, path: str, stamp: Optional[str], hosts: Optional[str]):
+        if not self.written:
+            self.generation += 1
+            self.written = True
+        self._connection.execute(
+            'INSERT OR REPLACE INTO files (path, generation, stamp, hosts) VALUES (?, ?, ?, ?)',
+            (path, self.generation, stamp, hosts)
+        )
+
+
+class SharedIndex:
+    '''
+    Index des hôtes partagé entre les processus (workers gunicorn) dans une
+    base SQLite en mode WAL : une ligne par fichier (empreinte et hôtes
+    parsés) et un compteur de génération incrémenté à chaque écriture.
+
+    Un processus qui trouve un fichier modifié le parse et l'écrit dans une
+    transaction exclusive ; les autres relisent simplement les lignes dont
+    la génération est plus récente que la leur. La base est créée lisible
+    par son seul propriétaire
+    '''
+
+    def __init__(self, path: str, meta: Dict, timeout: float = 30.0):
+        self.path = path
+        self._db = SQLiteDatabase(path, timeout)
+        self._db.connection().executescript(_SCHEMA)
+
+        # Base créée pour une autre configuration ou un autre format : on repart de zéro
+        meta_json = json.dumps(dict(meta, format=_FORMAT), sort_keys=True)
+        with self._db.exclusive() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'config'").fetchone()
+            if row is None or row[0] != meta_json:
+                conn.execute('DELETE FROM files')
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('config', ?)", (meta_json,))
+                conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', '0')")
+
+    def generation(self) -> int:
+        return _select_generation(self._db.connection())
+
+    def changes_since(self, generation: int) -> Tuple[int, List[SharedFile]]:
+        '''
+        Génération courante et fichiers modifiés depuis generation, lus dans
+        une même transaction (vue cohérente)
+        '''
+        connection = self._db.connection()
+        current = _select_generation(connection)
+        if current == generation:
+            return (current, [])
+
+        connection.execute('BEGIN')
+        try:
+            current = _select_generation(connection)
+            changes = _select_changes(connection, generation)
+        finally:
+            connection.execute('COMMIT')
+        return (current, changes)
+
+    @contextmanager
+    def transaction(self) -> Iterator[SharedTransaction]:
+        '''
+        Transaction d'écriture exclusive. À la sortie, txn.generation est la
+        génération publiée (inchangée si rien n'a été écrit)
+        '''
+        with self._db.exclusive() as connection:
+            txn = SharedTransaction(connection, _select_generation(connection))
+            yield txn
+            if txn.written:
+                connection.execute("UPDATE meta SET value = ? WHERE key = 'generation'", (str(txn.generation),))
+
+
+def _select_generation(connection: sqlite3.Connection) -> int:
+    row = connection.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+    return int(row[0]) if row else 0
+
+
+def _select_changes(connection: sqlite3.Connection, generation: int) -> List[SharedFile]:
+    changes = []
+    for path, stamp, hosts in connection.execute(
+            'SELECT path, stamp, hosts FROM files WHERE generation > ? ORDER BY generation', (generation,)):
+        if stamp is None:
+            changes.append((path, None, None))
+        else:
+            changes.append((path, tuple(json.loads(stamp)), _decode_hosts(hosts)))
+    return changes
+
+
+def _decode_hosts(hosts: str) -> List[Tuple]:
+    '''Formes compactes (type, clés, valeurs, début, fin) relues du JSON'''
+    return [compact_from_json(compact) for compact in json.loads(hosts)]
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import itertools
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+_memory_ids = itertools.count(1)
+
+
+class SQLiteDatabase:
+    '''
+    Base SQLite utilisée par plusieurs threads (et processus) : une
+    connexion par thread, transactions gérées explicitement. Une base sur
+    disque est en mode WAL (les lecteurs ne bloquent pas l'écrivain) et
+    créée avec les droits 0600 (SQLite reprend ces droits pour les fichiers
+    -wal et -shm).
+
+    Sans chemin, la base est en mémoire, partagée par les threads du
+    processus et conservée tant que la connexion d'ancrage reste ouverte
+    '''
+
+    def __init__(self, path: Optional[str] = None, timeout: float = 30.0, memory_name: str = 'nagios-db'):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+        if path:
+            self._database, self._uri = path, False
+            self._anchor = None
+            # Créer le fichier avant SQLite, qui utiliserait sinon les droits par défaut (umask)
+            os.close(os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_NOFOLLOW', 0), 0o600))
+        else:
+            self._database, self._uri = f"file:{memory_name}-{next(_memory_ids)}?mode=memory&cache=shared", True
+            self._anchor = sqlite3.connect(self._database, uri=True, check_same_thread=False)
+
+    def connection(self) -> sqlite3.Connection:
+        '''Connexion propre au thread courant'''
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self._database, timeout=self.timeout, isolation_level=None, uri=self._uri)
+            if not self._uri:
+                connection.execute('PRAGMA journal_mode=WAL')
+                connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def exclusive(self) -> Iterator[sqlite3.Connection]:
+        '''Transaction d'écriture exclusive (BEGIN IMMEDIATE), annulée en cas d'exception'''
+        connection = self.connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, 'benchmarks'))
+
+from nagios_manager import NagiosManager
+from synthetic import generate_tree
+
+# Faux binaire nagios : "nagios -v nagios.cfg" échoue si un fichier inclus
+# manque ou si un fichier de configuration contient INVALID
+FAKE_NAGIOS = '''#!{python}
+import os, sys
+cfg = sys.argv[-1]
+errors = []
+for line in open(cfg):
+    key, _, value = line.strip().partition('=')
+    if key == 'cfg_file':
+        paths = [value]
+    elif key == 'cfg_dir':
+        paths = [os.path.join(root, name) for root, dirs, files in os.walk(value)
+                 for name in files if name.endswith('.cfg')]
+    else:
+        continue
+    for path in paths:
+        if not os.path.exists(path):
+            errors.append('Error: Cannot open config file ' + path)
+        elif 'INVALID' in open(path).read():
+            errors.append('Error: Invalid definition in ' + path)
+print('\\n'.join(errors) or 'Things look okay')
+sys.exit(1 if errors else 0)
+'''
+
+
+@pytest.fixture
+def tree(tmp_path):
+    '''Arborescence synthétique : 60 hôtes, 5 par fichier, 3 répertoires référencés par cfg_dir'''
+    root = str(tmp_path / 'etc')
+    generate_tree(root, hosts=60, hosts_per_file=5, directories=3)
+    return root
+
+
+@pytest.fixture
+def fake_nagios(tmp_path):
+    path = tmp_path / 'nagios'
+    path.write_text(FAKE_NAGIOS.format(python=sys.executable))
+    path.chmod(0o755)
+    return str(path)
+
+
+@pytest.fixture
+def manager(tree, fake_nagios, tmp_path):
+    mgr = NagiosManager(tree, lock_dir=str(tmp_path / 'locks'))
+    mgr.nagios_bin = fake_nagios
+    mgr.refresh_index()
+    return mgr
+
+
+def read(path):
+    with open(path) as f:
+        return f.read()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import app as app_module
+from conftest import ROOT_DIR, read
+from nagios_manager import PARALLEL_MIN_FILES
+from synthetic import generate_tree
+
+
+@pytest.fixture
+def client(tree, fake_nagios, tmp_path, monkeypatch):
+    '''Client de test sur l'arborescence synthétique, sans authentification'''
+    htpasswd = tmp_path / 'htpasswd.users'
+    htpasswd.write_text('')
+    monkeypatch.setitem(app_module.app.config, 'NAGIOS_BASE_PATH', tree)
+    monkeypatch.setitem(app_module.app.config, 'HTPASSWD_FILE', str(htpasswd))
+    monkeypatch.setitem(app_module.app.config, 'LOCK_DIR', str(tmp_path / 'locks'))
+    monkeypatch.setitem(app_module.app.config, 'REQUIRE_AUTH', False)
+    monkeypatch.setitem(app_module.app.config, 'NAGIOS_WATCH_CHANGES', False)
+    monkeypatch.setitem(app_module.app.config, 'INDEX_SNAPSHOT_PATH', '')
+    monkeypatch.setitem(app_module.app.config, 'SHARED_INDEX_PATH', '')
+    monkeypatch.setitem(app_module.app.config, 'CHANGE_JOURNAL_PATH', '')
+    monkeypatch.setitem(app_module.app.config, 'RELOAD_WINDOW', 0)
+
+    app_module.create_app()
+    app_module.nagios_mgr.nagios_bin = fake_nagios
+    try:
+        yield app_module.app.test_client()
+    finally:
+        for name in ('nagios_mgr', 'job_manager', 'reload_scheduler', 'authenticator'):
+            setattr(app_module, name, None)
+
+
+def test_import_starts_no_services():
+    # Les processus du pool de parsing réimportent le script principal
+    assert app_module.nagios_mgr is None
+    assert app_module.job_manager is None
+
+
+def test_create_app_builds_the_services_once(client):
+    manager = app_module.nagios_mgr
+    assert manager is not None
+    assert app_module.create_app() is app_module.app
+    assert app_module.nagios_mgr is manager
+
+    response = client.get('/api/hosts?limit=5&fields=host_name')
+    assert response.status_code == 200
+    assert [host['host_name'] for host in response.get_json()['hosts']] == [
+        'host000000', 'host000001', 'host000002', 'host000003', 'host000004']
+
+
+def finished_job(client, response):
+    '''Job d'une réponse 202, attendu jusqu'à sa fin'''
+    assert response.status_code == 202
+    job_id = response.get_json()['job']['id']
+    assert response.headers['Location'].endswith(f"/api/jobs/{job_id}")
+    assert app_module.job_manager.get(job_id).wait(10)
+    return client.get(f"/api/jobs/{job_id}").get_json()['job']
+
+
+def test_update_returns_before_validation(client):
+    response = client.put('/api/hosts/host000001', json={'host': {'host_name': 'host000001', 'address': '10.9.9.9'}})
+    job = finished_job(client, response)
+    assert job['type'] == 'validate' and job['success'] is True
+    assert client.get('/api/hosts/host000001').get_json()['host']['address'] == '10.9.9.9'
+
+
+def test_wait_returns_the_validation(client):
+    response = client.put('/api/hosts/host000001?wait=1',
+                          json={'host': {'host_name': 'host000001', 'address': '10.9.9.9'}})
+    assert response.status_code == 200
+    assert 'Things look okay' in response.get_json()['validation']
+
+    response = client.put('/api/hosts/host000002?wait=1',
+                          json={'host': {'host_name': 'host000002', 'notes': 'INVALID'}})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Configuration invalide'
+
+
+def test_create_rejects_duplicates_without_writing(client, tree):
+    before = read(os.path.join(tree, 'nagios.cfg'))
+    response = client.post('/api/hosts', json={'host': {'host_name': 'host000001', 'address': '10.9.9.9'},
+                                                'directory': os.path.join(tree, 'new')})
+    assert response.status_code == 400
+    assert response.get_json()['errors'] == ["L'hôte host000001 existe déjà"]
+    assert not os.path.exists(os.path.join(tree, 'new'))
+    assert read(os.path.join(tree, 'nagios.cfg')) == before
+    assert app_module.job_manager.list() == []
+
+
+def test_bulk_runs_in_a_job(client):
+    response = client.post('/api/hosts/bulk', json={'operations': [
+        {'action': 'update', 'host_name': 'host000001', 'host': {'host_name': 'host000001', 'address': '10.9.9.9'}},
+        {'action': 'delete', 'host_name': 'host000002'},
+    ]})
+    job = finished_job(client, response)
+    assert job['type'] == 'bulk' and job['success'] is True
+    assert [result['success'] for result in job['result']['results']] == [True, True]
+    assert client.get('/api/hosts/host000002').status_code == 404
+
+
+def test_validate_and_restart_return_jobs(client):
+    job = finished_job(client, client.post('/api/validate'))
+    assert job['success'] is True
+
+    response = client.post('/api/restart')
+    assert response.get_json()['generation'] >= 1
+    assert finished_job(client, response)['type'] == 'restart'
+
+
+def test_export_streams_ndjson_and_csv(client, tree):
+    response = client.get('/api/export?directory=site002')
+    assert response.status_code == 200 and response.mimetype == 'application/x-ndjson'
+    assert not response.is_sequence
+    hosts = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert len(hosts) == 20
+    assert {host['directory'] for host in hosts} == {os.path.join(tree, 'site002')}
+
+    response = client.get('/api/export?format=csv&fields=host_name,address')
+    assert response.mimetype == 'text/csv'
+    assert 'filename="nagios-hosts.csv"' in response.headers['Content-Disposition']
+    lines = response.get_data(as_text=True).splitlines()
+    assert lines[0] == 'host_name,address' and 'host000001,10.0.0.1' in lines and len(lines) == 61
+
+    assert client.get('/api/export?format=xml').status_code == 400
+
+
+def test_directories_with_counts(client, tree):
+    response = client.get('/api/directories')
+    body = response.get_json()
+    assert body['directories'] == [os.path.join(tree, f"site{d:03d}") for d in range(3)]
+    assert [(entry['relative_path'], entry['hosts'], entry['files']) for entry in body['tree']] == [
+        ('site000', 20, 4), ('site001', 20, 4), ('site002', 20, 4)]
+
+    # Réponse inchangée tant que l'index ne change pas
+    assert client.get('/api/directories', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+
+def test_request_timings(client, monkeypatch):
+    def requests_counted():
+        # Registre partagé par les tests du module : seule la différence compte
+        prefix = 'nagios_http_request_seconds_count{method="GET",route="/api/hosts/<host_name>",status="200"} '
+        lines = client.get('/metrics').get_data(as_text=True).splitlines()
+        return sum(int(line[len(prefix):]) for line in lines if line.startswith(prefix))
+
+    before = requests_counted()
+    monkeypatch.setitem(app_module.app.config, 'SERVER_TIMING', True)
+    response = client.get('/api/hosts/host000001')
+    assert response.status_code == 200
+    phases = [entry.split(';')[0] for entry in response.headers['Server-Timing'].split(', ')]
+    assert 'walk' in phases and phases[-1] == 'total'
+    assert requests_counted() == before + 1
+
+
+def test_metrics_accept_the_scrape_token(client, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, 'REQUIRE_AUTH', True)
+    monkeypatch.setitem(app_module.app.config, 'METRICS_TOKEN', 'scrape-secret')
+
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    response = client.get('/metrics', headers={'Authorization': 'Bearer scrape-secret'})
+    assert response.status_code == 200 and b'nagios_hosts' in response.data
+    # Le jeton n'ouvre que /metrics
+    assert client.get('/api/hosts', headers={'Authorization': 'Bearer scrape-secret'}).status_code == 401
+
+
+def test_metrics_do_not_wait_for_the_index(client):
+    # Réindexation en cours dans un autre thread
+    acquired, release = threading.Event(), threading.Event()
+
+    def reindex():
+        with app_module.nagios_mgr._index_lock:
+            acquired.set()
+            release.wait(5)
+
+    worker = threading.Thread(target=reindex)
+    worker.start()
+    acquired.wait(5)
+    try:
+        started = time.monotonic()
+        assert client.get('/metrics').status_code == 200
+        assert time.monotonic() - started < 2
+    finally:
+        release.set()
+        worker.join()
+
+
+# Lancement comme "python app.py" : chaque création de NagiosManager est comptée,
+# y compris dans les processus du pool de parsing
+MAIN_SCRIPT = '''
+import sys
+sys.path.insert(0, {root!r})
+import nagios_manager
+
+init = nagios_manager.NagiosManager.__init__
+
+def counting_init(self, *args, **kwargs):
+    with open({marker!r}, 'a') as f:
+        f.write('x')
+    init(self, *args, **kwargs)
+
+nagios_manager.NagiosManager.__init__ = counting_init
+
+import app
+
+if __name__ == '__main__':
+    app.create_app()
+    print(len(app.nagios_mgr.get_all_hosts()))
+'''
+
+
+def test_parse_workers_do_not_start_the_services(tmp_path):
+    root = str(tmp_path / 'etc')
+    generate_tree(root, hosts=5 * PARALLEL_MIN_FILES, hosts_per_file=5, directories=2)
+    htpasswd = tmp_path / 'htpasswd.users'
+    htpasswd.write_text('')
+    marker = str(tmp_path / 'marker')
+    script = tmp_path / 'main.py'
+    script.write_text(MAIN_SCRIPT.format(root=ROOT_DIR, marker=marker))
+
+    env = dict(os.environ, NAGIOS_BASE_PATH=root, NAGIOS_PARSE_WORKERS='2', HTPASSWD_FILE=str(htpasswd),
+               LOCK_DIR=str(tmp_path / 'locks'), REQUIRE_AUTH='false')
+    output = subprocess.run([sys.executable, str(script)], capture_output=True, text=True,
+                            check=True, env=env, cwd=str(tmp_path)).stdout
+    assert int(output) == 5 * PARALLEL_MIN_FILES
+    assert read(marker) == 'x'
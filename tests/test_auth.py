@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+
+from passlib.apache import HtpasswdFile
+
+from auth import Authenticator
+
+
+def write_htpasswd(path, password, mtime):
+    htpasswd = HtpasswdFile(path, new=True, default_scheme='apr_md5_crypt')
+    htpasswd.set_password('nagiosadmin', password)
+    htpasswd.save()
+    os.utime(path, (mtime, mtime))
+
+
+def test_verified_password_is_cached(tmp_path):
+    path = str(tmp_path / 'htpasswd')
+    write_htpasswd(path, 'secret', 1000)
+    auth = Authenticator(path, 'key')
+
+    assert auth.check_password('nagiosadmin', 'secret')
+    assert len(auth._verified) == 1
+    assert not auth.check_password('nagiosadmin', 'wrong')
+
+
+def test_password_change_clears_cache(tmp_path):
+    path = str(tmp_path / 'htpasswd')
+    write_htpasswd(path, 'secret', 1000)
+    auth = Authenticator(path, 'key')
+    assert auth.check_password('nagiosadmin', 'secret')
+
+    write_htpasswd(path, 'changed', 2000)
+    assert not auth.check_password('nagiosadmin', 'secret')
+    assert auth.check_password('nagiosadmin', 'changed')
+
+
+def test_check_racing_a_reload_is_not_cached(tmp_path):
+    path = str(tmp_path / 'htpasswd')
+    write_htpasswd(path, 'secret', 1000)
+    auth = Authenticator(path, 'key')
+    context = auth._htpasswd.context
+
+    class ReloadingContext:
+        def verify(self, password, hash_value):
+            # Le mot de passe change (et le fichier est relu) pendant le hachage
+            result = context.verify(password, hash_value)
+            write_htpasswd(path, 'changed', 2000)
+            auth.reload_if_changed()
+            return result
+
+    auth._htpasswd.context = ReloadingContext()
+    # Vérifié contre l'entrée lue avant le rechargement, mais pas mémorisé
+    assert auth.check_password('nagiosadmin', 'secret')
+    auth._htpasswd.context = context
+
+    assert not auth._verified
+    assert not auth.check_password('nagiosadmin', 'secret')
+
+
+def test_token_is_revoked_by_password_change(tmp_path):
+    path = str(tmp_path / 'htpasswd')
+    write_htpasswd(path, 'secret', 1000)
+    auth = Authenticator(path, 'key')
+    token = auth.issue_token('nagiosadmin')
+    assert auth.verify_token(token) == 'nagiosadmin'
+
+    write_htpasswd(path, 'changed', 2000)
+    assert auth.verify_token(token) is None
+
+
+def test_check_uses_the_entry_read_before_a_reload(tmp_path):
+    path = str(tmp_path / 'htpasswd')
+    write_htpasswd(path, 'secret', 1000)
+    auth = Authenticator(path, 'key')
+    context = auth._htpasswd.context
+    verified = []
+
+    class RecordingContext:
+        def verify(self, password, hash_value):
+            # Rechargement avant le hachage : l'entrée vérifiée reste celle lue sous le verrou
+            write_htpasswd(path, 'changed', 2000)
+            auth.reload_if_changed()
+            verified.append(hash_value)
+            return context.verify(password, hash_value)
+
+    before = auth._htpasswd.get_hash('nagiosadmin')
+    auth._htpasswd.context = RecordingContext()
+    auth.check_password('nagiosadmin', 'secret')
+    auth._htpasswd.context = context
+
+    assert verified == [before]
+    assert not auth._verified
+    assert auth.check_password('nagiosadmin', 'changed')
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+
+from conftest import read
+
+
+def update(host_name, address):
+    return {'action': 'update', 'host_name': host_name, 'host': {'host_name': host_name, 'address': address}}
+
+
+def test_failed_validation_restores_every_file(manager, tree):
+    file_path = manager.get_host_by_name('host000001')['file_path']
+    original = read(file_path)
+
+    success, results, output = manager.apply_bulk(
+        [update('host000001', 'INVALID'),
+         {'action': 'create', 'directory': 'newdir', 'host': {'host_name': 'web10', 'address': '10.0.0.10'}}],
+        precheck=False)
+
+    assert not success and 'Invalid definition' in output
+    assert read(file_path) == original
+    assert manager.get_host_by_name('web10') is None
+    assert manager.validate_configuration(use_cache=False)[0]
+
+
+def test_failed_validation_keeps_concurrent_api_update(manager):
+    updater = threading.Thread(target=manager.update_host,
+                               args=('host000002', {'host_name': 'host000002', 'address': '10.2.2.2'}))
+
+    def validator():
+        # Mise à jour concurrente du même fichier pendant la validation :
+        # elle attend la fin du lot et n'est pas écrasée par la restauration
+        updater.start()
+        time.sleep(0.2)
+        return (False, 'Error: invalid')
+
+    success, results, output = manager.apply_bulk([update('host000001', '10.1.1.1')], validator=validator,
+                                                  precheck=False)
+    updater.join()
+
+    assert not success
+    assert manager.get_host_by_name('host000001')['address'] == '10.0.0.1'
+    assert manager.get_host_by_name('host000002')['address'] == '10.2.2.2'
+
+
+def test_failed_validation_keeps_external_edit(manager):
+    file_path = manager.get_host_by_name('host000001')['file_path']
+
+    def validator():
+        # Fichier édité à la main pendant la validation
+        content = read(file_path).replace('10.0.0.3\n', '10.3.3.3\n')
+        with open(file_path, 'w') as f:
+            f.write(content)
+        return (False, 'Error: invalid')
+
+    success, results, output = manager.apply_bulk(
+        [update('host000001', '10.1.1.1'), {'action': 'delete', 'host_name': 'host000004'}],
+        validator=validator, precheck=False)
+
+    assert not success
+    assert manager.get_host_by_name('host000001')['address'] == '10.0.0.1'
+    assert manager.get_host_by_name('host000003')['address'] == '10.3.3.3'
+    assert manager.get_host_by_name('host000004') is not None
+
+
+def test_restore_does_not_hold_the_index_lock(manager, monkeypatch):
+    # Les autres écrivains prennent les verrous de fichiers puis celui de
+    # l'index : la restauration ne doit pas faire l'inverse
+    restore_backups = manager._restore_backups
+    index_free = []
+
+    def checking_restore(*args):
+        other = threading.Thread(target=lambda: index_free.append(manager._index_lock.acquire(timeout=1)
+                                                                  and manager._index_lock.release() is None))
+        other.start()
+        other.join()
+        restore_backups(*args)
+
+    monkeypatch.setattr(manager, '_restore_backups', checking_restore)
+    success, results, output = manager.apply_bulk([update('host000001', '10.1.1.1')],
+                                                  validator=lambda: (False, 'Error: invalid'), precheck=False)
+
+    assert not success
+    assert index_free == [True]
+    assert manager.get_host_by_name('host000001')['address'] == '10.0.0.1'
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+
+from cfg_includes import CfgIncludes
+from conftest import read
+
+NAGIOS_CFG = '''# Configuration principale
+log_file=/var/log/nagios.log
+cfg_file=/etc/nagios/objects/commands.cfg
+cfg_file=hosts/single.cfg
+resource_file=resource.cfg
+cfg_dir=/etc/nagios/site1
+cfg_dir=/etc/nagios/servers/
+#cfg_dir=/etc/nagios/disabled
+'''
+
+
+def parse():
+    return CfgIncludes.parse(NAGIOS_CFG.splitlines(), '/etc/nagios')
+
+
+def test_files_and_nested_directories():
+    includes = parse()
+    assert includes.dirs == ['/etc/nagios/site1', '/etc/nagios/servers']
+    assert includes.files == ['/etc/nagios/objects/commands.cfg', '/etc/nagios/hosts/single.cfg',
+                              '/etc/nagios/resource.cfg']
+
+    assert includes.covers('/etc/nagios/objects/commands.cfg')
+    # cfg_file relatif au répertoire de nagios.cfg
+    assert includes.covers('hosts/single.cfg')
+    assert not includes.covers('/etc/nagios/hosts/other.cfg')
+
+    # Toute profondeur sous un cfg_dir, chemins normalisés
+    assert includes.covers('/etc/nagios/site1/web.cfg')
+    assert includes.covers('/etc/nagios/site1/zone1/zone2/web.cfg')
+    assert includes.covers('/etc/nagios/servers/../site1/web.cfg')
+    # Nagios ne charge que les .cfg des cfg_dir
+    assert not includes.covers('/etc/nagios/site1/notes.txt')
+    assert not includes.covers('/etc/nagios/disabled/web.cfg')
+
+
+def test_no_prefix_false_positives():
+    includes = parse()
+    assert not includes.covers('/etc/nagios/site10/web.cfg')
+    assert not includes.covers('/etc/nagios/site1-old/web.cfg')
+    assert not includes.covers('/etc/nagios/serverstest/web.cfg')
+    assert not includes.covers('/etc/nagios/objects/commands.cfg.bak')
+
+
+def test_with_files_leaves_the_original_unchanged():
+    includes = parse()
+    extended = includes.with_files(['/etc/nagios/hosts/other.cfg', 'new/web.cfg'])
+
+    assert extended.covers('/etc/nagios/hosts/other.cfg')
+    assert extended.covers('/etc/nagios/new/web.cfg')
+    assert extended.covers('/etc/nagios/hosts/single.cfg')
+    assert not includes.covers('/etc/nagios/hosts/other.cfg')
+    assert includes.files[-1] == '/etc/nagios/resource.cfg'
+
+
+def cfg_files(tree):
+    return [line for line in read(os.path.join(tree, 'nagios.cfg')).splitlines() if line.startswith('cfg_file=')]
+
+
+def test_create_adds_cfg_file_only_when_not_covered(manager, tree):
+    # Sous-répertoire d'un cfg_dir : déjà chargé
+    assert manager.create_host({'host_name': 'nested', 'address': '10.0.9.1'}, 'site000/zone1')
+    assert cfg_files(tree) == []
+
+    # Même préfixe qu'un cfg_dir mais autre répertoire
+    assert manager.create_host({'host_name': 'prefixed', 'address': '10.0.9.2'}, 'site0001')
+    assert cfg_files(tree) == [f"cfg_file={os.path.join(tree, 'site0001', 'prefixed.cfg')}"]
+    assert manager.validate_configuration(use_cache=False)[0]
+
+
+def test_bulk_create_appends_all_lines_at_once(manager, tree, monkeypatch):
+    writes = []
+    atomic_write = manager._atomic_write
+    monkeypatch.setattr(manager, '_atomic_write', lambda path, write: writes.append(path) or atomic_write(path, write))
+
+    success, results, output = manager.apply_bulk(
+        [{'action': 'create', 'directory': 'newdir', 'host': {'host_name': f"web{i}", 'address': f"10.0.8.{i}"}}
+         for i in range(3)])
+
+    assert success
+    assert cfg_files(tree) == [f"cfg_file={os.path.join(tree, 'newdir', f'web{i}.cfg')}" for i in range(3)]
+    assert writes.count(manager.nagios_cfg) == 1
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sqlite3
+
+from change_journal import ChangeJournal
+from conftest import read
+
+
+def test_rollback_of_create_removes_cfg_file_line(manager, tree):
+    nagios_cfg = os.path.join(tree, 'nagios.cfg')
+    assert manager.create_host({'host_name': 'web10', 'address': '10.0.0.10'}, 'newdir')
+    file_path = os.path.join(tree, 'newdir', 'web10.cfg')
+    assert f"cfg_file={file_path}" in read(nagios_cfg)
+    assert manager.changes_since(0)['changes'][-1]['cfg_file'] == file_path
+
+    success, results = manager.rollback()
+    assert success and results[0]['action'] == 'create'
+    assert not os.path.exists(file_path)
+    assert 'cfg_file=' not in read(nagios_cfg)
+    assert manager.validate_configuration(use_cache=False)[0]
+
+    # L'annulation est journalisée avec la ligne retirée de nagios.cfg
+    last = manager.changes_since(0)['changes'][-1]
+    assert (last['source'], last['action'], last['cfg_file']) == ('rollback', 'delete', file_path)
+
+
+def test_delete_of_last_host_removes_cfg_file_line(manager, tree):
+    nagios_cfg = os.path.join(tree, 'nagios.cfg')
+    assert manager.create_host({'host_name': 'web10', 'address': '10.0.0.10'}, 'newdir')
+    assert manager.delete_host('web10')
+    assert 'cfg_file=' not in read(nagios_cfg)
+    assert manager.validate_configuration(use_cache=False)[0]
+
+
+def test_bulk_delete_of_new_file_removes_cfg_file_line(manager, tree):
+    nagios_cfg = os.path.join(tree, 'nagios.cfg')
+    success, results, output = manager.apply_bulk(
+        [{'action': 'create', 'directory': 'newdir', 'host': {'host_name': 'web10', 'address': '10.0.0.10'}}],
+        precheck=False)
+    assert success and 'cfg_file=' in read(nagios_cfg)
+
+    success, results, output = manager.apply_bulk([{'action': 'delete', 'host_name': 'web10'}], precheck=False)
+    assert success, output
+    assert 'cfg_file=' not in read(nagios_cfg)
+    assert manager.changes_since(0)['changes'][-1]['cfg_file'] == os.path.join(tree, 'newdir', 'web10.cfg')
+
+
+def test_journal_adds_cfg_file_column_to_existing_database(tmp_path):
+    path = str(tmp_path / 'journal.db')
+    connection = sqlite3.connect(path)
+    connection.execute('CREATE TABLE changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, time REAL NOT NULL, '
+                       'source TEXT NOT NULL, action TEXT NOT NULL, host_name TEXT, old_host_name TEXT, '
+                       'file_path TEXT, before TEXT, after TEXT, reverts INTEGER, reverted_by INTEGER)')
+    connection.close()
+
+    journal = ChangeJournal(path)
+    journal.record([{'source': 'api', 'action': 'create', 'host_name': 'web10', 'cfg_file': '/etc/web10.cfg'}])
+    assert journal.since(0)[0]['cfg_file'] == '/etc/web10.cfg'
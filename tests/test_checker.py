@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from nagios_manager import NagiosManager
+from synthetic import generate_tree
+
+
+@pytest.fixture
+def templated(tmp_path):
+    '''Arborescence avec une chaîne de modèles et les commandes, contacts et périodes référencés'''
+    root = str(tmp_path / 'etc')
+    generate_tree(root, hosts=20, hosts_per_file=5, directories=2, template_depth=3)
+    return NagiosManager(root, lock_dir=str(tmp_path / 'locks'))
+
+
+def host(**directives):
+    data = {'host_name': 'new-host', 'use': 'linux-server', 'address': '10.9.9.9'}
+    data.update(directives)
+    return data
+
+
+def test_valid_host(templated):
+    assert templated.check_host(host(check_command='check-host-alive!3000', contacts='nagiosadmin',
+                                     contact_groups='+admins', check_period='24x7')) == []
+
+
+@pytest.mark.parametrize('directives, error', [
+    ({'use': 'linux-server, missing-template'}, "use : modèle d'hôte « missing-template » introuvable"),
+    ({'check_command': 'check-missing!1'}, "check_command : commande « check-missing » introuvable"),
+    ({'contacts': 'nagiosadmin,nobody'}, "contacts : contact « nobody » introuvable"),
+    ({'notification_period': 'workhours'}, "notification_period : période « workhours » introuvable"),
+    ({'parents': 'host000001, unknown-parent'}, "parents : hôte « unknown-parent » introuvable"),
+])
+def test_unknown_references(templated, directives, error):
+    assert templated.check_host(host(**directives)) == [error]
+
+
+def test_duplicate_host_name(templated):
+    assert templated.check_host(host(host_name='host000003')) == ["L'hôte host000003 existe déjà"]
+    # Mise à jour sans renommage : le nom est celui de l'hôte lui-même
+    assert templated.check_host(host(host_name='host000003'), original_host_name='host000003') == []
+    assert templated.check_host({'address': '10.9.9.9'}) == ['host_name est requis']
+
+
+def test_hosts_created_together(templated):
+    assert templated.check_host(host(parents='other-new-host'), extra_hosts=['other-new-host']) == []
+
+
+def test_types_without_definitions_are_left_to_nagios(tmp_path):
+    # Aucun hostgroup défini dans l'arborescence : nagios -v en jugera
+    root = str(tmp_path / 'etc')
+    generate_tree(root, hosts=5, directories=1, template_depth=2)
+    manager = NagiosManager(root, lock_dir=str(tmp_path / 'locks'))
+    assert manager.check_host(host(hostgroups='web-servers')) == []
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+from nagios_manager import NagiosManager
+from synthetic import generate_tree
+
+
+@pytest.fixture
+def nested(tmp_path):
+    '''Deux sites de trois niveaux, plus des répertoires à exclure contenant des hôtes'''
+    root = str(tmp_path / 'etc')
+    generate_tree(root, hosts=30, hosts_per_file=5, directories=2, depth=3)
+    for directory in ('archives/old', 'backup-1', 'site000/.git'):
+        os.makedirs(os.path.join(root, directory))
+        with open(os.path.join(root, directory, 'old.cfg'), 'w') as f:
+            f.write('define host {\n    host_name    old\n}\n')
+
+    return NagiosManager(root, lock_dir=str(tmp_path / 'locks'),
+                         excluded_dirs=('objects', 'archives', '.git', 'backup-*'))
+
+
+def counts(manager):
+    return {entry['relative_path']: (entry['hosts'], entry['files'], entry['total_hosts'], entry['total_files'])
+            for entry in manager.get_directory_tree()}
+
+
+def test_counts_per_directory_and_subtree(nested):
+    assert counts(nested) == {
+        'site000': (0, 0, 15, 3),
+        'site000/zone1': (0, 0, 15, 3),
+        'site000/zone1/zone2': (15, 3, 15, 3),
+        'site001': (0, 0, 15, 3),
+        'site001/zone1': (0, 0, 15, 3),
+        'site001/zone1/zone2': (15, 3, 15, 3),
+    }
+    assert nested.get_directories() == [entry['path'] for entry in nested.get_directory_tree()]
+    assert nested.get_host_by_name('old') is None
+
+
+def test_tree_is_rebuilt_only_when_the_index_changes(nested, monkeypatch):
+    builds = []
+    build = nested._build_directory_view
+    monkeypatch.setattr(nested, '_build_directory_view', lambda: builds.append(1) or build())
+
+    nested.get_directory_tree()
+    nested.get_directory_tree()
+    assert len(builds) == 1
+
+    assert nested.create_host({'host_name': 'web01', 'address': '10.0.9.1'}, 'site000/zone1')
+    assert counts(nested)['site000/zone1'] == (1, 1, 16, 4)
+    assert counts(nested)['site000'] == (0, 0, 16, 4)
+    assert len(builds) == 2
+
+    # Les entrées retournées sont des copies
+    nested.get_directory_tree()[0]['hosts'] = 99
+    assert counts(nested)['site000'] == (0, 0, 16, 4)
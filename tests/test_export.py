@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import csv
+import io
+import json
+import os
+
+from host_export import csv_chunks, ndjson_chunks
+
+RECORDS = [{'host_name': f"web{i}", 'address': f"10.0.0.{i}", 'alias': 'Serveur "web", étage 1'} for i in range(10)]
+
+
+def test_ndjson_chunks():
+    chunks = list(ndjson_chunks(iter(RECORDS), chunk_size=100))
+    assert len(chunks) > 1 and all(chunk.endswith(b'\n') for chunk in chunks)
+
+    lines = b''.join(chunks).decode('utf-8').splitlines()
+    assert [json.loads(line) for line in lines] == RECORDS
+    assert 'étage' in lines[0]
+    assert list(ndjson_chunks([])) == []
+
+
+def test_csv_chunks():
+    chunks = list(csv_chunks(iter(RECORDS), ['host_name', 'alias'], chunk_size=100))
+    assert len(chunks) > 1
+
+    rows = list(csv.reader(io.StringIO(b''.join(chunks).decode('utf-8'))))
+    assert rows[0] == ['host_name', 'alias']
+    assert rows[1] == ['web0', 'Serveur "web", étage 1']
+    assert len(rows) == 11
+    assert list(csv_chunks([], ['host_name'])) == [b'host_name\r\n']
+
+
+def test_iter_hosts_by_directory(manager, tree):
+    hosts = list(manager.iter_hosts(directory='site001', fields=['host_name', 'directory']))
+    assert len(hosts) == 20
+    assert {host['directory'] for host in hosts} == {os.path.join(tree, 'site001')}
+
+    # Un préfixe de nom de répertoire ne suffit pas
+    assert list(manager.iter_hosts(directory='site00')) == []
+    assert len(list(manager.iter_hosts())) == 60
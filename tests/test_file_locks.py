@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from conftest import ROOT_DIR
+from file_locks import LOCK_DIR_NAME, FileLockManager
+from nagios_manager import NagiosManager
+
+HOLDER = '''
+import sys, time
+sys.path.insert(0, {root!r})
+from file_locks import FileLockManager
+with FileLockManager({lock_dir!r}).lock({path!r}):
+    print('locked', flush=True)
+    sys.stdin.readline()
+'''
+
+
+def test_lock_is_reentrant(tmp_path):
+    locks = FileLockManager(str(tmp_path / 'locks'))
+    with locks.lock('/etc/a.cfg', '/etc/b.cfg'):
+        with locks.lock('/etc/a.cfg'):
+            pass
+
+
+def test_lock_excludes_other_threads(tmp_path):
+    locks = FileLockManager(str(tmp_path / 'locks'), timeout=0.2)
+    acquired = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with locks.lock('/etc/a.cfg'):
+            acquired.set()
+            release.wait()
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    acquired.wait()
+    with pytest.raises(TimeoutError):
+        with locks.lock('/etc/a.cfg'):
+            pass
+    release.set()
+    thread.join()
+
+    with locks.lock('/etc/a.cfg'):
+        pass
+
+
+def test_lock_excludes_other_processes(tmp_path):
+    lock_dir = str(tmp_path / 'locks')
+    holder = subprocess.Popen([sys.executable, '-c', HOLDER.format(root=ROOT_DIR, lock_dir=lock_dir,
+                                                                   path='/etc/a.cfg')],
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    try:
+        assert holder.stdout.readline().strip() == 'locked'
+        locks = FileLockManager(lock_dir, timeout=0.2)
+        with pytest.raises(TimeoutError):
+            with locks.lock('/etc/a.cfg'):
+                pass
+        # Un autre fichier reste disponible
+        with locks.lock('/etc/b.cfg'):
+            pass
+    finally:
+        holder.communicate('\n')
+
+    with FileLockManager(lock_dir, timeout=0.2).lock('/etc/a.cfg'):
+        pass
+
+
+def test_readers_do_not_wait_for_a_blocked_writer(manager, tmp_path):
+    file_path = manager.get_host_by_name('host000001')['file_path']
+    holder = subprocess.Popen([sys.executable, '-c', HOLDER.format(root=ROOT_DIR, lock_dir=str(tmp_path / 'locks'),
+                                                                   path=file_path)],
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    try:
+        assert holder.stdout.readline().strip() == 'locked'
+        manager._file_locks.timeout = 5
+        writer = threading.Thread(target=manager.update_host,
+                                  args=('host000001', {'host_name': 'host000001', 'address': '10.1.1.1'}))
+        writer.start()
+        # Pendant que l'écrivain attend le verrou de l'autre processus,
+        # les lectures de l'index ne sont pas bloquées
+        reader = threading.Thread(target=lambda: (manager.query_hosts(q='host00000'),
+                                                  manager.get_host_by_name('host000002')))
+        reader.start()
+        reader.join(2)
+        assert not reader.is_alive()
+        assert writer.is_alive()
+    finally:
+        holder.communicate('\n')
+
+    writer.join()
+    assert manager.get_host_by_name('host000001')['address'] == '10.1.1.1'
+
+
+def test_lock_dir_writable_by_everyone_is_refused(tmp_path):
+    lock_dir = tmp_path / 'locks'
+    lock_dir.mkdir()
+    lock_dir.chmod(0o777)
+    with pytest.raises(PermissionError):
+        FileLockManager(str(lock_dir))
+
+
+def test_lock_dir_symlink_is_refused(tmp_path):
+    (tmp_path / 'real').mkdir()
+    (tmp_path / 'locks').symlink_to(tmp_path / 'real')
+    with pytest.raises(PermissionError):
+        FileLockManager(str(tmp_path / 'locks'))
+
+
+def test_default_lock_dir_is_not_scanned(tree):
+    manager = NagiosManager(tree)
+    assert os.path.isdir(os.path.join(tree, LOCK_DIR_NAME))
+    with manager._file_locks.lock(os.path.join(tree, 'nagios.cfg')):
+        pass
+    assert not any(LOCK_DIR_NAME in path for path in manager.get_directories())
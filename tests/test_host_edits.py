@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+
+from conftest import read
+from nagios_manager import PARALLEL_MIN_FILES, NagiosManager
+from synthetic import generate_tree
+
+
+def test_update_splices_only_the_host_block(manager):
+    file_path = manager.get_host_by_name('host000001')['file_path']
+    original = read(file_path).split('define host')
+
+    assert manager.update_host('host000001', {'host_name': 'host000001', 'address': '10.9.9.9'})
+
+    content = read(file_path).split('define host')
+    # Seul le bloc de host000001 (le deuxième du fichier) change
+    assert content[:2] == original[:2] and content[3:] == original[3:]
+    assert '10.9.9.9' in content[2]
+    assert manager.get_host_by_name('host000001')['address'] == '10.9.9.9'
+
+
+def test_update_keeps_index_consistent_with_disk(manager, tree):
+    manager.update_host('host000002', {'host_name': 'host000002', 'alias': 'x' * 500, 'address': '1.1.1.1'})
+    manager.update_host('host000003', {'host_name': 'host000003-renamed', 'address': '2.2.2.2'})
+
+    fresh = NagiosManager(tree)
+    assert sorted(h['host_name'] for h in fresh.get_all_hosts()) == \
+        sorted(h['host_name'] for h in manager.get_all_hosts())
+    assert manager.get_host_by_name('host000003') is None
+    assert manager.get_host_by_name('host000004')['address'] == fresh.get_host_by_name('host000004')['address']
+
+
+def test_delete_last_host_removes_file(manager):
+    file_path = manager.get_host_by_name('host000000')['file_path']
+    names = [h['host_name'] for h in manager.get_all_hosts() if h['file_path'] == file_path]
+
+    for name in names:
+        assert manager.delete_host(name)
+
+    assert not os.path.exists(file_path)
+    assert all(manager.get_host_by_name(name) is None for name in names)
+
+
+def test_create_host_and_duplicate_file(manager, tree):
+    assert manager.create_host({'host_name': 'newhost', 'address': '10.0.0.1'}, 'site000')
+    host = manager.get_host_by_name('newhost')
+    assert host['file_path'] == os.path.join(tree, 'site000', 'newhost.cfg')
+
+    assert not manager.create_host({'host_name': 'newhost', 'address': '10.0.0.2'}, 'site000')
+    assert manager.get_host_by_name('newhost')['address'] == '10.0.0.1'
+
+
+def test_external_edit_is_picked_up(manager):
+    file_path = manager.get_host_by_name('host000005')['file_path']
+    content = read(file_path)
+    with open(file_path, 'w') as f:
+        f.write(content.replace('host000005\n', 'host000005-ext\n'))
+
+    assert manager.get_host_by_name('host000005') is None
+    assert manager.get_host_by_name('host000005-ext')['file_path'] == file_path
+
+
+def test_parallel_parsing_matches_sequential(tmp_path):
+    # Assez de fichiers pour passer par le pool de processus
+    root = str(tmp_path / 'etc')
+    generate_tree(root, hosts=5 * PARALLEL_MIN_FILES, hosts_per_file=5, directories=2)
+
+    sequential = NagiosManager(root)
+    parallel = NagiosManager(root, parse_workers=2)
+    assert parallel.get_all_hosts() == sequential.get_all_hosts()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from metrics import CACHE_HIT_RATIO, FILES_PARSED, PHASE_SECONDS, Metrics, server_timing
+
+
+def test_render_prometheus_text():
+    metrics = Metrics(buckets=(0.1, 1.0))
+    metrics.inc(FILES_PARSED, 3)
+    metrics.set('nagios_hosts', 42)
+    metrics.observe('custom_seconds', 0.5, route='/api/hosts/<host_name>', status=200)
+    metrics.observe('custom_seconds', 2.5, route='/api/hosts/<host_name>', status=200)
+    metrics.inc('custom_total', label='a "quoted"\nvalue')
+
+    lines = metrics.render().splitlines()
+    assert '# TYPE nagios_files_parsed_total counter' in lines
+    assert 'nagios_files_parsed_total 3' in lines
+    assert 'nagios_hosts 42' in lines
+    assert '# TYPE custom_seconds untyped' in lines
+    labels = 'route="/api/hosts/<host_name>",status="200"'
+    assert [line for line in lines if line.startswith('custom_seconds')] == [
+        f'custom_seconds_bucket{{{labels},le="0.1"}} 0',
+        f'custom_seconds_bucket{{{labels},le="1.0"}} 1',
+        f'custom_seconds_bucket{{{labels},le="+Inf"}} 2',
+        f'custom_seconds_sum{{{labels}}} 3',
+        f'custom_seconds_count{{{labels}}} 2',
+    ]
+    assert 'custom_total{label="a \\"quoted\\"\\nvalue"} 1' in lines
+
+
+def test_cache_hit_ratio_and_collectors():
+    metrics = Metrics()
+    for hit in (True, True, True, False):
+        metrics.cache_lookup('response', hit)
+    metrics.add_collector(lambda: [('nagios_index_generation', {}, 7)])
+    metrics.add_collector(lambda: 1 / 0)
+
+    output = metrics.render()
+    assert f'{CACHE_HIT_RATIO}{{cache="response"}} 0.75' in output
+    assert 'nagios_cache_lookups_total{cache="response",result="miss"} 1' in output
+    # Un collecteur en erreur n'empêche pas l'export
+    assert 'nagios_index_generation 7' in output
+
+
+def test_timings_are_collected_per_request():
+    metrics = Metrics()
+    with metrics.timer('walk'):
+        pass
+
+    metrics.begin_request()
+    for _ in range(2):
+        with metrics.timer('parse'):
+            pass
+    timings = metrics.end_request()
+
+    assert list(timings) == ['parse']
+    assert metrics.end_request() == {}
+    assert f'{PHASE_SECONDS}_count{{phase="parse"}} 2' in metrics.render()
+    assert server_timing({'parse': 0.0123}, 0.05) == 'parse;dur=12.3, total;dur=50.0'
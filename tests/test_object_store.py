@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import nagios_manager
+from object_store import ObjectStore, included_file_stamps
+
+TEMPLATES = '''define host {
+    name                generic-host
+    check_interval      5
+    notes               generic
+    contact_groups      admins
+    register            0
+}
+
+define host {
+    name                linux-server
+    use                 generic-host
+    check_interval      2
+    register            0
+}
+
+define host {
+    name                web-server
+    check_interval      1
+    notes               null
+    retry_interval      3
+    register            0
+}
+
+define host {
+    name                loop-a
+    use                 loop-b
+    register            0
+}
+
+define host {
+    name                loop-b
+    use                 loop-a
+    register            0
+}
+
+define service {
+    name                generic-service
+    max_check_attempts  3
+    register            0
+}
+'''
+
+HOSTS = '''define host {
+    use                 web-server, linux-server
+    host_name           web01
+    hostgroups          web
+    contact_groups      +ops
+}
+
+define host {
+    use                 linux-server
+    host_name           db01
+}
+
+define host {
+    use                 loop-a
+    host_name           cache01
+}
+
+define hostgroup {
+    hostgroup_name      web
+    members             db01
+}
+
+define service {
+    use                 generic-service
+    host_name           *, !cache01
+    service_description PING
+}
+
+define service {
+    use                 generic-service
+    hostgroup_name      web
+    service_description HTTP
+}
+'''
+
+
+def build_store(tmp_path):
+    (tmp_path / 'templates.cfg').write_text(TEMPLATES)
+    (tmp_path / 'hosts.cfg').write_text(HOSTS)
+    store = ObjectStore()
+    store.refresh(included_file_stamps([str(tmp_path / 'templates.cfg'), str(tmp_path / 'hosts.cfg')], []))
+    return store
+
+
+def test_use_inheritance(tmp_path):
+    store = build_store(tmp_path)
+
+    # Le premier modèle listé l'emporte, "null" annule la valeur héritée,
+    # "+" ajoute à la valeur héritée ; name, register et use ne sont pas hérités
+    assert store.effective(store.get('host', 'web01')) == {
+        'use': 'web-server, linux-server',
+        'host_name': 'web01',
+        'hostgroups': 'web',
+        'check_interval': '1',
+        'retry_interval': '3',
+        'contact_groups': 'admins,ops',
+    }
+    assert store.effective(store.get('host', 'db01'))['check_interval'] == '2'
+    assert store.effective(store.get('host', 'db01'))['notes'] == 'generic'
+
+    # Héritage circulaire : ignoré sans boucler
+    assert store.effective(store.get('host', 'cache01')) == {'use': 'loop-a', 'host_name': 'cache01'}
+
+
+def test_template_change_invalidates_dependents(tmp_path):
+    store = build_store(tmp_path)
+    host = store.get('host', 'db01')
+    assert store.effective(host)['check_interval'] == '2'
+
+    path = tmp_path / 'templates.cfg'
+    path.write_text(TEMPLATES.replace('check_interval      2', 'check_interval      10'))
+    assert store.refresh(included_file_stamps([str(path), str(tmp_path / 'hosts.cfg')], []))
+
+    assert store.effective(store.get('host', 'db01'))['check_interval'] == '10'
+    assert store.effective(store.get('host', 'web01'))['check_interval'] == '1'
+
+
+def test_services_per_host(tmp_path):
+    store = build_store(tmp_path)
+
+    def services(host_name):
+        return [service.get('service_description') for service in store.services_for_host(host_name)]
+
+    assert services('web01') == ['PING', 'HTTP']
+    # Membre du groupe par la définition du hostgroup
+    assert services('db01') == ['PING', 'HTTP']
+    assert services('cache01') == []
+    assert store.effective(store.services_for_host('web01')[1])['max_check_attempts'] == '3'
+    assert [t.get('name') for t in store.templates('service')] == ['generic-service']
+
+
+def test_object_model_is_checked_once_per_request(manager, monkeypatch):
+    calls = []
+    walk = nagios_manager.included_file_stamps
+    monkeypatch.setattr(nagios_manager, 'included_file_stamps',
+                        lambda *args: calls.append(1) or walk(*args))
+
+    manager.begin_request()
+    try:
+        manager.get_effective_host('host000001')
+        manager.get_templates()
+        assert len(calls) == 1
+
+        assert manager.update_host('host000001', {'host_name': 'host000001', 'address': '10.1.1.1'})
+        assert manager.get_effective_host('host000001')['address'] == '10.1.1.1'
+        assert len(calls) == 2
+    finally:
+        manager.end_request()
+
+    manager.get_templates()
+    assert len(calls) == 3
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from nagios_parser import iter_objects, parse_host_file, parse_objects
+
+CONFIG = b'''# Commentaire
+; autre commentaire
+define host {
+    use             generic-host ; modele
+    host_name       web01
+    ;address        10.0.0.99
+    # notes         ancienne
+    address         10.0.0.1
+    notes           a {b} c
+    notes_url       http://wiki/page\\;1
+}
+
+define command{
+    command_name    check_http
+    command_line    $USER1$/check_http -H $HOSTADDRESS$ \\
+                    -u /health
+}
+define service {
+    host_name       web01
+    service_description HTTP
+    check_command   check_http
+}
+'''
+
+
+def test_all_object_types_and_comments():
+    host, command, service = parse_objects(CONFIG)
+
+    assert (host.object_type, command.object_type, service.object_type) == ('host', 'command', 'service')
+    assert host.directives == {
+        'use': 'generic-host',
+        'host_name': 'web01',
+        'address': '10.0.0.1',
+        'notes': 'a {b} c',
+        'notes_url': 'http://wiki/page;1',
+    }
+    assert command.get('command_line') == '$USER1$/check_http -H $HOSTADDRESS$ -u /health'
+    assert service.get('service_description') == 'HTTP'
+
+
+def test_byte_offsets_cover_each_block():
+    objects = list(parse_objects(CONFIG))
+    for obj in objects:
+        block = CONFIG[obj.start:obj.end]
+        assert block.lstrip().startswith(b'define ' + obj.object_type.encode())
+        assert block.rstrip().endswith(b'}')
+
+    # Les blocs se suivent sans se chevaucher
+    assert [obj.end <= following.start for obj, following in zip(objects, objects[1:])] == [True, True]
+
+
+def test_type_filter_and_files(tmp_path):
+    path = tmp_path / 'hosts.cfg'
+    path.write_bytes(CONFIG)
+    assert [obj.object_type for obj in parse_objects(CONFIG, ('HOST', 'service'))] == ['host', 'service']
+
+    hosts = parse_host_file(str(path))
+    assert [host.get('host_name') for host in hosts] == ['web01']
+    assert hosts[0].file_path == str(path)
+
+    empty = tmp_path / 'empty.cfg'
+    empty.write_bytes(b'')
+    assert list(iter_objects(str(empty))) == []
+    assert parse_host_file(str(tmp_path / 'missing.cfg')) == []
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+
+import pytest
+
+
+def collect_pages(manager, **kwargs):
+    names, cursor = [], None
+    while True:
+        page = manager.query_hosts(limit=7, cursor=cursor, fields=['host_name'], **kwargs)
+        names.extend(host['host_name'] for host in page['hosts'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            return names, page['total']
+
+
+def test_cursor_pagination_returns_every_host_once(manager):
+    names, total = collect_pages(manager)
+    assert total == 60
+    assert names == sorted(names) and len(set(names)) == 60
+
+
+def test_descending_sort_and_search(manager):
+    names, _ = collect_pages(manager, sort='-host_name')
+    assert names == sorted(names, reverse=True)
+
+    result = manager.query_hosts(q='host00001', fields=['host_name'])
+    assert result['total'] == 10
+    assert {host['host_name'] for host in result['hosts']} == {f"host0000{i}" for i in range(10, 20)}
+
+
+def test_cursor_survives_changes_between_pages(manager):
+    page = manager.query_hosts(limit=10, fields=['host_name'])
+    manager.delete_host('host000003')
+    manager.create_host({'host_name': 'host000001a', 'address': '1.1.1.1'}, 'site000')
+
+    rest = manager.query_hosts(limit=100, cursor=page['next_cursor'], fields=['host_name'])
+    names = [host['host_name'] for host in rest['hosts']]
+    assert names[0] == 'host000010' and len(names) == 50
+
+
+@pytest.mark.parametrize('sort', ['host_name', 'use', '-use'])
+def test_insert_before_the_cursor_does_not_repeat_or_skip(manager, sort):
+    page = manager.query_hosts(limit=10, sort=sort, fields=['host_name'])
+    first = [host['host_name'] for host in page['hosts']]
+    # Nouvel hôte dans le premier fichier : les positions de tous les suivants changent
+    first_file = manager.get_host_by_name('host000000')['file_path']
+    manager.create_host({'host_name': 'host000000a', 'address': '1.1.1.1', 'use': 'generic-host'},
+                        os.path.dirname(first_file))
+
+    rest = manager.query_hosts(limit=100, sort=sort, cursor=page['next_cursor'], fields=['host_name'])
+    names = [host['host_name'] for host in rest['hosts']]
+    seen = first + names
+    assert len(seen) == len(set(seen))
+    assert {f"host{i:06d}" for i in range(60)} <= set(seen)
+
+
+def test_invalid_cursor(manager):
+    with pytest.raises(ValueError):
+        manager.query_hosts(limit=5, cursor='not-a-cursor')
+
+
+def test_index_is_refreshed_once_per_request(manager, monkeypatch):
+    calls = []
+    refresh_all = manager._refresh_all
+    monkeypatch.setattr(manager, '_refresh_all', lambda: calls.append(1) or refresh_all())
+
+    manager.begin_request()
+    try:
+        manager.index_generation()
+        manager.query_hosts(q='host00000')
+        manager.get_host_by_name('host000001')
+        assert len(calls) == 1
+
+        # Une écriture de la requête rend le prochain rafraîchissement nécessaire
+        assert manager.update_host('host000001', {'host_name': 'host000001', 'address': '10.1.1.1'})
+        assert manager.get_host_by_name('host000001')['address'] == '10.1.1.1'
+    finally:
+        manager.end_request()
+
+    # Hors requête, chaque appel revérifie le disque
+    count = len(calls)
+    manager.query_hosts()
+    manager.query_hosts()
+    assert len(calls) == count + 2
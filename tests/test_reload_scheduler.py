@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import threading
+
+from reload_scheduler import ReloadScheduler
+
+
+class Steps:
+    '''Validation et rechargement factices qui comptent leurs appels'''
+
+    def __init__(self, valid=True):
+        self.valid = valid
+        self.validations = 0
+        self.reloads = 0
+        self.release = threading.Event()
+        self.release.set()
+        self.reloading = threading.Event()
+
+    def validate(self, on_output, fingerprint):
+        self.validations += 1
+        self.fingerprint = fingerprint
+        on_output('Things look okay\n')
+        return (self.valid, '')
+
+    def reload(self, on_output):
+        self.reloads += 1
+        self.reloading.set()
+        self.release.wait(5)
+        return (True, 'reloaded\n')
+
+
+def test_requests_within_the_window_share_a_batch():
+    steps = Steps()
+    scheduler = ReloadScheduler(steps.validate, steps.reload, window=0.2)
+
+    batches = [scheduler.request() for _ in range(3)]
+    assert len({batch.id for generation, batch in batches}) == 1
+
+    batch = batches[-1][1]
+    assert batch.wait(5)
+    assert batch.success and batch.requests == 3 and batch.generation == 3
+    assert (steps.validations, steps.reloads) == (1, 1)
+    assert scheduler.status()['applied_generation'] == 3
+
+
+def test_request_during_a_running_batch_is_deferred():
+    steps = Steps()
+    steps.release.clear()
+    scheduler = ReloadScheduler(steps.validate, steps.reload, window=0.05)
+
+    generation, first = scheduler.request()
+    assert steps.reloading.wait(5)
+    generation, second = scheduler.request()
+    assert second is not first and not first.finished
+    assert scheduler.status()['running']['id'] == first.id
+
+    steps.release.set()
+    assert second.wait(5)
+    assert first.success and second.success
+    assert steps.reloads == 2
+    assert scheduler.status()['applied_generation'] == generation
+
+
+def test_unchanged_fingerprint_is_not_reloaded_again():
+    steps = Steps()
+    scheduler = ReloadScheduler(steps.validate, steps.reload, window=0.01, fingerprint=lambda: 'same')
+
+    generation, first = scheduler.request()
+    assert first.wait(5)
+    generation, second = scheduler.request()
+    assert second.wait(5)
+
+    assert second.success and 'inchangée' in second.output
+    assert (steps.validations, steps.reloads) == (1, 1)
+    # L'empreinte du lot est transmise à la validation
+    assert steps.fingerprint == 'same'
+
+    # force rejoue la validation et le rechargement
+    generation, forced = scheduler.request(force=True)
+    assert forced.wait(5)
+    assert forced.success and (steps.validations, steps.reloads) == (2, 2)
+
+
+def test_invalid_configuration_is_not_reloaded():
+    steps = Steps(valid=False)
+    scheduler = ReloadScheduler(steps.validate, steps.reload, window=0.01)
+
+    generation, batch = scheduler.request()
+    assert batch.wait(5)
+    assert batch.valid is False and batch.success is False
+    assert steps.reloads == 0
+    assert batch.to_dict(include_output=True)['output'] == 'Things look okay\n'
+    assert scheduler.status()['applied_generation'] == 0
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from datetime import datetime, timedelta, timezone
+
+from flask import Flask
+from werkzeug.http import http_date
+
+from response_cache import ResponseCache
+
+app = Flask(__name__)
+
+
+def respond(cache, generation, body, headers=None):
+    with app.test_request_context(headers=headers or {}):
+        return cache.respond(('hosts',), generation, lambda: body)
+
+
+def test_same_generation_is_not_rebuilt():
+    cache = ResponseCache()
+    built = []
+
+    def build():
+        built.append(1)
+        return {'hosts': []}
+
+    with app.test_request_context():
+        cache.respond(('hosts',), 1, build)
+        cache.respond(('hosts',), 1, build)
+    assert len(built) == 1
+
+
+def test_etag_match_returns_304():
+    cache = ResponseCache()
+    etag = respond(cache, 1, {'hosts': ['a']}).get_etag()[0]
+
+    assert respond(cache, 1, {'hosts': ['a']}, {'If-None-Match': f'"{etag}"'}).status_code == 304
+    # Comparaison faible
+    assert respond(cache, 1, {'hosts': ['a']}, {'If-None-Match': f'W/"{etag}"'}).status_code == 304
+    assert respond(cache, 2, {'hosts': ['b']}, {'If-None-Match': f'"{etag}"'}).status_code == 200
+
+
+def test_change_within_the_same_second_is_not_304():
+    cache = ResponseCache()
+    first = respond(cache, 1, {'hosts': ['a']})
+    since = first.headers['Last-Modified']
+
+    second = respond(cache, 2, {'hosts': ['b']}, {'If-Modified-Since': since})
+    assert second.status_code == 200
+    # Jamais dans le futur
+    assert second.last_modified <= datetime.now(timezone.utc)
+
+    # Même contenu pour une nouvelle génération : même date et même ETag
+    third = respond(cache, 3, {'hosts': ['b']}, {'If-None-Match': second.headers['ETag']})
+    assert third.status_code == 304
+    assert third.headers['Last-Modified'] == second.headers['Last-Modified']
+
+
+def test_if_modified_since_returns_304_for_an_older_change():
+    cache = ResponseCache()
+    first = respond(cache, 1, {'hosts': ['a']})
+    later = first.last_modified + timedelta(seconds=1)
+    response = respond(cache, 1, {'hosts': ['a']}, {'If-Modified-Since': http_date(later)})
+    assert response.status_code == 304
+
+
+def test_etag_differs_between_encodings():
+    cache = ResponseCache(min_compress_size=0)
+    identity = respond(cache, 1, {'hosts': ['a'] * 100})
+    compressed = respond(cache, 1, {'hosts': ['a'] * 100}, {'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert compressed.headers['ETag'] != identity.headers['ETag']
+
+    headers = {'Accept-Encoding': 'gzip', 'If-None-Match': compressed.headers['ETag']}
+    assert respond(cache, 1, {'hosts': ['a'] * 100}, headers).status_code == 304
+    headers = {'Accept-Encoding': 'gzip', 'If-None-Match': identity.headers['ETag']}
+    assert respond(cache, 1, {'hosts': ['a'] * 100}, headers).status_code == 200
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import pickle
+import sqlite3
+import stat
+
+from nagios_manager import NagiosManager
+from shared_index import SharedIndex
+
+
+def test_records_are_stored_as_json(tmp_path):
+    path = str(tmp_path / 'shared.db')
+    index = SharedIndex(path, {'base_path': '/etc/nagios'})
+    compact = ('host', ('host_name', 'address'), ('web1', '10.0.0.1'), 0, 42)
+    with index.transaction() as txn:
+        txn.put('/etc/nagios/web1.cfg', (1, 2, 3), [compact])
+
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    generation, changes = index.changes_since(0)
+    assert changes == [('/etc/nagios/web1.cfg', (1, 2, 3), [compact])]
+
+    stored = sqlite3.connect(path).execute('SELECT hosts FROM files').fetchone()[0]
+    assert isinstance(stored, str) and stored.startswith('[')
+
+
+def test_pickled_database_is_reset(tmp_path):
+    path = str(tmp_path / 'shared.db')
+    meta = {'base_path': '/etc/nagios'}
+    connection = sqlite3.connect(path)
+    connection.executescript('''
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        CREATE TABLE files (path TEXT PRIMARY KEY, generation INTEGER NOT NULL, stamp TEXT, hosts BLOB);
+    ''')
+    connection.execute("INSERT INTO meta VALUES ('config', ?)", (json.dumps(meta, sort_keys=True),))
+    connection.execute("INSERT INTO meta VALUES ('generation', '1')")
+    connection.execute("INSERT INTO files VALUES ('/etc/nagios/web1.cfg', 1, '[1, 2, 3]', ?)",
+                       (pickle.dumps([]),))
+    connection.commit()
+    connection.close()
+
+    index = SharedIndex(path, meta)
+    assert index.changes_since(0)[1] == []
+
+
+def test_workers_share_parsed_files(tree, tmp_path):
+    path = str(tmp_path / 'shared.db')
+    first = NagiosManager(tree, shared_index_path=path)
+    second = NagiosManager(tree, shared_index_path=path)
+    assert first.get_all_hosts() == second.get_all_hosts()
+
+    assert first.update_host('host000001', {'host_name': 'host000001', 'address': '10.1.1.1'})
+    assert second.get_host_by_name('host000001')['address'] == '10.1.1.1'
+
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import pickle
+import stat
+
+import nagios_manager
+from index_snapshot import SNAPSHOT_MAGIC, _HEADER, load_snapshot
+from nagios_manager import NagiosManager
+
+
+def test_snapshot_round_trip(tree, tmp_path):
+    path = str(tmp_path / 'cache' / 'index.snapshot')
+    first = NagiosManager(tree, snapshot_path=path)
+    first.refresh_objects()
+    assert first.save_snapshot()
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+    second = NagiosManager(tree, snapshot_path=path)
+    assert second.load_snapshot()
+    assert second.get_all_hosts() == first.get_all_hosts()
+    assert second.get_host_by_name('host000001')['address'] == '10.0.0.1'
+    assert second.objects.export_files() == first.objects.export_files()
+
+
+def test_snapshot_writable_by_others_is_ignored(tree, tmp_path):
+    path = str(tmp_path / 'index.snapshot')
+    manager = NagiosManager(tree, snapshot_path=path)
+    meta = manager._snapshot_meta()
+    assert manager.save_snapshot()
+    assert load_snapshot(path, meta) is not None
+
+    os.chmod(path, 0o620)
+    assert load_snapshot(path, meta) is None
+
+
+def test_pickled_snapshot_is_ignored(tmp_path):
+    path = str(tmp_path / 'index.snapshot')
+    meta = {'base_path': '/etc/nagios'}
+    meta_bytes = b'{"base_path": "/etc/nagios"}'
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(SNAPSHOT_MAGIC, 1, len(meta_bytes)))
+        f.write(meta_bytes)
+        f.write(pickle.dumps({'hosts': [], 'objects': []}))
+    os.chmod(path, 0o600)
+
+    assert load_snapshot(path, meta) is None
+
+
+def test_only_files_changed_since_the_snapshot_are_parsed(tree, tmp_path, monkeypatch):
+    path = str(tmp_path / 'index.snapshot')
+    first = NagiosManager(tree, snapshot_path=path)
+    first.refresh_index()
+    first.refresh_objects()
+    assert first.save_snapshot()
+
+    changed = first.get_host_by_name('host000001')['file_path']
+    with open(changed, 'a') as f:
+        f.write('define host {\n    host_name    late-host\n}\n')
+
+    parsed = []
+    parse = nagios_manager.parse_host_file
+    monkeypatch.setattr(nagios_manager, 'parse_host_file', lambda file_path: parsed.append(file_path) or parse(file_path))
+
+    second = NagiosManager(tree, snapshot_path=path)
+    assert second.load_snapshot()
+    second.refresh_index()
+    assert parsed == [changed]
+    assert second.get_host_by_name('late-host')['file_path'] == changed
+    assert len(second.get_all_hosts()) == 61
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import threading
+
+import pytest
+
+from sqlite_db import SQLiteDatabase
+
+
+@pytest.mark.parametrize('in_memory', [True, False])
+def test_threads_share_the_database(tmp_path, in_memory):
+    db = SQLiteDatabase(None if in_memory else str(tmp_path / 'test.db'))
+    db.connection().execute('CREATE TABLE t (v INTEGER)')
+
+    def insert():
+        with db.exclusive() as connection:
+            connection.execute('INSERT INTO t VALUES (1)')
+
+    thread = threading.Thread(target=insert)
+    thread.start()
+    thread.join()
+    assert db.connection().execute('SELECT COUNT(*) FROM t').fetchone()[0] == 1
+
+
+def test_exclusive_rolls_back_on_error():
+    db = SQLiteDatabase()
+    db.connection().execute('CREATE TABLE t (v INTEGER)')
+    with pytest.raises(ValueError):
+        with db.exclusive() as connection:
+            connection.execute('INSERT INTO t VALUES (1)')
+            raise ValueError()
+    assert db.connection().execute('SELECT COUNT(*) FROM t').fetchone()[0] == 0
+    # Deux bases mémoire sont indépendantes
+    assert SQLiteDatabase().connection().execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0] == 0
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+def count_fingerprints(manager, monkeypatch):
+    calls = []
+    config_fingerprint = manager.config_fingerprint
+    monkeypatch.setattr(manager, 'config_fingerprint', lambda: calls.append(1) or config_fingerprint())
+    return calls
+
+
+def test_fingerprint_is_checked_before_and_after_a_run(manager, monkeypatch):
+    calls = count_fingerprints(manager, monkeypatch)
+
+    assert manager.validate_configuration()[0]
+    assert len(calls) == 2
+    # Deuxième validation : résultat du cache, une seule empreinte
+    calls.clear()
+    assert manager.validate_configuration() == manager._validation_cache[manager.config_fingerprint()]
+    assert manager.validation_cache_stats()['hits'] == 1
+    assert len(calls) == 2
+
+    # Empreinte fournie par l'appelant : pas de nouveau calcul avant la recherche
+    calls.clear()
+    fingerprint = manager.config_fingerprint()
+    assert manager.validate_configuration(fingerprint=fingerprint)[0]
+    assert len(calls) == 1
+
+
+def test_result_of_a_stale_fingerprint_is_not_cached(manager):
+    # Job resté en file pendant que la configuration changeait
+    fingerprint = manager.config_fingerprint()
+    assert manager.update_host('host000001', {'host_name': 'host000001', 'address': '10.9.9.9'})
+
+    assert manager.validate_configuration(fingerprint=fingerprint)[0]
+    assert fingerprint not in manager._validation_cache
+    assert manager.validation_cache_stats()['entries'] == 0
+
+
+def test_changed_configuration_is_validated_again(manager):
+    assert manager.validate_configuration()[0]
+    assert manager.update_host('host000001', {'host_name': 'host000001', 'address': 'INVALID'})
+
+    valid, output = manager.validate_configuration()
+    assert not valid and 'Invalid definition' in output
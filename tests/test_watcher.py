@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import time
+
+import pytest
+
+from nagios_manager import NagiosManager
+from nagios_watcher import ConfigWatcher
+
+pytestmark = pytest.mark.skipif(not ConfigWatcher.available(), reason='inotify indisponible')
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = predicate()
+        if result:
+            return result
+        time.sleep(0.02)
+    return predicate()
+
+
+def drain_until(watcher, path):
+    '''Cumule les fichiers signalés jusqu'à voir path (None si un rescan est demandé)'''
+    seen = set()
+
+    def check():
+        dirty = watcher.drain()
+        if dirty is None:
+            return 'rescan'
+        seen.update(dirty)
+        return path in seen
+
+    return wait_for(check)
+
+
+@pytest.fixture
+def watcher(tmp_path):
+    (tmp_path / 'linux').mkdir()
+    (tmp_path / 'objects').mkdir()
+    watcher = ConfigWatcher(str(tmp_path), excluded_dirs=['objects'])
+    assert watcher.start()
+    # Premier appel : parcours complet demandé
+    assert watcher.drain() is None
+    yield watcher
+    watcher.stop()
+
+
+def test_modified_file_is_reported(watcher, tmp_path):
+    path = tmp_path / 'linux' / 'web.cfg'
+    path.write_text('define host {\n    host_name web\n}\n')
+    assert drain_until(watcher, str(path)) is True
+    assert watcher.drain() == set()
+
+    path.unlink()
+    assert drain_until(watcher, str(path)) is True
+
+
+def test_new_directory_requests_rescan_and_is_watched(watcher, tmp_path):
+    directory = tmp_path / 'windows'
+    directory.mkdir()
+    assert wait_for(lambda: watcher.drain() is None)
+
+    path = directory / 'dc.cfg'
+    path.write_text('define host {\n    host_name dc\n}\n')
+    assert drain_until(watcher, str(path)) is True
+
+
+def test_excluded_directories_are_ignored(watcher, tmp_path):
+    (tmp_path / 'objects' / 'commands.cfg').write_text('define command {\n}\n')
+    marker = tmp_path / 'linux' / 'marker.cfg'
+    marker.write_text('')
+    seen = set()
+    assert wait_for(lambda: seen.update(watcher.drain() or ()) or str(marker) in seen)
+    assert str(tmp_path / 'objects' / 'commands.cfg') not in seen
+
+
+def test_manager_sees_edits_through_the_watcher(tree, tmp_path):
+    mgr = NagiosManager(tree, watch_changes=True, lock_dir=str(tmp_path / 'locks'))
+    try:
+        assert mgr._watcher is not None
+        host = mgr.get_host_by_name('host000001')
+        with open(host['file_path']) as f:
+            content = f.read()
+        with open(host['file_path'], 'w') as f:
+            f.write(content.replace('10.0.0.1\n', '10.9.9.9\n', 1))
+
+        assert wait_for(lambda: mgr.get_host_by_name('host000001')['address'] == '10.9.9.9')
+    finally:
+        mgr.stop_watcher()